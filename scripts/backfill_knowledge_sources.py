@@ -0,0 +1,73 @@
+"""
+Registers knowledge sources ingested before the `knowledge_sources` registry
+existed, by grouping the chunks stored in the vector store for each practice.
+
+Until a source is registered, deleting or re-ingesting it falls back to a
+metadata scan of the vector store, and scheduled web page refreshes skip it.
+Sources that are already registered are left untouched. Registered web pages
+have no content fingerprint yet, so their first refresh re-ingests them.
+
+Usage:
+    python -m scripts.backfill_knowledge_sources --practice-id 1 --practice-id 2
+"""
+import argparse
+from collections import defaultdict
+
+from src.database.db import get_sync_engine
+from src.database.models import KnowledgeSource
+from src.services.knowledge_sources import get_knowledge_sources, record_knowledge_sources
+from src.services.vector_store import get_vector_store
+from src.shared.enums import SourceType
+
+
+def _source_key(metadata: dict) -> tuple[str, str, str]:
+    """Returns the source type, source key and name of a stored chunk."""
+    source_type = metadata.get("source_type")
+    if source_type == SourceType.WEB_PAGE.value:
+        return source_type, metadata["source_url"], metadata.get("source_page_title") or metadata["source_url"]
+    return source_type, metadata["doc_id"], metadata["doc_id"]
+
+
+def backfill_practice(practice_id: int) -> int:
+    stored = get_vector_store().get(practice_id, include=["metadatas"])
+
+    sources = {}
+    chunks = defaultdict(dict)
+    for id_, metadata in zip(stored.get("ids", []), stored.get("metadatas", [])):
+        if not metadata or not metadata.get("source_type"):
+            continue
+        source_type, source_key, name = _source_key(metadata)
+        sources.setdefault((practice_id, source_type, source_key), {"name": name, "crawl_root": metadata.get("crawl_root")})
+        chunks[(practice_id, source_type, source_key)][id_] = metadata.get("content_hash")
+
+    registered = get_knowledge_sources(list(sources))
+    entries = [
+        {
+            "practice_id": key[0],
+            "source_type": key[1],
+            "source_key": key[2],
+            "name": source["name"],
+            "crawl_root": source["crawl_root"],
+            "chunks": chunks[key],
+            "content_hash": None,
+        }
+        for key, source in sources.items()
+        if key not in registered
+    ]
+    record_knowledge_sources(entries)
+    return len(entries)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--practice-id", type=int, action="append", required=True)
+    args = parser.parse_args()
+
+    KnowledgeSource.__table__.create(get_sync_engine(), checkfirst=True)
+    for practice_id in args.practice_id:
+        count = backfill_practice(practice_id)
+        print(f"practice_id {practice_id}: registered {count} sources")
+
+
+if __name__ == "__main__":
+    main()
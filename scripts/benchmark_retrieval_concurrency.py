@@ -0,0 +1,88 @@
+"""
+Measures knowledge-base retrieval throughput as the number of in-flight
+sessions grows, against the vector store and model configured in `.env`.
+
+The `sync` mode calls `retrieve_data` directly on the event loop, the way the
+chatflow did before `aretrieve_data` existed, so requests serialize. The
+`async` mode awaits `aretrieve_data` and should scale with concurrency until
+the vector store or the LLM provider becomes the bottleneck.
+
+Usage:
+    python -m scripts.benchmark_retrieval_concurrency --practice-id 1
+    python -m scripts.benchmark_retrieval_concurrency --practice-id 1 --mode sync --concurrency 1,4,16
+"""
+import argparse
+import asyncio
+import statistics
+import time
+
+from src.services.embeddings import aretrieve_data, retrieve_data
+
+DEFAULT_QUERIES = [
+    "What are your opening hours?",
+    "Do you take insurance?",
+    "Where are you located?",
+    "How much does a first consultation cost?",
+    "Can I book an appointment online?",
+    "What treatments do you offer?",
+]
+
+
+async def _timed_call(mode: str, query: str, practice_id: int) -> float:
+    start = time.perf_counter()
+    if mode == "async":
+        await aretrieve_data(query=query, practice_id=practice_id)
+    else:
+        retrieve_data(query=query, practice_id=practice_id)
+    return time.perf_counter() - start
+
+
+async def run_level(mode: str, concurrency: int, total_requests: int, practice_id: int, queries: list[str]) -> dict:
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def session(i: int) -> float:
+        async with semaphore:
+            return await _timed_call(mode, queries[i % len(queries)], practice_id)
+
+    start = time.perf_counter()
+    latencies = await asyncio.gather(*(session(i) for i in range(total_requests)))
+    elapsed = time.perf_counter() - start
+
+    latencies = sorted(latencies)
+    return {
+        "concurrency": concurrency,
+        "requests": total_requests,
+        "elapsed_s": elapsed,
+        "throughput_rps": total_requests / elapsed,
+        "p50_ms": statistics.median(latencies) * 1000,
+        "p95_ms": latencies[int(0.95 * (len(latencies) - 1))] * 1000,
+    }
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--practice-id", type=int, required=True)
+    parser.add_argument("--mode", choices=["async", "sync"], default="async")
+    parser.add_argument("--concurrency", default="1,2,4,8,16", help="Comma-separated in-flight session counts.")
+    parser.add_argument("--requests-per-level", type=int, default=32)
+    parser.add_argument("--query", action="append", help="Query to send; may be repeated. Defaults to a built-in FAQ set.")
+    args = parser.parse_args()
+
+    queries = args.query or DEFAULT_QUERIES
+    levels = [int(level) for level in args.concurrency.split(",")]
+
+    # Warm up the vector store client and the embeddings/LLM connections.
+    await _timed_call(args.mode, queries[0], args.practice_id)
+
+    print(f"mode={args.mode} practice_id={args.practice_id}")
+    print(f"{'in-flight':>9} {'requests':>8} {'elapsed_s':>9} {'req/s':>8} {'p50_ms':>8} {'p95_ms':>8}")
+    for level in levels:
+        result = await run_level(args.mode, level, args.requests_per_level, args.practice_id, queries)
+        print(
+            f"{result['concurrency']:>9} {result['requests']:>8} {result['elapsed_s']:>9.2f} "
+            f"{result['throughput_rps']:>8.2f} {result['p50_ms']:>8.0f} {result['p95_ms']:>8.0f}"
+        )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,171 @@
+"""
+Evaluates the local intent classifier against the LLM classification, using
+the embeddings and chat model configured in `.env`.
+
+Each message is classified by both, as the first message of a conversation.
+The report gives the share of messages the classifier resolves locally, how
+often it agrees with the LLM on those, and the latency saved: the LLM calls
+skipped, minus the local classification time paid on every message. It is
+repeated for a range of confidence thresholds to help pick
+INTENT_CLASSIFIER_MIN_CONFIDENCE.
+
+The input is a text file with one message per line, or a JSONL file of
+`{"message": ..., "intent": ...}` objects, where a present `intent` is used as
+the LLM label instead of calling it.
+
+Usage:
+    python -m scripts.evaluate_intent_classifier --input messages.txt
+    python -m scripts.evaluate_intent_classifier --input labelled.jsonl --thresholds 0.6,0.7,0.8,0.9
+"""
+import argparse
+import asyncio
+import json
+import statistics
+import time
+
+from src.api.chatflow.intent_classifier import LocalIntentClassifier
+from src.api.chatflow.knowledge_data import INTENT_EXAMPLES, LOCAL_INTENTS
+from src.api.chatflow.workflows import _classify_intent
+from src.config import settings
+from src.services.llm_clients import get_llm_clients
+from src.services.vector_store import get_embeddings
+from src.shared.enums import InteractionType
+from src.shared.schemas import InteractionMessage
+
+DEFAULT_MESSAGES = [
+    "hi",
+    "hello there",
+    "thanks!",
+    "thank you, that's helpful",
+    "bye",
+    "ok got it",
+    "how much does it cost?",
+    "can I talk to a real person?",
+    "does it integrate with WordPress?",
+    "I'd like a bot for my dental clinic",
+    "hi, what are your prices?",
+    "thanks, but how do I upload documents?",
+]
+
+
+def _load_messages(path: str | None) -> list[dict]:
+    if not path:
+        return [{"message": message} for message in DEFAULT_MESSAGES]
+
+    entries = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            if line.startswith("{"):
+                entries.append(json.loads(line))
+            else:
+                entries.append({"message": line})
+    return entries
+
+
+async def _evaluate(entry: dict, classifier: LocalIntentClassifier, model) -> dict:
+    message = entry["message"]
+
+    start = time.perf_counter()
+    label, confidence, similarity = await classifier.apredict(message)
+    local_ms = (time.perf_counter() - start) * 1000
+
+    llm_intent = entry.get("intent")
+    llm_ms = None
+    if not llm_intent:
+        start = time.perf_counter()
+        llm_intent = await _classify_intent([InteractionMessage(role=InteractionType.USER, message=message)], model)
+        llm_ms = (time.perf_counter() - start) * 1000
+
+    return {
+        "message": message,
+        "label": label,
+        "confidence": confidence,
+        "similarity": similarity,
+        "eligible": label in LOCAL_INTENTS and len(message.split()) <= classifier.max_words,
+        "local_ms": local_ms,
+        "llm_intent": llm_intent,
+        "llm_ms": llm_ms,
+    }
+
+
+def _summarize(results: list[dict], threshold: float, min_similarity: float, mean_llm_ms: float | None) -> dict:
+    accepted = [
+        result for result in results
+        if result["eligible"] and result["confidence"] >= threshold and result["similarity"] >= min_similarity
+    ]
+    agreed = sum(1 for result in accepted if result["label"] == result["llm_intent"])
+    saved_ms = None
+    if mean_llm_ms is not None:
+        saved_ms = len(accepted) * mean_llm_ms - sum(result["local_ms"] for result in results)
+    return {
+        "threshold": threshold,
+        "coverage": len(accepted) / len(results),
+        "agreement": agreed / len(accepted) if accepted else None,
+        "accepted": accepted,
+        "saved_ms_per_message": saved_ms / len(results) if saved_ms is not None else None,
+    }
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--input", help="Text file with one message per line, or JSONL. Defaults to a built-in set.")
+    parser.add_argument("--thresholds", default="0.6,0.7,0.8,0.9,1.0", help="Comma-separated confidence thresholds.")
+    parser.add_argument("--min-similarity", type=float, default=settings.INTENT_CLASSIFIER_MIN_SIMILARITY)
+    parser.add_argument("--verbose", action="store_true", help="Print the classification of every message.")
+    args = parser.parse_args()
+
+    entries = _load_messages(args.input)
+    classifier = LocalIntentClassifier(
+        get_embeddings(),
+        INTENT_EXAMPLES,
+        LOCAL_INTENTS,
+        k=settings.INTENT_CLASSIFIER_K,
+        min_confidence=settings.INTENT_CLASSIFIER_MIN_CONFIDENCE,
+        min_similarity=args.min_similarity,
+        max_words=settings.INTENT_CLASSIFIER_MAX_WORDS,
+    )
+    model = get_llm_clients().get_chat_model()
+
+    # Embed the examples and open the LLM connection before timing anything.
+    await classifier.apredict("warm-up")
+    results = [await _evaluate(entry, classifier, model) for entry in entries]
+
+    llm_latencies = [result["llm_ms"] for result in results if result["llm_ms"] is not None]
+    mean_llm_ms = statistics.mean(llm_latencies) if llm_latencies else None
+    local_latencies = sorted(result["local_ms"] for result in results)
+
+    if args.verbose:
+        for result in results:
+            print(
+                f"{result['label']:<28} {result['confidence']:.2f} {result['similarity']:.2f} "
+                f"llm={result['llm_intent']!s:<28} {result['message']!r}"
+            )
+        print()
+
+    print(f"messages={len(results)} min_similarity={args.min_similarity}")
+    print(f"local p50_ms={statistics.median(local_latencies):.1f} p95_ms={local_latencies[int(0.95 * (len(local_latencies) - 1))]:.1f}")
+    if mean_llm_ms is not None:
+        print(f"llm mean_ms={mean_llm_ms:.0f} over {len(llm_latencies)} calls")
+    else:
+        print("llm latency not measured: every message carried its label")
+
+    print(f"{'threshold':>9} {'coverage':>8} {'agreement':>9} {'saved_ms/msg':>12}")
+    for threshold in [float(threshold) for threshold in args.thresholds.split(",")]:
+        summary = _summarize(results, threshold, args.min_similarity, mean_llm_ms)
+        agreement = f"{summary['agreement']:.3f}" if summary["agreement"] is not None else "-"
+        saved = f"{summary['saved_ms_per_message']:.0f}" if summary["saved_ms_per_message"] is not None else "-"
+        print(f"{threshold:>9.2f} {summary['coverage']:>8.3f} {agreement:>9} {saved:>12}")
+
+    summary = _summarize(results, settings.INTENT_CLASSIFIER_MIN_CONFIDENCE, args.min_similarity, mean_llm_ms)
+    disagreements = [result for result in summary["accepted"] if result["label"] != result["llm_intent"]]
+    if disagreements:
+        print(f"\nDisagreements at the configured threshold ({settings.INTENT_CLASSIFIER_MIN_CONFIDENCE}):")
+        for result in disagreements:
+            print(f"  local={result['label']} llm={result['llm_intent']} {result['message']!r}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -1,6 +1,9 @@
 from .workflows import *
 from .state import ChatflowState
+from src.config import settings
+from src.services.llm_cache import llm_cache_bypassed
 from src.shared.schemas import InteractionMessage
+from src.shared.utils.streaming import emit_event
 from langchain_core.language_models import BaseChatModel
 
 logger = logging.getLogger(__name__)
@@ -13,6 +16,11 @@ STATES_AWAITING_USER_INPUT = {
     ChatflowState.AWAITING_NEW_MESSAGE,
 }
 
+# Workflows whose LLM calls bypass the LLM response cache
+LLM_CACHE_EXCLUDED_WORKFLOWS = {
+    state.strip() for state in settings.LLM_CACHE_EXCLUDED_WORKFLOWS.split(",") if state.strip()
+}
+
 
 async def handle_chatflow(
     session_id: str,
@@ -66,12 +74,15 @@ async def handle_chatflow(
         # The history for the tool call should include messages generated so far in this turn
         current_turn_history = history_messages + all_new_messages
 
-        new_messages, new_state, tool_call, interaction_data = await workflow_func(
-            current_turn_history, interaction_data, model
-        )
+        with llm_cache_bypassed(next_state.value in LLM_CACHE_EXCLUDED_WORKFLOWS):
+            new_messages, new_state, tool_call, interaction_data = await workflow_func(
+                current_turn_history, interaction_data, model
+            )
 
         if new_messages:
             all_new_messages.extend(new_messages)
+            for message in new_messages:
+                emit_event("message", message.model_dump(mode="json", exclude_none=True))
         if tool_call:
             final_tool_call = tool_call
 
@@ -81,6 +92,7 @@ async def handle_chatflow(
 
         new_states.append(new_state)
         next_state = new_state
+        emit_event("state", {"state": new_state.value})
 
         if (new_messages or tool_call) and next_state in STATES_AWAITING_USER_INPUT:
             # If workflow produced output for the user and requires user input, stop for this turn
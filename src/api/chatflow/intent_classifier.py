@@ -0,0 +1,133 @@
+import asyncio
+import logging
+import time
+from typing import Optional
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+from src.api.chatflow.knowledge_data import INTENT_EXAMPLES, LOCAL_INTENTS
+from src.config import settings
+from src.services.vector_store import get_embeddings
+from src.shared.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+_intent_classifier = None
+
+
+class LocalIntentClassifier:
+    """
+    Classifies short messages by nearest neighbours over labelled examples, in
+    the embedding space of the configured embeddings model.
+
+    The confidence of a prediction is the share of the similarity of the `k`
+    nearest examples that belongs to the winning label. A prediction is only
+    accepted if its label is one of `local_intents`, its confidence reaches
+    `min_confidence` and its nearest example has a similarity of at least
+    `min_similarity`; anything else is left to the LLM. The examples are
+    embedded on first use. Callers that already embedded the message, such as
+    the chatflow, which shares the vector with retrieval, pass it along.
+    """
+
+    def __init__(
+        self,
+        embeddings: Embeddings,
+        examples: dict[str, list[str]],
+        local_intents: set[str],
+        k: int,
+        min_confidence: float,
+        min_similarity: float,
+        max_words: int,
+    ):
+        self.embeddings = embeddings
+        self.local_intents = local_intents
+        self.k = k
+        self.min_confidence = min_confidence
+        self.min_similarity = min_similarity
+        self.max_words = max_words
+
+        self._texts = [text for texts in examples.values() for text in texts]
+        self._labels = np.array([label for label, texts in examples.items() for _ in texts])
+        self._matrix: Optional[np.ndarray] = None
+        self._lock = asyncio.Lock()
+
+    @staticmethod
+    def _normalize(vectors: np.ndarray) -> np.ndarray:
+        return vectors / np.clip(np.linalg.norm(vectors, axis=-1, keepdims=True), 1e-12, None)
+
+    async def _example_matrix(self) -> np.ndarray:
+        if self._matrix is None:
+            async with self._lock:
+                if self._matrix is None:
+                    vectors = await self.embeddings.aembed_documents(self._texts)
+                    self._matrix = self._normalize(np.array(vectors, dtype=np.float32))
+        return self._matrix
+
+    def accepts(self, text: str) -> bool:
+        """Whether `text` is short enough to be classified locally."""
+        return bool(text) and len(text.split()) <= self.max_words
+
+    async def apredict(self, text: str, embedding: Optional[list[float]] = None) -> tuple[str, float, float]:
+        """Returns the nearest label of `text`, its confidence and the similarity of the nearest example."""
+        matrix = await self._example_matrix()
+        if embedding is None:
+            embedding = await self.embeddings.aembed_query(text)
+        query = self._normalize(np.array(embedding, dtype=np.float32))
+
+        similarities = matrix @ query
+        nearest = np.argsort(similarities)[::-1][:self.k]
+        # Negative similarities would count against a label, so they are ignored.
+        weights = np.clip(similarities[nearest], 0, None)
+        votes: dict[str, float] = {}
+        for label, weight in zip(self._labels[nearest], weights):
+            votes[label] = votes.get(label, 0.0) + float(weight)
+
+        label = max(votes, key=votes.get)
+        total = sum(votes.values())
+        confidence = votes[label] / total if total else 0.0
+        return str(label), confidence, float(similarities[nearest[0]])
+
+    async def aclassify(self, text: str, embedding: Optional[list[float]] = None) -> Optional[str]:
+        """Returns the intent of `text` if it can be decided locally, otherwise None."""
+        if not self.accepts(text):
+            metrics.increment("intent.local.skipped")
+            return None
+
+        start = time.perf_counter()
+        try:
+            label, confidence, similarity = await self.apredict(text, embedding)
+        except Exception as e:
+            logger.warning(f"Local intent classification failed, falling back to the LLM: {e}")
+            metrics.increment("intent.local.errors")
+            return None
+        finally:
+            metrics.increment("intent.local.latency_ms", (time.perf_counter() - start) * 1000)
+
+        if label in self.local_intents and confidence >= self.min_confidence and similarity >= self.min_similarity:
+            logger.info(f"Intent classified locally as {label} (confidence {confidence:.2f}, similarity {similarity:.2f})")
+            metrics.increment("intent.local.hits")
+            return label
+
+        metrics.increment("intent.local.fallbacks")
+        return None
+
+
+def get_intent_classifier() -> Optional[LocalIntentClassifier]:
+    """Returns a singleton instance of the local intent classifier, or None if it is disabled."""
+    global _intent_classifier
+    if not settings.INTENT_CLASSIFIER_ENABLED:
+        return None
+    if _intent_classifier is not None:
+        return _intent_classifier
+
+    _intent_classifier = LocalIntentClassifier(
+        get_embeddings(),
+        INTENT_EXAMPLES,
+        LOCAL_INTENTS,
+        k=settings.INTENT_CLASSIFIER_K,
+        min_confidence=settings.INTENT_CLASSIFIER_MIN_CONFIDENCE,
+        min_similarity=settings.INTENT_CLASSIFIER_MIN_SIMILARITY,
+        max_words=settings.INTENT_CLASSIFIER_MAX_WORDS,
+    )
+    return _intent_classifier
@@ -25,3 +25,76 @@ MedBot Pro comes with built-in analytics. You can review the history of conversa
 For more complex needs, MedBot Pro can handle multi-step interactions and layered logic flows. If you need confirmations or decision trees before delivering a response, we provide tailor-made solutions. Pricing for these advanced features is customized based on client needs.
 """
 
+
+# Labelled examples for the local intent classifier. Only the intents in
+# LOCAL_INTENTS are resolved locally; the other labels are there so that
+# messages resembling them are not mistaken for one of those, and go to the LLM.
+LOCAL_INTENTS = {"is_acknowledgment", "is_bot_creation_request", "is_goodbye"}
+
+INTENT_EXAMPLES = {
+    "is_acknowledgment": [
+        "thanks",
+        "thank you",
+        "thanks a lot",
+        "thank you so much",
+        "got it",
+        "ok",
+        "okay, makes sense",
+        "great, thanks",
+        "perfect",
+        "understood",
+        "cool",
+        "that helps, thanks",
+        "awesome",
+        "noted",
+    ],
+    "is_bot_creation_request": [
+        "hi",
+        "hello",
+        "hey",
+        "hi there",
+        "hello!",
+        "good morning",
+        "good afternoon",
+        "hey, how are you?",
+        "I want to build a chatbot",
+        "I'd like a chatbot for my practice",
+        "I'm interested in MedBot Pro",
+        "can you build a bot for my website?",
+        "I want an AI assistant for my clinic",
+    ],
+    "is_goodbye": [
+        "bye",
+        "goodbye",
+        "bye bye",
+        "see you",
+        "see you later",
+        "that's all",
+        "that's all for now",
+        "have a good day",
+        "talk to you later",
+        "I'm done",
+        "nothing else, bye",
+    ],
+    "is_question_pricing": [
+        "how much does it cost?",
+        "what is the price?",
+        "how much is the subscription?",
+        "do you have pricing plans?",
+        "is there a monthly fee?",
+    ],
+    "is_general_faq_question": [
+        "which LLM do you use?",
+        "how does the chatbot work?",
+        "can I customize the widget colors?",
+        "does it work with WordPress?",
+        "can I upload documents?",
+    ],
+    "is_frustrated_needs_human": [
+        "I want to talk to a person",
+        "this is not helpful",
+        "can I speak to a human?",
+        "you're not answering my question",
+        "let me talk to someone real",
+    ],
+}
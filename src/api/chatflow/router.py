@@ -1,36 +1,45 @@
+import asyncio
+import json
 import logging
-from fastapi import APIRouter, Depends, Request
-from langchain_openai import ChatOpenAI
+import time
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from typing import Optional
+
+from fastapi import APIRouter, Depends, Request, WebSocket, WebSocketDisconnect
+from fastapi.responses import StreamingResponse
+from langchain_core.language_models import BaseChatModel
+from pydantic import ValidationError
+from sqlalchemy import func, literal
+from sqlalchemy.dialects.postgresql import JSONB, insert
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
 
 from src.api.chatflow.handler import handle_chatflow
 from src.api.chatflow.state import ChatflowState
-from src.config import settings
-from src.database.db import get_db
+from src.database.db import AsyncSessionFactory, get_db
 from src.database.models import Interaction
+from src.services.llm_clients import get_chat_model
+from src.shared.metrics import metrics
 from src.shared.schemas import (
     InteractionRequest,
     InteractionResponse,
     InteractionMessage,
 )
+from src.shared.utils.streaming import event_sink
 
 router = APIRouter()
 logger = logging.getLogger(__name__)
 
 
-@router.post("/chatflow", response_model=InteractionResponse)
-async def handle(
+async def _load_interaction(
+    db: AsyncSession,
     interaction_request: InteractionRequest,
-    request: Request,
-    db: AsyncSession = Depends(get_db),
-):
+) -> tuple[Interaction, list[InteractionMessage], ChatflowState, dict]:
     """
-    Handles a user-assistant interaction for the chatflow operation,
-    continuing a conversation by loading history from the database,
-    appending the new message, and saving the updated history.
+    Loads the session's interaction, or adds a new one, and returns it with its
+    history including the new user message, its current state and its data.
     """
-    logger.info(f"Received chatflow request: {interaction_request.model_dump_json(indent=2)}")
     session_id = interaction_request.sessionId
     user_message = interaction_request.message
 
@@ -67,8 +76,15 @@ async def handle(
     # Append new user message to history
     history_messages.append(user_message)
 
-    if interaction.practice_id:
-        interaction_data["practice_id"] = interaction.practice_id
+    interaction_data = _merge_request_data(interaction_data, interaction.practice_id, interaction_request)
+
+    return interaction, history_messages, current_state, interaction_data
+
+
+def _merge_request_data(interaction_data: dict, practice_id: Optional[int], interaction_request: InteractionRequest) -> dict:
+    """Adds the practice and the user data sent with a request to the interaction data."""
+    if practice_id:
+        interaction_data["practice_id"] = practice_id
 
     if interaction_request.user_data:
         # Create a copy to ensure SQLAlchemy detects changes to the JSON field.
@@ -83,22 +99,19 @@ async def handle(
         else:
             interaction_data["user_data"] = interaction_request.user_data
 
-    logger.debug(f"Interaction data before handle_chatflow: {interaction_data}")
+    return interaction_data
 
-    openai_model = ChatOpenAI(
-        model=settings.OPENAI_MODEL,
-        temperature=0,
-    )
 
-    response_messages, new_states, tool_call, interaction_data = await handle_chatflow(
-        session_id=session_id,
-        history_messages=history_messages,
-        current_state=current_state,
-        interaction_data=interaction_data,
-        model=openai_model,
-    )
-
-    logger.debug(f"Interaction data after handle_chatflow: {interaction_data}")
+async def _save_turn(
+    db: AsyncSession,
+    interaction: Interaction,
+    history_messages: list[InteractionMessage],
+    response_messages: list[InteractionMessage],
+    new_states: list[ChatflowState],
+    interaction_data: dict,
+):
+    """Persists the turn's messages, states and data in a single commit."""
+    session_id = interaction.session_id
 
     # Update history with new messages from the handler
     history_messages.extend(response_messages)
@@ -122,9 +135,307 @@ async def handle(
 
     logger.debug(f"Interaction data saved for session {session_id}: {interaction.interaction_data}")
 
+
+@router.post("/chatflow", response_model=InteractionResponse)
+async def handle(
+    interaction_request: InteractionRequest,
+    request: Request,
+    db: AsyncSession = Depends(get_db),
+    model: BaseChatModel = Depends(get_chat_model),
+):
+    """
+    Handles a user-assistant interaction for the chatflow operation,
+    continuing a conversation by loading history from the database,
+    appending the new message, and saving the updated history.
+    """
+    logger.info(f"Received chatflow request: {interaction_request.model_dump_json(indent=2)}")
+    session_id = interaction_request.sessionId
+
+    interaction, history_messages, current_state, interaction_data = await _load_interaction(db, interaction_request)
+
+    logger.debug(f"Interaction data before handle_chatflow: {interaction_data}")
+
+    response_messages, new_states, tool_call, interaction_data = await handle_chatflow(
+        session_id=session_id,
+        history_messages=history_messages,
+        current_state=current_state,
+        interaction_data=interaction_data,
+        model=model,
+    )
+
+    logger.debug(f"Interaction data after handle_chatflow: {interaction_data}")
+
+    await _save_turn(db, interaction, history_messages, response_messages, new_states, interaction_data)
+
     return InteractionResponse(
         sessionId=session_id,
         messages=response_messages,
         toolCall=tool_call,
         states=interaction.states,
-    )
\ No newline at end of file
+    )
+
+
+@asynccontextmanager
+async def _streamed_turn(**chatflow_kwargs):
+    """
+    Runs a chatflow turn as a task and yields it with an async iterator over
+    the `(event, data)` pairs it emits, which ends when the turn does. The turn
+    is cancelled if it is still running on exit.
+    """
+    queue: asyncio.Queue = asyncio.Queue()
+    # The task inherits the event sink set while it is created.
+    with event_sink(lambda event, data: queue.put_nowait((event, data))):
+        turn = asyncio.create_task(handle_chatflow(**chatflow_kwargs))
+    turn.add_done_callback(lambda _: queue.put_nowait(None))
+
+    async def events():
+        while (item := await queue.get()) is not None:
+            yield item
+
+    try:
+        yield turn, events()
+    finally:
+        if not turn.done():
+            turn.cancel()
+
+
+def _record_first_token(event: str, started: float, state: dict):
+    if event == "token" and not state.get("first_token"):
+        state["first_token"] = True
+        metrics.increment("chatflow.stream.first_token_ms", (time.perf_counter() - started) * 1000)
+        metrics.increment("chatflow.stream.first_token_turns")
+
+
+def _sse(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+@router.post("/chatflow/stream")
+async def handle_stream(
+    interaction_request: InteractionRequest,
+    model: BaseChatModel = Depends(get_chat_model),
+):
+    """
+    Streaming variant of `/chatflow`, as server-sent events:
+
+    - `state`: a state transition, `{"state": ...}`.
+    - `token`: a piece of a message being generated, `{"delta": ...}`.
+    - `message`: a complete message. Its text is authoritative: if a generation
+      fails midway, it replaces the tokens streamed so far.
+    - `done`: the turn was saved; same body as the `/chatflow` response.
+    - `error`: the turn failed and nothing was saved, `{"error": ...}`.
+
+    The session is only persisted once the whole turn has completed. If the
+    client disconnects, the turn is cancelled and nothing is saved.
+    """
+    logger.info(f"Received chatflow stream request: {interaction_request.model_dump_json(indent=2)}")
+    session_id = interaction_request.sessionId
+
+    async def event_stream():
+        started = time.perf_counter()
+        stream_state = {}
+
+        async with AsyncSessionFactory() as db:
+            try:
+                interaction, history_messages, current_state, interaction_data = await _load_interaction(
+                    db, interaction_request
+                )
+                async with _streamed_turn(
+                    session_id=session_id,
+                    history_messages=history_messages,
+                    current_state=current_state,
+                    interaction_data=interaction_data,
+                    model=model,
+                ) as (turn, events):
+                    async for event, data in events:
+                        _record_first_token(event, started, stream_state)
+                        yield _sse(event, data)
+                    response_messages, new_states, tool_call, interaction_data = turn.result()
+
+                await _save_turn(db, interaction, history_messages, response_messages, new_states, interaction_data)
+            except Exception as e:
+                logger.error(f"Streamed chatflow turn failed for session {session_id}: {e}", exc_info=True)
+                await db.rollback()
+                yield _sse("error", {"error": "An internal server error occurred. Please check the logs for details."})
+                return
+
+        metrics.increment("chatflow.stream.turns")
+        response = InteractionResponse(
+            sessionId=session_id,
+            messages=response_messages,
+            toolCall=tool_call,
+            states=interaction.states,
+        )
+        yield _sse("done", response.model_dump(mode="json"))
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@dataclass
+class _SocketSession:
+    """A conversation held in memory for the lifetime of a WebSocket connection."""
+
+    session_id: str
+    practice_id: Optional[int]
+    history_messages: list[InteractionMessage]
+    states: list[str]
+    interaction_data: dict
+
+
+async def _load_socket_session(db: AsyncSession, session_id: str) -> _SocketSession:
+    result = await db.execute(
+        select(Interaction).where(Interaction.session_id == session_id)
+    )
+    interaction = result.scalar_one_or_none()
+    if not interaction:
+        return _SocketSession(session_id, None, [], [ChatflowState.IDLE.value], {})
+
+    return _SocketSession(
+        session_id=session_id,
+        practice_id=interaction.practice_id,
+        history_messages=[InteractionMessage.model_validate(msg) for msg in interaction.messages],
+        states=list(interaction.states) if interaction.states else [ChatflowState.IDLE.value],
+        interaction_data=dict(interaction.interaction_data or {}),
+    )
+
+
+async def _append_turn(
+    db: AsyncSession,
+    session_id: str,
+    practice_id: Optional[int],
+    new_messages: list[InteractionMessage],
+    new_states: list[ChatflowState],
+    interaction_data: dict,
+    expected_states: int,
+) -> bool:
+    """
+    Persists a turn by appending its messages and states to the stored session,
+    so the cost does not grow with the length of the conversation. The session
+    row is created on its first turn.
+
+    The append only happens if the stored session still has `expected_states`
+    states, the number the caller built the turn on. Returns False, saving
+    nothing, if another writer changed the session in the meantime.
+    """
+    messages = [msg.model_dump(mode="json", exclude_none=True) for msg in new_messages]
+    states = [state.value for state in new_states]
+    statement = insert(Interaction).values(
+        session_id=session_id,
+        practice_id=practice_id,
+        messages=messages,
+        states=[ChatflowState.IDLE.value] + states,
+        interaction_data=interaction_data,
+    )
+    statement = statement.on_conflict_do_update(
+        index_elements=["session_id"],
+        set_={
+            "messages": Interaction.messages.op("||", return_type=JSONB)(literal(messages, JSONB)),
+            "states": Interaction.states.op("||", return_type=JSONB)(literal(states, JSONB)),
+            "interaction_data": interaction_data,
+            "practice_id": func.coalesce(Interaction.practice_id, practice_id),
+        },
+        where=func.jsonb_array_length(Interaction.states) == expected_states,
+    )
+    result = await db.execute(statement.returning(Interaction.session_id))
+    await db.commit()
+    return result.scalar_one_or_none() is not None
+
+
+@router.websocket("/chatflow/ws")
+async def handle_socket(
+    websocket: WebSocket,
+    model: BaseChatModel = Depends(get_chat_model),
+):
+    """
+    WebSocket variant of `/chatflow` for the chat widget. Each client frame is a
+    `/chatflow` request body; all frames of a connection must use the same
+    sessionId. The server sends `{"event": ..., "data": ...}` frames with the
+    same events as `/chatflow/stream`.
+
+    The session's history, state and data are loaded once per connection and
+    kept in memory, so a turn only appends its new messages and states to the
+    stored session. If another client wrote to the session meanwhile, e.g. a
+    second tab or an HTTP request, the turn is not saved: the session is
+    reloaded and the client is asked to send the message again. A failed turn
+    saves nothing and leaves the in-memory session unchanged.
+    """
+    await websocket.accept()
+    chat_session = None
+
+    try:
+        while True:
+            try:
+                interaction_request = InteractionRequest.model_validate(await websocket.receive_json())
+            except (ValidationError, ValueError) as e:
+                await websocket.send_json({"event": "error", "data": {"error": f"Invalid request: {e}"}})
+                continue
+
+            session_id = interaction_request.sessionId
+            if chat_session is None:
+                async with AsyncSessionFactory() as db:
+                    chat_session = await _load_socket_session(db, session_id)
+                logger.info(f"Chatflow socket opened for session {session_id}.")
+            elif session_id != chat_session.session_id:
+                await websocket.send_json({"event": "error", "data": {"error": "sessionId cannot change within a connection"}})
+                continue
+
+            started = time.perf_counter()
+            stream_state = {}
+            practice_id = chat_session.practice_id or interaction_request.practiceId
+            history_messages = chat_session.history_messages + [interaction_request.message]
+            interaction_data = _merge_request_data(dict(chat_session.interaction_data), practice_id, interaction_request)
+
+            try:
+                async with _streamed_turn(
+                    session_id=session_id,
+                    history_messages=history_messages,
+                    current_state=ChatflowState(chat_session.states[-1]),
+                    interaction_data=interaction_data,
+                    model=model,
+                ) as (turn, events):
+                    async for event, data in events:
+                        _record_first_token(event, started, stream_state)
+                        await websocket.send_json({"event": event, "data": data})
+                    response_messages, new_states, tool_call, interaction_data = turn.result()
+
+                async with AsyncSessionFactory() as db:
+                    saved = await _append_turn(
+                        db, session_id, practice_id,
+                        [interaction_request.message, *response_messages], new_states, interaction_data,
+                        expected_states=len(chat_session.states),
+                    )
+                    if not saved:
+                        chat_session = await _load_socket_session(db, session_id)
+            except WebSocketDisconnect:
+                raise
+            except Exception as e:
+                logger.error(f"Chatflow socket turn failed for session {session_id}: {e}", exc_info=True)
+                await websocket.send_json({"event": "error", "data": {"error": "An internal server error occurred. Please check the logs for details."}})
+                continue
+
+            if not saved:
+                logger.warning(f"Session {session_id} was changed by another client, the socket turn was not saved.")
+                metrics.increment("chatflow.ws.conflicts")
+                await websocket.send_json({"event": "error", "data": {"error": "The conversation was updated elsewhere and this message was not saved. Please send it again."}})
+                continue
+
+            chat_session.practice_id = practice_id
+            chat_session.history_messages = history_messages + response_messages
+            chat_session.states = chat_session.states + [state.value for state in new_states]
+            chat_session.interaction_data = interaction_data
+            metrics.increment("chatflow.ws.turns")
+
+            response = InteractionResponse(
+                sessionId=session_id,
+                messages=response_messages,
+                toolCall=tool_call,
+                states=chat_session.states,
+            )
+            await websocket.send_json({"event": "done", "data": response.model_dump(mode="json")})
+    except WebSocketDisconnect:
+        if chat_session:
+            logger.info(f"Chatflow socket closed for session {chat_session.session_id}.")
@@ -1,13 +1,18 @@
+import asyncio
 import logging
+from typing import Optional
 
 from langchain_core.language_models import BaseChatModel
 
+from .intent_classifier import get_intent_classifier
 from .state import ChatflowState
 from .knowledge_data import *
 from .prompts import *
 from .tools import *
-from src.services.embeddings import retrieve_data
+from src.config import settings
+from src.services.embeddings import aembed_retrieval_query, agenerate_answer, aretrieve_context
 from src.shared.enums import InteractionType
+from src.shared.metrics import metrics
 from src.shared.schemas import InteractionMessage
 from src.shared.utils.functions import (call_single_tool,generate_response_text)
 from src.shared.utils.history import get_langchain_history
@@ -45,27 +50,86 @@ async def idle_workflow(
     )
 
 
+async def _classify_intent(
+    history_messages: list[InteractionMessage],
+    model: BaseChatModel,
+) -> Optional[str]:
+    langchain_messages = get_langchain_history(history_messages)
+    context = f"## FAQ Information\n{FAQ_DATA}"
+    tool_results = await call_single_tool(
+        langchain_messages, model, classify_intent, CHATFLOW_SYSTEM_PROMPT, context
+    )
+    return tool_results.get("classify_intent")
+
+
+def _discard_classification(classification: asyncio.Task):
+    """Drops a speculative classification that lost to a knowledge base hit."""
+    metrics.increment("chatflow.speculative.classification_wasted")
+    if classification.done():
+        # The call completed, so its tokens were paid for.
+        metrics.increment("chatflow.speculative.classification_completed_wasted")
+    else:
+        classification.cancel()
+
+
 async def intent_classification_workflow(
     history_messages: list[InteractionMessage],
     interaction_data: dict,
     model: BaseChatModel,
 ) -> tuple[list[InteractionMessage], ChatflowState, str | None, dict]:
     practice_id = interaction_data.get("practice_id")
+    classification = None
+    local_intent = None
+    query_embedding = None
+    intent_classifier = get_intent_classifier()
+    if intent_classifier and history_messages:
+        # Greetings, thanks and goodbyes are resolved without an LLM call. The
+        # message is embedded once, and retrieval reuses the vector.
+        query = history_messages[-1].message
+        try:
+            if intent_classifier.accepts(query):
+                query_embedding = await aembed_retrieval_query(query)
+            local_intent = await intent_classifier.aclassify(query, query_embedding)
+        except Exception as e:
+            logger.warning(f"Could not embed the message for the local intent classifier: {e}")
+
     if practice_id and history_messages:
         query = history_messages[-1].message
-        response, found = retrieve_data(query=query, practice_id=practice_id)
+        if settings.CHATFLOW_SPECULATIVE_CLASSIFICATION and not local_intent:
+            # Classify while retrieving, so a knowledge base miss does not pay
+            # both latencies back to back. A hit still takes priority.
+            metrics.increment("chatflow.speculative.turns")
+            classification = asyncio.create_task(_classify_intent(history_messages, model))
+
+        # Only the context is retrieved here; the answer is written together with
+        # the book-call offer in a single generation.
+        try:
+            context, found = await aretrieve_context(
+                query=query, practice_id=practice_id, query_embedding=query_embedding
+            )
+        except BaseException:
+            if classification:
+                classification.cancel()
+            raise
+
         if found:
-            interaction_data["embeddings_response"] = response
+            if classification:
+                _discard_classification(classification)
+            interaction_data["embeddings_context"] = context
+            interaction_data["embeddings_query"] = query
             return [], ChatflowState.REPLY_FROM_EMBEDDINGS, None, interaction_data
         else:
-            interaction_data.pop("embeddings_response", None)
-
-    langchain_messages = get_langchain_history(history_messages)
-    context = f"## FAQ Information\n{FAQ_DATA}"
-    tool_results = await call_single_tool(
-        langchain_messages, model, classify_intent, CHATFLOW_SYSTEM_PROMPT, context
-    )
-    intent = tool_results.get("classify_intent")
+            if classification:
+                metrics.increment("chatflow.speculative.retrieval_wasted")
+            interaction_data.pop("embeddings_context", None)
+            interaction_data.pop("embeddings_query", None)
+
+    if local_intent:
+        intent = local_intent
+    elif classification:
+        intent = await classification
+    else:
+        intent = await _classify_intent(history_messages, model)
 
     state_map = {
         "is_question_pricing": ChatflowState.INTENT_QUESTION_PRICING,
@@ -149,6 +213,7 @@ async def ask_user_data_workflow(
         model,
         CHATFLOW_SYSTEM_PROMPT,
         context=INSTRUCTION_ACKNOWLEDGE_AND_ASK_USER_DATA,
+        stream=True,
     )
 
     if not response_text:
@@ -245,6 +310,7 @@ async def general_faq_question_workflow(
         model,
         CHATFLOW_SYSTEM_PROMPT,
         context=context,
+        stream=True,
     )
     return (
         [InteractionMessage(role=InteractionType.MODEL, message=response_text)],
@@ -261,7 +327,8 @@ async def offer_book_call_workflow(
 ) -> tuple[list[InteractionMessage], ChatflowState, str | None, dict]:
     frustrated_resp = interaction_data.get("frustrated_response")
     out_of_scope_resp = interaction_data.get("out_of_scope_response")
-    embeddings_resp = interaction_data.get("embeddings_response")
+    embeddings_context = interaction_data.get("embeddings_context")
+    embeddings_query = interaction_data.get("embeddings_query") or history_messages[-1].message
 
     context_parts = ["Create a natural, cohesive response that includes:"]
 
@@ -274,11 +341,13 @@ async def offer_book_call_workflow(
         context_parts.append(f"- This information: {out_of_scope_resp}")
         has_content = True
 
-    if embeddings_resp:
-        context_parts.append(f"- This information from knowledge base: {embeddings_resp}")
+    if embeddings_context:
+        context_parts.append(f"- {INSTRUCTION_ANSWER_FROM_KNOWLEDGE_BASE}. The question: {embeddings_query}")
         has_content = True
 
     context_parts.append(f"- This offer to book a call: {PROMPT_OFFER_BOOK_CALL}")
+    if embeddings_context:
+        context_parts.append(f"\n## Knowledge Base\n{embeddings_context}")
     context_parts.append(
         "\nCreate a single, flowing response. Integrate the acknowledgment or information with the offer to book a call.")
     context = "\n".join(context_parts)
@@ -291,6 +360,7 @@ async def offer_book_call_workflow(
             model,
             CHATFLOW_SYSTEM_PROMPT,
             context=context,
+            stream=True,
         )
 
     if not full_message:
@@ -299,14 +369,18 @@ async def offer_book_call_workflow(
             message_parts.append(frustrated_resp)
         if out_of_scope_resp:
             message_parts.append(out_of_scope_resp)
-        if embeddings_resp:
-            message_parts.append(embeddings_resp)
+        if embeddings_context:
+            try:
+                message_parts.append(await agenerate_answer(embeddings_query, embeddings_context))
+            except Exception as e:
+                logger.error(f"Error answering from knowledge base context: {e}", exc_info=True)
         message_parts.append(PROMPT_OFFER_BOOK_CALL)
         full_message = "\n\n".join(message_parts)
 
     interaction_data.pop("frustrated_response", None)
     interaction_data.pop("out_of_scope_response", None)
-    interaction_data.pop("embeddings_response", None)
+    interaction_data.pop("embeddings_context", None)
+    interaction_data.pop("embeddings_query", None)
 
     return await _send_message(
         history_messages,
@@ -402,6 +476,7 @@ async def book_call_link_accepted_workflow(
         model,
         system_prompt=CHATFLOW_SYSTEM_PROMPT,
         context=context,
+        stream=True,
     )
 
     if not full_message:
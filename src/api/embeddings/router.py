@@ -1,78 +1,467 @@
+import asyncio
 import logging
-from fastapi import APIRouter, HTTPException, status
+import uuid
+from typing import Optional
 
+import regex
+from fastapi import APIRouter, Depends, File, Form, HTTPException, Query, UploadFile, status
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.database.db import get_db
+from src.database.models import IngestionJob, KnowledgeSource, PracticeSettings, RetrievalCalibration, RetrievalScoreHistogram
 from src.services.embeddings import (
     delete_data_from_document,
     delete_data_from_qa_pair,
     delete_data_from_website,
-    store_data_from_document,
-    store_data_from_qa_pair,
-    store_data_from_website,
-    InvalidURLError,
 )
-from src.shared.enums import SourceType
+from src.services.ingestion_jobs import (
+    cancel_ingestion_job,
+    enqueue_batch_ingestion_job,
+    enqueue_calibration_job,
+    enqueue_ingestion_job,
+    enqueue_purge_job,
+    get_ingestion_job,
+)
+from src.services.knowledge_sources import list_practice_knowledge_sources
+from src.services.retrieval_calibration import bucket_upper_bound, get_retrieval_score_histogram
+from src.services.uploads import UploadTooLargeError, discard_upload, save_upload
+from src.services.web_refresh import (
+    effective_refresh_interval,
+    enqueue_web_refresh_job,
+    get_practice_settings,
+    next_refresh_at,
+    update_web_refresh_interval,
+)
+from src.shared.enums import DocType, IngestionJobStatus, IngestionJobType, SourceType
+from src.shared.constants import RETRIEVAL_SCORE_BUCKET_WIDTH, VECTOR_EMBEDDINGS_SIMILARITY_THRESHOLD
 from src.shared.schemas import (
+    CalibrateThresholdsRequest,
+    CreateEmbeddingsBatchRequest,
     CreateEmbeddingsRequest,
     CreateEmbeddingsResponse,
     DeleteEmbeddingsRequest,
     DeleteEmbeddingsResponse,
+    DocumentData,
+    IngestionJobResponse,
+    KnowledgeSourceListResponse,
+    KnowledgeSourceResponse,
+    PurgeEmbeddingsRequest,
+    PurgeSource,
+    RetrievalScoreBucket,
+    RetrievalScoreHistogramResponse,
+    SourceData,
+    WebRefreshSettingsRequest,
+    WebRefreshSettingsResponse,
 )
 
 router = APIRouter()
 logger = logging.getLogger(__name__)
 
 
-@router.post("/embeddings", response_model=CreateEmbeddingsResponse)
-async def create_embeddings(
-    request: CreateEmbeddingsRequest,
-):
-    logger.info(f"Received create embeddings request: {request.model_dump_json(indent=2)}")
+def _job_to_response(job: IngestionJob) -> IngestionJobResponse:
+    return IngestionJobResponse(
+        jobId=job.id,
+        jobType=IngestionJobType(job.job_type),
+        practiceId=job.practice_id,
+        sourceType=SourceType(job.source_type) if job.source_type else None,
+        status=IngestionJobStatus(job.status),
+        progress=job.progress,
+        error=job.error,
+        result=job.result,
+        cancelRequested=job.cancel_requested,
+        createdAt=job.created_at,
+        startedAt=job.started_at,
+        finishedAt=job.finished_at,
+    )
+
+
+def _source_to_response(source: KnowledgeSource) -> KnowledgeSourceResponse:
+    return KnowledgeSourceResponse(
+        sourceType=SourceType(source.source_type),
+        sourceKey=source.source_key,
+        name=source.name,
+        chunkCount=source.chunk_count,
+        crawlRoot=source.crawl_root,
+        createdAt=source.created_at,
+        updatedAt=source.updated_at,
+        lastCheckedAt=source.last_checked_at,
+    )
+
+
+def _web_refresh_settings_to_response(practice_id: int, practice_settings: Optional[PracticeSettings]) -> WebRefreshSettingsResponse:
+    return WebRefreshSettingsResponse(
+        practiceId=practice_id,
+        intervalHours=practice_settings.web_refresh_interval_hours if practice_settings else None,
+        effectiveIntervalHours=effective_refresh_interval(practice_settings),
+        lastRefreshAt=practice_settings.last_web_refresh_at if practice_settings else None,
+        lastRefreshJobId=practice_settings.last_web_refresh_job_id if practice_settings else None,
+        nextRefreshAt=next_refresh_at(practice_settings),
+    )
 
+
+def _score_histogram_to_response(
+    practice_id: int,
+    buckets: list[RetrievalScoreHistogram],
+    calibration: Optional[RetrievalCalibration],
+) -> RetrievalScoreHistogramResponse:
+    counts = {bucket.bucket: bucket.count for bucket in buckets}
+    last_bucket = max(counts, default=-1)
+    return RetrievalScoreHistogramResponse(
+        practiceId=practice_id,
+        bucketWidth=RETRIEVAL_SCORE_BUCKET_WIDTH,
+        samples=sum(counts.values()),
+        buckets=[
+            RetrievalScoreBucket(upperBound=bucket_upper_bound(bucket), count=counts.get(bucket, 0))
+            for bucket in range(last_bucket + 1)
+        ],
+        defaultThreshold=VECTOR_EMBEDDINGS_SIMILARITY_THRESHOLD,
+        calibratedThreshold=calibration.similarity_threshold if calibration else None,
+        targetPassRate=calibration.target_pass_rate if calibration else None,
+        calibratedSamples=calibration.samples if calibration else None,
+        calibratedAt=calibration.calibrated_at if calibration else None,
+    )
+
+
+def _validate_create_request(request: CreateEmbeddingsRequest) -> str:
+    """
+    Checks that the source data required by the request's source type is present.
+    Returns a human readable label of the source type.
+    """
     if request.sourceType == SourceType.WEB_PAGE:
         if not request.sourceData.webPageURL:
             raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="webPageURL is required for WEB_PAGE source type")
-        try:
-            store_data_from_website(request.sourceData.webPageURL, request.practiceId)
-            return CreateEmbeddingsResponse(status="success", message="Embeddings created successfully from web page.")
-        except InvalidURLError as e:
-            logger.error(f"Failed to create embeddings from invalid web page {request.sourceData.webPageURL} for practice {request.practiceId}: {e}", exc_info=True)
-            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="The provided URL is invalid. Please check the URL and try again.")
-        except Exception as e:
-            logger.error(f"Failed to create embeddings from web page {request.sourceData.webPageURL} for practice {request.practiceId}: {e}", exc_info=True)
-            raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="An error occurred while creating embeddings from the web page.")
+        if request.sourceData.crawl:
+            for pattern in request.sourceData.crawl.includePatterns + request.sourceData.crawl.excludePatterns:
+                try:
+                    regex.compile(pattern)
+                except regex.error as e:
+                    raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Invalid crawl pattern '{pattern}': {e}")
+            source_label = "web site crawl"
+        else:
+            source_label = "web page"
     elif request.sourceType == SourceType.QA_PAIR:
         if not request.sourceData.qa_pair:
             raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="qa_pair is required for QA_PAIR source type")
-        try:
-            store_data_from_qa_pair(request.sourceData.qa_pair, request.practiceId)
-            return CreateEmbeddingsResponse(status="success", message="Embeddings created successfully from Q&A pair.")
-        except Exception as e:
-            logger.error(f"Failed to create embeddings from Q&A pair for practice {request.practiceId}: {e}", exc_info=True)
-            raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="An error occurred while creating embeddings from the Q&A pair.")
+        source_label = "Q&A pair"
     elif request.sourceType == SourceType.DOCUMENT:
         if not request.sourceData.document or not request.sourceData.document.data or not request.sourceData.document.docType or not request.sourceData.document.name:
             raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="document with data, docType and name is required for DOCUMENT source type")
-        try:
-            store_data_from_document(request.sourceData.document, request.practiceId)
-            return CreateEmbeddingsResponse(status="success", message="Embeddings created successfully from document.")
-        except Exception as e:
-            logger.error(f"Failed to create embeddings from document for practice {request.practiceId}: {e}", exc_info=True)
-            raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="An error occurred while creating embeddings from the document.")
+        if request.sourceData.document.uploadId:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="uploadId can only be set through the document upload endpoint")
+        source_label = "document"
     else:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Source type '{request.sourceType.value}' not supported.")
+    return source_label
+
+
+@router.post("/embeddings", response_model=CreateEmbeddingsResponse, status_code=status.HTTP_202_ACCEPTED)
+async def create_embeddings(
+    request: CreateEmbeddingsRequest,
+    db: AsyncSession = Depends(get_db),
+):
+    """
+    Validates an embeddings request and queues it for the ingestion worker.
+    The returned job id can be polled through `GET /embeddings/jobs/{job_id}`.
+    """
+    logger.info(
+        f"Received create embeddings request: "
+        f"{request.model_dump_json(indent=2, exclude={'sourceData': {'document': {'data'}}})}"
+    )
+
+    source_label = _validate_create_request(request)
+
+    try:
+        job = await enqueue_ingestion_job(db, request)
+    except Exception as e:
+        logger.error(f"Failed to queue embeddings request from {source_label} for practice {request.practiceId}: {e}", exc_info=True)
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"An error occurred while queuing embeddings from the {source_label}.")
+
+    return CreateEmbeddingsResponse(
+        status="queued",
+        message=f"Embeddings creation from {source_label} queued.",
+        jobId=job.id,
+    )
+
+
+@router.get("/embeddings", response_model=KnowledgeSourceListResponse)
+async def list_embeddings_sources(
+    practiceId: int,
+    sourceType: Optional[SourceType] = None,
+    limit: int = Query(100, ge=1, le=1000),
+    offset: int = Query(0, ge=0),
+    db: AsyncSession = Depends(get_db),
+):
+    """
+    Lists the knowledge sources ingested for a practice, with the number of
+    chunks stored for each.
+    """
+    try:
+        sources, total = await list_practice_knowledge_sources(db, practiceId, sourceType, limit, offset)
+    except Exception as e:
+        logger.error(f"Failed to list knowledge sources for practice {practiceId}: {e}", exc_info=True)
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="An error occurred while listing the knowledge sources.")
+
+    return KnowledgeSourceListResponse(
+        practiceId=practiceId,
+        total=total,
+        items=[_source_to_response(source) for source in sources],
+    )
+
+
+@router.post("/embeddings/documents", response_model=CreateEmbeddingsResponse, status_code=status.HTTP_202_ACCEPTED)
+async def upload_document_embeddings(
+    practiceId: int = Form(...),
+    docType: DocType = Form(...),
+    file: UploadFile = File(...),
+    name: Optional[str] = Form(None),
+    db: AsyncSession = Depends(get_db),
+):
+    """
+    Multipart variant of `POST /embeddings` for DOCUMENT sources. The file is
+    streamed to disk instead of being sent as base64 inside the JSON body, and
+    the ingestion worker converts and embeds it from there.
+    """
+    name = name or file.filename
+    if not name:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="name is required when the file has no filename")
+    logger.info(f"Received document upload '{name}' ({docType.value}) for practice {practiceId}.")
+
+    upload_id = uuid.uuid4()
+    try:
+        await save_upload(file, upload_id)
+    except UploadTooLargeError as e:
+        raise HTTPException(status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, detail=str(e))
+    except Exception as e:
+        logger.error(f"Failed to spool document upload '{name}' for practice {practiceId}: {e}", exc_info=True)
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="An error occurred while receiving the document.")
+
+    request = CreateEmbeddingsRequest(
+        practiceId=practiceId,
+        sourceType=SourceType.DOCUMENT,
+        sourceData=SourceData(document=DocumentData(name=name, docType=docType, uploadId=upload_id)),
+    )
+    try:
+        job = await enqueue_ingestion_job(db, request)
+    except Exception as e:
+        discard_upload(upload_id)
+        logger.error(f"Failed to queue embeddings request from uploaded document for practice {practiceId}: {e}", exc_info=True)
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="An error occurred while queuing embeddings from the document.")
+
+    return CreateEmbeddingsResponse(
+        status="queued",
+        message="Embeddings creation from document queued.",
+        jobId=job.id,
+    )
+
+
+@router.post("/embeddings/batch", response_model=CreateEmbeddingsResponse, status_code=status.HTTP_202_ACCEPTED)
+async def create_embeddings_batch(
+    request: CreateEmbeddingsBatchRequest,
+    db: AsyncSession = Depends(get_db),
+):
+    """
+    Validates many embeddings requests and queues them as a single batch job.
+    The job result reports the outcome of each item in request order.
+    """
+    logger.info(f"Received create embeddings batch request with {len(request.items)} items.")
+
+    for i, item in enumerate(request.items):
+        if item.sourceData.crawl:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Item {i}: crawl is not supported in batch requests")
+        try:
+            _validate_create_request(item)
+        except HTTPException as e:
+            raise HTTPException(status_code=e.status_code, detail=f"Item {i}: {e.detail}")
+
+    try:
+        job = await enqueue_batch_ingestion_job(db, request)
+    except Exception as e:
+        logger.error(f"Failed to queue embeddings batch of {len(request.items)} items: {e}", exc_info=True)
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="An error occurred while queuing the embeddings batch.")
+
+    return CreateEmbeddingsResponse(
+        status="queued",
+        message=f"Embeddings creation for {len(request.items)} items queued.",
+        jobId=job.id,
+    )
+
+
+@router.get("/embeddings/jobs/{job_id}", response_model=IngestionJobResponse)
+async def get_embeddings_job(
+    job_id: str,
+    db: AsyncSession = Depends(get_db),
+):
+    job = await get_ingestion_job(db, job_id)
+    if not job:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Ingestion job '{job_id}' not found.")
+    return _job_to_response(job)
+
+
+@router.post("/embeddings/jobs/{job_id}/cancel", response_model=IngestionJobResponse)
+async def cancel_embeddings_job(
+    job_id: str,
+    db: AsyncSession = Depends(get_db),
+):
+    """
+    Cancels a queued job, or asks a running job to stop at its next checkpoint.
+    """
+    job = await cancel_ingestion_job(db, job_id)
+    if not job:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Ingestion job '{job_id}' not found.")
+    if job.status not in (IngestionJobStatus.CANCELLED.value, IngestionJobStatus.RUNNING.value):
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=f"Ingestion job '{job_id}' already finished with status {job.status}.")
+    return _job_to_response(job)
+
+
+def _validate_purge_source(source: PurgeSource):
+    """Checks that a source to purge carries the field identifying it."""
+    if source.sourceType == SourceType.WEB_PAGE and not source.sourceData.webPageURL:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="webPageURL is required for WEB_PAGE source type")
+    if source.sourceType == SourceType.QA_PAIR and (not source.sourceData.qa_pair or not source.sourceData.qa_pair.question):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="qa_pair with question is required for QA_PAIR source type")
+    if source.sourceType == SourceType.DOCUMENT and (not source.sourceData.document or not source.sourceData.document.name):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="document with name is required for DOCUMENT source type")
+
+
+@router.post("/embeddings/purge", response_model=CreateEmbeddingsResponse, status_code=status.HTTP_202_ACCEPTED)
+async def purge_embeddings(
+    request: PurgeEmbeddingsRequest,
+    db: AsyncSession = Depends(get_db),
+):
+    """
+    Queues a bulk delete of a practice's knowledge base: everything (including
+    its conversations), the sources of some types, or a list of sources.
+    Progress and the number of deleted chunks are reported on the job.
+    """
+    logger.info(
+        f"Received purge request for practice {request.practiceId}: "
+        f"source types {request.sourceTypes}, {len(request.sources or [])} listed sources."
+    )
+
+    if request.sourceTypes and request.sources:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="sourceTypes and sources cannot be combined")
+    for i, source in enumerate(request.sources or []):
+        try:
+            _validate_purge_source(source)
+        except HTTPException as e:
+            raise HTTPException(status_code=e.status_code, detail=f"Source {i}: {e.detail}")
+
+    try:
+        job = await enqueue_purge_job(db, request)
+    except Exception as e:
+        logger.error(f"Failed to queue purge for practice {request.practiceId}: {e}", exc_info=True)
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="An error occurred while queuing the purge.")
+
+    return CreateEmbeddingsResponse(
+        status="queued",
+        message=f"Purge of practice {request.practiceId} queued.",
+        jobId=job.id,
+    )
+
+
+@router.get("/embeddings/web-refresh/{practice_id}", response_model=WebRefreshSettingsResponse)
+async def get_web_refresh_settings(
+    practice_id: int,
+    db: AsyncSession = Depends(get_db),
+):
+    practice_settings = await get_practice_settings(db, practice_id)
+    return _web_refresh_settings_to_response(practice_id, practice_settings)
+
+
+@router.put("/embeddings/web-refresh/{practice_id}", response_model=WebRefreshSettingsResponse)
+async def update_web_refresh_settings(
+    practice_id: int,
+    request: WebRefreshSettingsRequest,
+    db: AsyncSession = Depends(get_db),
+):
+    """
+    Sets how often the practice's web pages are re-fetched. Only pages whose
+    content changed are re-ingested.
+    """
+    try:
+        practice_settings = await update_web_refresh_interval(db, practice_id, request.intervalHours)
+    except Exception as e:
+        logger.error(f"Failed to update web page refresh settings for practice {practice_id}: {e}", exc_info=True)
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="An error occurred while updating the web page refresh settings.")
+    return _web_refresh_settings_to_response(practice_id, practice_settings)
+
+
+@router.post("/embeddings/web-refresh/{practice_id}/run", response_model=CreateEmbeddingsResponse, status_code=status.HTTP_202_ACCEPTED)
+async def run_web_refresh(
+    practice_id: int,
+    db: AsyncSession = Depends(get_db),
+):
+    """
+    Queues an immediate refresh of the practice's web pages. The job result
+    reports which pages were refreshed, skipped as unchanged or failed.
+    """
+    try:
+        job = await enqueue_web_refresh_job(db, practice_id)
+    except Exception as e:
+        logger.error(f"Failed to queue web page refresh for practice {practice_id}: {e}", exc_info=True)
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="An error occurred while queuing the web page refresh.")
+
+    return CreateEmbeddingsResponse(
+        status="queued",
+        message="Web page refresh queued.",
+        jobId=job.id,
+    )
+
+
+@router.get("/embeddings/retrieval-scores/{practice_id}", response_model=RetrievalScoreHistogramResponse)
+async def get_retrieval_scores(
+    practice_id: int,
+    db: AsyncSession = Depends(get_db),
+):
+    """
+    Returns the histogram of the practice's closest-chunk distances, one count
+    per vector search, along with its calibrated similarity threshold if any.
+    """
+    buckets, calibration = await get_retrieval_score_histogram(db, practice_id)
+    return _score_histogram_to_response(practice_id, buckets, calibration)
+
+
+@router.post("/embeddings/retrieval-scores/calibrate", response_model=CreateEmbeddingsResponse, status_code=status.HTTP_202_ACCEPTED)
+async def calibrate_retrieval_thresholds(
+    request: CalibrateThresholdsRequest,
+    db: AsyncSession = Depends(get_db),
+):
+    """
+    Queues the computation of per-practice similarity thresholds from the
+    recorded histograms. The API picks up new thresholds once its cached ones
+    expire.
+    """
+    try:
+        job = await enqueue_calibration_job(db, request)
+    except Exception as e:
+        logger.error(f"Failed to queue similarity threshold calibration: {e}", exc_info=True)
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="An error occurred while queuing the threshold calibration.")
+
+    return CreateEmbeddingsResponse(
+        status="queued",
+        message="Similarity threshold calibration queued.",
+        jobId=job.id,
+    )
 
 
 @router.delete("/embeddings", response_model=DeleteEmbeddingsResponse)
 async def delete_embeddings(
     request: DeleteEmbeddingsRequest,
 ):
+    # The deletes use the blocking vector store and registry clients, so they run
+    # on a worker thread to keep the event loop free.
     logger.info(f"Received delete embeddings request: {request.model_dump_json(indent=2)}")
 
     if request.sourceType == SourceType.WEB_PAGE:
         if not request.sourceData.webPageURL:
             raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="webPageURL is required for WEB_PAGE source type")
         try:
-            deleted_count = delete_data_from_website(request.sourceData.webPageURL, request.practiceId)
+            deleted_count = await asyncio.to_thread(
+                delete_data_from_website,
+                request.sourceData.webPageURL,
+                request.practiceId,
+                crawl=request.sourceData.crawl is not None,
+            )
             return DeleteEmbeddingsResponse(
                 status="success",
                 message=f"Deletion successful for web page. {deleted_count} documents removed.",
@@ -85,7 +474,9 @@ async def delete_embeddings(
         if not request.sourceData.qa_pair or not request.sourceData.qa_pair.question:
             raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="qa_pair with question is required for QA_PAIR source type")
         try:
-            deleted_count = delete_data_from_qa_pair(request.sourceData.qa_pair.question, request.practiceId)
+            deleted_count = await asyncio.to_thread(
+                delete_data_from_qa_pair, request.sourceData.qa_pair.question, request.practiceId
+            )
             return DeleteEmbeddingsResponse(
                 status="success",
                 message=f"Deletion successful for Q&A pair. {deleted_count} documents removed.",
@@ -98,7 +489,9 @@ async def delete_embeddings(
         if not request.sourceData.document or not request.sourceData.document.name:
             raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="document with name is required for DOCUMENT source type")
         try:
-            deleted_count = delete_data_from_document(request.sourceData.document.name, request.practiceId)
+            deleted_count = await asyncio.to_thread(
+                delete_data_from_document, request.sourceData.document.name, request.practiceId
+            )
             return DeleteEmbeddingsResponse(
                 status="success",
                 message=f"Deletion successful for document. {deleted_count} documents removed.",
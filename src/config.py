@@ -2,6 +2,8 @@ from pydantic_settings import BaseSettings, SettingsConfigDict
 from typing import Any, Dict, Optional
 from pydantic import PostgresDsn, field_validator, model_validator
 
+from src.shared.enums import EmbeddingsBackendType, LLMCacheBackendType, VectorStoreBackendType, WebScraperType
+
 
 class Settings(BaseSettings):
     PROJECT_NAME: str = "API FastAPI"
@@ -11,6 +13,40 @@ class Settings(BaseSettings):
     OPENAI_MODEL: str
     GEMINI_MODEL: str
 
+    # LLM HTTP client, shared by all chat models
+    LLM_TIMEOUT_SECONDS: float = 60.0
+    LLM_CONNECT_TIMEOUT_SECONDS: float = 5.0
+    LLM_POOL_TIMEOUT_SECONDS: float = 10.0
+    LLM_MAX_CONNECTIONS: int = 100
+    LLM_MAX_KEEPALIVE_CONNECTIONS: int = 20
+    LLM_KEEPALIVE_EXPIRY_SECONDS: float = 60.0
+    LLM_MAX_RETRIES: int = 2
+
+    # Chatflow
+    # Start intent classification alongside knowledge base retrieval instead of
+    # after a miss. A hit discards the classification, wasting its LLM call.
+    CHATFLOW_SPECULATIVE_CLASSIFICATION: bool = False
+
+    # Local intent classifier: nearest neighbours over labelled examples, in
+    # front of the LLM classification. Low-confidence messages go to the LLM.
+    INTENT_CLASSIFIER_ENABLED: bool = False
+    INTENT_CLASSIFIER_K: int = 5
+    INTENT_CLASSIFIER_MIN_CONFIDENCE: float = 0.8
+    INTENT_CLASSIFIER_MIN_SIMILARITY: float = 0.8
+    INTENT_CLASSIFIER_MAX_WORDS: int = 8
+
+    # LLM response cache for temperature-0 calls, keyed on the model, the bound
+    # tools and the full message list. LLM_CACHE_EXCLUDED_WORKFLOWS is a
+    # comma-separated list of chatflow states whose workflows bypass the cache.
+    # Cached calls are told the date but not the time; workflows whose answers
+    # depend on the time of day must be listed there.
+    LLM_CACHE_ENABLED: bool = False
+    LLM_CACHE_BACKEND: LLMCacheBackendType = LLMCacheBackendType.MEMORY
+    LLM_CACHE_TTL_SECONDS: int = 86400
+    LLM_CACHE_MAX_ENTRIES: int = 10_000
+    LLM_CACHE_PURGE_INTERVAL_SECONDS: int = 3600
+    LLM_CACHE_EXCLUDED_WORKFLOWS: str = ""
+
     # Database
     POSTGRES_HOST: str
     POSTGRES_PORT: int
@@ -44,12 +80,122 @@ class Settings(BaseSettings):
     # Firecrawl
     FIRECRAWL_API_KEY: Optional[str] = None
 
+    # Web scraping and crawling
+    WEB_SCRAPER: WebScraperType = WebScraperType.FIRECRAWL
+    CRAWL_MAX_CONCURRENCY: int = 8
+    CRAWL_DOMAIN_CONCURRENCY: int = 2
+    CRAWL_DOMAIN_REQUESTS_PER_SECOND: float = 2.0
+    CRAWL_REQUEST_TIMEOUT_SECONDS: float = 30.0
+    CRAWL_USER_AGENT: str = "WillowBot/1.0"
+
+    # Vector store
+    VECTOR_STORE_BACKEND: VectorStoreBackendType = VectorStoreBackendType.CHROMA_CLOUD
+
     # Chroma Cloud
     CHROMA_CLOUD_API_KEY: Optional[str] = None
     CHROMA_CLOUD_TENANT: Optional[str] = None
     CHROMA_CLOUD_DATABASE: Optional[str] = None
     CHROMA_CLOUD_COLLECTION: Optional[str] = None
 
+    # Chroma local
+    CHROMA_LOCAL_PATH: str = ".chroma"
+    CHROMA_LOCAL_COLLECTION: str = "knowledge_base"
+
+    # pgvector
+    PGVECTOR_PARTITIONS: int = 16
+    PGVECTOR_HNSW_M: int = 16
+    PGVECTOR_HNSW_EF_CONSTRUCTION: int = 64
+    PGVECTOR_HNSW_EF_SEARCH: int = 40
+    PGVECTOR_HNSW_ITERATIVE_SCAN: str = "relaxed_order"
+
+    @field_validator("PGVECTOR_HNSW_ITERATIVE_SCAN")
+    @classmethod
+    def validate_iterative_scan(cls, v: str) -> str:
+        if v not in ("off", "strict_order", "relaxed_order"):
+            raise ValueError("PGVECTOR_HNSW_ITERATIVE_SCAN must be one of: off, strict_order, relaxed_order")
+        return v
+
+    # Embeddings
+    # EMBEDDINGS_MODEL names the model in the embedding caches, so it must change
+    # along with the backend or the local model.
+    EMBEDDINGS_BACKEND: EmbeddingsBackendType = EmbeddingsBackendType.OPENAI
+    EMBEDDINGS_MODEL: str = "text-embedding-3-small"
+    EMBEDDINGS_DIMENSIONS: int = 1536
+    EMBEDDINGS_CACHE_ENABLED: bool = True
+    EMBEDDINGS_CACHE_PATH: str = ".cache/embeddings.sqlite3"
+    EMBEDDINGS_CACHE_MAX_ENTRIES: int = 500_000
+    QUERY_EMBEDDING_CACHE_MAX_ENTRIES: int = 4096
+    QUERY_EMBEDDING_CACHE_TTL_SECONDS: int = 3600
+
+    # Local ONNX embeddings
+    # EMBEDDINGS_ONNX_MODEL_PATH is a directory with model.onnx and tokenizer.json.
+    EMBEDDINGS_ONNX_MODEL_PATH: Optional[str] = None
+    EMBEDDINGS_ONNX_BATCH_SIZE: int = 32
+    EMBEDDINGS_ONNX_MAX_LENGTH: int = 256
+    EMBEDDINGS_ONNX_POOLING: str = "mean"
+    EMBEDDINGS_ONNX_NORMALIZE: bool = True
+    EMBEDDINGS_ONNX_THREADS: int = 0
+    EMBEDDINGS_ONNX_WORKERS: int = 2
+
+    @field_validator("EMBEDDINGS_ONNX_POOLING")
+    @classmethod
+    def validate_onnx_pooling(cls, v: str) -> str:
+        if v not in ("mean", "cls"):
+            raise ValueError("EMBEDDINGS_ONNX_POOLING must be one of: mean, cls")
+        return v
+
+    # Knowledge source registry
+    # Look up sources missing from the registry in the vector store. Can be
+    # turned off once scripts/backfill_knowledge_sources.py has been run.
+    KNOWLEDGE_SOURCE_REGISTRY_FALLBACK: bool = True
+
+    # Lexical (BM25) index
+    LEXICAL_INDEX_ENABLED: bool = True
+    LEXICAL_INDEX_PATH: str = ".cache/lexical"
+    # Off until calibrated: answers from BM25 alone skip the vector check.
+    LEXICAL_FAST_PATH_ENABLED: bool = False
+
+    # Retrieval threshold calibration
+    # Practices with fewer recorded queries keep the global similarity threshold.
+    # Recorded counts lose half their weight every RETRIEVAL_SCORE_HALF_LIFE_DAYS,
+    # and no practice is loosened by more than RETRIEVAL_CALIBRATION_MAX_LOOSENING
+    # above the global threshold.
+    RETRIEVAL_SCORE_RECORDING_ENABLED: bool = True
+    RETRIEVAL_SCORE_FLUSH_INTERVAL_SECONDS: float = 30.0
+    RETRIEVAL_SCORE_HALF_LIFE_DAYS: float = 14.0
+    RETRIEVAL_CALIBRATION_MIN_SAMPLES: int = 200
+    RETRIEVAL_CALIBRATION_MIN_THRESHOLD: float = 0.6
+    RETRIEVAL_CALIBRATION_MAX_THRESHOLD: float = 1.6
+    RETRIEVAL_CALIBRATION_MAX_LOOSENING: float = 0.1
+    RETRIEVAL_THRESHOLD_CACHE_TTL_SECONDS: int = 300
+
+    # Reranker (ONNX cross-encoder)
+    # RERANKER_MODEL_PATH is a directory with model.onnx and tokenizer.json.
+    RERANKER_ENABLED: bool = False
+    RERANKER_MODEL_PATH: Optional[str] = None
+    RERANKER_CANDIDATES: int = 16
+    RERANKER_TOP_N: int = 3
+    RERANKER_BATCH_SIZE: int = 16
+    RERANKER_MAX_LENGTH: int = 512
+    RERANKER_LATENCY_BUDGET_MS: float = 150.0
+    RERANKER_THREADS: int = 0
+
+    # Document processing
+    DOCUMENT_PROCESSING_WORKERS: int = 2
+    DOCUMENT_UPLOAD_DIR: str = ".cache/uploads"
+    DOCUMENT_UPLOAD_MAX_BYTES: int = 100 * 1024 * 1024
+
+    # Web page refresh
+    WEB_REFRESH_DEFAULT_INTERVAL_HOURS: int = 24
+    WEB_REFRESH_SCHEDULER_INTERVAL_SECONDS: float = 300.0
+
+    # Ingestion worker
+    INGESTION_WORKER_CONCURRENCY: int = 1
+    INGESTION_WORKER_POLL_INTERVAL_SECONDS: float = 2.0
+    INGESTION_JOB_HEARTBEAT_SECONDS: float = 10.0
+    INGESTION_JOB_LEASE_SECONDS: int = 300
+    INGESTION_JOB_MAX_ATTEMPTS: int = 3
+
 
     model_config = SettingsConfigDict(
         env_file=".env", env_file_encoding="utf-8", extra="ignore"
@@ -1,6 +1,6 @@
 import sys
 import logging
-from sqlalchemy import text
+from sqlalchemy import create_engine, text
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
 from sqlalchemy.orm import declarative_base, sessionmaker
 
@@ -16,6 +16,8 @@ AsyncSessionFactory = sessionmaker(
 
 Base = declarative_base()
 
+_sync_engine = None
+
 
 async def get_db():
     """FastAPI dependency to get a DB session."""
@@ -23,6 +25,51 @@ async def get_db():
         yield session
 
 
+def get_sync_engine():
+    """
+    Returns a blocking engine on the same database, for code that runs on
+    worker threads outside the event loop (e.g. ingestion).
+    """
+    global _sync_engine
+    if _sync_engine is None:
+        _sync_engine = create_engine(
+            engine.url.set(drivername="postgresql+psycopg2"), pool_pre_ping=True
+        )
+    return _sync_engine
+
+
+# Changes to tables made after they were first created. `create_all` never
+# alters an existing table, so these bring older databases up to date; each
+# statement is a no-op once applied.
+SCHEMA_UPGRADES = [
+    # Batch ingestion jobs: a job type and result, and no single practice or source type.
+    "ALTER TABLE ingestion_jobs ADD COLUMN IF NOT EXISTS job_type VARCHAR NOT NULL DEFAULT 'INGEST'",
+    "ALTER TABLE ingestion_jobs ADD COLUMN IF NOT EXISTS result JSONB",
+    "ALTER TABLE ingestion_jobs ALTER COLUMN practice_id DROP NOT NULL",
+    "ALTER TABLE ingestion_jobs ALTER COLUMN source_type DROP NOT NULL",
+    # Decay of the retrieval score histograms.
+    "ALTER TABLE retrieval_score_histograms ADD COLUMN IF NOT EXISTS decayed_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT now()",
+]
+
+
+async def create_tables():
+    """
+    Creates any missing tables for the registered models, then applies the
+    schema upgrades to existing ones. Tables that belong to a vector store
+    backend are only created when that backend is selected.
+    """
+    from src.database import models  # noqa: F401
+
+    tables = [
+        table for table in Base.metadata.sorted_tables
+        if table.info.get("vector_store_backend") in (None, settings.VECTOR_STORE_BACKEND)
+    ]
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all, tables=tables)
+        for statement in SCHEMA_UPGRADES:
+            await conn.execute(text(statement))
+
+
 async def test_db_connection():
     """
     Tests the database connection.
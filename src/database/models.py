@@ -1,6 +1,11 @@
-from sqlalchemy import Column, String, JSON, Boolean, Integer
+import uuid
+
+from pgvector.sqlalchemy import Vector
+from sqlalchemy import Column, DDL, String, JSON, BigInteger, Boolean, Integer, Float, DateTime, Index, Text, event, func
 from sqlalchemy.dialects.postgresql import JSONB
 
+from src.config import settings
+from src.shared.enums import IngestionJobStatus, IngestionJobType, VectorStoreBackendType
 from .db import Base
 
 
@@ -16,3 +21,178 @@ class Interaction(Base):
     messages = Column(JSONB, nullable=False)
     states = Column(JSONB, nullable=False, server_default='["IDLE"]')
     interaction_data = Column(JSON, nullable=True)
+
+
+class IngestionJob(Base):
+    """
+    Represents a queued embeddings ingestion request processed by the ingestion worker.
+    """
+
+    __tablename__ = "ingestion_jobs"
+
+    id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
+    job_type = Column(String, nullable=False, default=IngestionJobType.INGEST.value)
+    practice_id = Column(Integer, index=True, nullable=True)
+    source_type = Column(String, nullable=True)
+    payload = Column(JSONB, nullable=False)
+    result = Column(JSONB, nullable=True)
+    status = Column(String, index=True, nullable=False, default=IngestionJobStatus.QUEUED.value)
+    progress = Column(Float, nullable=False, default=0.0)
+    error = Column(String, nullable=True)
+    cancel_requested = Column(Boolean, nullable=False, default=False)
+    attempts = Column(Integer, nullable=False, default=0)
+    worker_id = Column(String, nullable=True)
+    lease_expires_at = Column(DateTime(timezone=True), nullable=True)
+    created_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now(), onupdate=func.now())
+    started_at = Column(DateTime(timezone=True), nullable=True)
+    finished_at = Column(DateTime(timezone=True), nullable=True)
+
+
+class PracticeSettings(Base):
+    """
+    Represents per-practice settings, such as how often its web pages are re-checked.
+    """
+
+    __tablename__ = "practice_settings"
+
+    practice_id = Column(Integer, primary_key=True)
+    # None uses WEB_REFRESH_DEFAULT_INTERVAL_HOURS, 0 disables scheduled refreshes.
+    web_refresh_interval_hours = Column(Integer, nullable=True)
+    last_web_refresh_at = Column(DateTime(timezone=True), nullable=True)
+    last_web_refresh_job_id = Column(String, nullable=True)
+    updated_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now(), onupdate=func.now())
+
+
+class KnowledgeSource(Base):
+    """
+    Represents an ingested knowledge source (Q&A pair, document or web page) and
+    the ids of its chunks in the vector store, so that sources can be listed,
+    checked and deleted without scanning the vector store's metadata.
+    """
+
+    __tablename__ = "knowledge_sources"
+    __table_args__ = (
+        Index("knowledge_sources_crawl_root_idx", "practice_id", "crawl_root"),
+    )
+
+    practice_id = Column(Integer, primary_key=True)
+    source_type = Column(String, primary_key=True)
+    # doc_id for Q&A pairs and documents, URL for web pages.
+    source_key = Column(String, primary_key=True)
+    name = Column(String, nullable=False)
+    crawl_root = Column(String, nullable=True)
+    # Chunk id -> chunk content hash.
+    chunks = Column(JSONB, nullable=False)
+    chunk_count = Column(Integer, nullable=False, default=0)
+    # Fingerprint of the whole source; for web pages, of the scraped content.
+    # None for sources registered from existing chunks, whose content is unknown.
+    content_hash = Column(String, nullable=True)
+    created_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now(), onupdate=func.now())
+    last_checked_at = Column(DateTime(timezone=True), nullable=True)
+
+
+class RetrievalScoreHistogram(Base):
+    """
+    Represents how many of a practice's queries had their closest chunk at a
+    distance within a histogram bucket. Only queries answered by vector search
+    are counted, and counts decay with RETRIEVAL_SCORE_HALF_LIFE_DAYS.
+    """
+
+    __tablename__ = "retrieval_score_histograms"
+
+    practice_id = Column(Integer, primary_key=True)
+    # Bucket i covers distances in [i, i + 1) * RETRIEVAL_SCORE_BUCKET_WIDTH; the
+    # last bucket also holds every larger distance.
+    bucket = Column(Integer, primary_key=True)
+    count = Column(BigInteger, nullable=False, default=0)
+    updated_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now(), onupdate=func.now())
+    # When the count was last aged by the calibration job.
+    decayed_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now())
+
+
+class RetrievalCalibration(Base):
+    """
+    Represents the similarity threshold computed for a practice by the
+    calibration job from its retrieval score histogram.
+    """
+
+    __tablename__ = "retrieval_calibrations"
+
+    practice_id = Column(Integer, primary_key=True)
+    similarity_threshold = Column(Float, nullable=False)
+    # Share of queries, across all practices, that the global threshold lets
+    # through; the practice's threshold lets the same share of its queries through.
+    target_pass_rate = Column(Float, nullable=False)
+    samples = Column(BigInteger, nullable=False)
+    calibrated_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now())
+
+
+class Chunk(Base):
+    """
+    Represents an embedded knowledge base chunk stored by the pgvector backend.
+
+    The table is hash-partitioned by practice_id, so a practice's chunks live in
+    a single partition with its own HNSW index, and a search filtered on
+    practice_id only scans that partition.
+    """
+
+    __tablename__ = "chunks"
+    __table_args__ = (
+        Index("chunks_id_idx", "id"),
+        Index(
+            "chunks_metadata_idx",
+            "metadata",
+            postgresql_using="gin",
+            postgresql_ops={"metadata": "jsonb_path_ops"},
+        ),
+        Index(
+            "chunks_embedding_hnsw_idx",
+            "embedding",
+            postgresql_using="hnsw",
+            postgresql_with={
+                "m": settings.PGVECTOR_HNSW_M,
+                "ef_construction": settings.PGVECTOR_HNSW_EF_CONSTRUCTION,
+            },
+            postgresql_ops={"embedding": "vector_l2_ops"},
+        ),
+        {
+            "postgresql_partition_by": "HASH (practice_id)",
+            "info": {"vector_store_backend": VectorStoreBackendType.PGVECTOR},
+        },
+    )
+
+    practice_id = Column(Integer, primary_key=True)
+    id = Column(String, primary_key=True)
+    document = Column(Text, nullable=False)
+    chunk_metadata = Column("metadata", JSONB, nullable=False)
+    embedding = Column(Vector(settings.EMBEDDINGS_DIMENSIONS), nullable=False)
+    updated_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now(), onupdate=func.now())
+
+
+event.listen(Chunk.__table__, "before_create", DDL("CREATE EXTENSION IF NOT EXISTS vector"))
+for _remainder in range(settings.PGVECTOR_PARTITIONS):
+    event.listen(
+        Chunk.__table__,
+        "after_create",
+        DDL(
+            f"CREATE TABLE IF NOT EXISTS chunks_p{_remainder} PARTITION OF chunks "
+            f"FOR VALUES WITH (MODULUS {settings.PGVECTOR_PARTITIONS}, REMAINDER {_remainder})"
+        ),
+    )
+
+
+class LLMCacheEntry(Base):
+    """
+    Represents a cached chat model response, keyed on a hash of the model, the
+    bound tools and the full message list of a temperature-0 call.
+    """
+
+    __tablename__ = "llm_response_cache"
+
+    key = Column(String(32), primary_key=True)
+    model = Column(String, nullable=False)
+    response = Column(JSONB, nullable=False)
+    created_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now())
+    expires_at = Column(DateTime(timezone=True), nullable=False, index=True)
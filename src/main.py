@@ -1,3 +1,4 @@
+import asyncio
 import logging
 from contextlib import asynccontextmanager
 
@@ -8,8 +9,13 @@ from starlette.exceptions import HTTPException as StarletteHTTPException
 from src.api.chatflow.router import router as chatflow_router
 from src.api.embeddings.router import router as embeddings_router
 from src.config import settings
-from src.database.db import engine, test_db_connection
-from src.shared.schemas import HealthResponse
+from src.database.db import create_tables, engine, test_db_connection
+from src.services.llm_cache import get_llm_cache
+from src.services.llm_clients import close_llm_clients, get_llm_clients
+from src.services.reranker import get_reranker
+from src.services.retrieval_calibration import score_recorder
+from src.shared.metrics import metrics
+from src.shared.schemas import HealthResponse, MetricsResponse
 
 log_level = settings.LOG_LEVEL.upper()
 logging.basicConfig(
@@ -26,6 +32,27 @@ if log_level != "DEBUG":
 logger = logging.getLogger(__name__)
 
 
+async def _flush_retrieval_scores():
+    """Periodically writes the recorded retrieval scores to the database."""
+    while True:
+        await asyncio.sleep(settings.RETRIEVAL_SCORE_FLUSH_INTERVAL_SECONDS)
+        try:
+            await asyncio.to_thread(score_recorder.flush)
+        except Exception as e:
+            logger.error(f"Failed to flush retrieval scores: {e}", exc_info=True)
+
+
+async def _purge_llm_cache():
+    """Periodically deletes expired LLM cache entries."""
+    while True:
+        await asyncio.sleep(settings.LLM_CACHE_PURGE_INTERVAL_SECONDS)
+        try:
+            purged = await get_llm_cache().apurge_expired()
+            logger.debug(f"Purged {purged} expired LLM cache entries.")
+        except Exception as e:
+            logger.error(f"Failed to purge the LLM cache: {e}", exc_info=True)
+
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # Startup
@@ -36,15 +63,25 @@ async def lifespan(app: FastAPI):
         )
     else:
         logger.debug("Database connection successful.")
+        await create_tables()
 
-    yield
-    # Shutdown
-    logger.info("Shutting down application...")
-    await engine.dispose()
+    app.state.llm_clients = get_llm_clients()
+    # Loads and warms up the reranker model before the first query needs it.
+    await asyncio.to_thread(get_reranker)
+    score_flusher = asyncio.create_task(_flush_retrieval_scores())
+    cache_purger = asyncio.create_task(_purge_llm_cache()) if get_llm_cache() else None
 
     yield
     # Shutdown
     logger.info("Shutting down application...")
+    score_flusher.cancel()
+    if cache_purger:
+        cache_purger.cancel()
+    try:
+        await asyncio.to_thread(score_recorder.flush)
+    except Exception as e:
+        logger.error(f"Failed to flush retrieval scores on shutdown: {e}", exc_info=True)
+    await close_llm_clients()
     await engine.dispose()
 
 
@@ -83,3 +120,11 @@ async def health_check(request: Request):
         status="ok",
         db_connection="ok" if db_ok else "failed",
     )
+
+
+@app.get("/metrics", response_model=MetricsResponse, tags=["Health"])
+async def get_metrics():
+    """
+    Returns the process-local counters, such as embedding cache hits and misses.
+    """
+    return MetricsResponse(counters=metrics.snapshot())
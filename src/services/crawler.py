@@ -0,0 +1,143 @@
+import asyncio
+import logging
+from collections import defaultdict, deque
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Optional
+from urllib.parse import urldefrag, urljoin, urlparse
+
+import regex
+
+from src.config import settings
+from src.services.scrapers import InvalidURLError, Scraper, ScrapedPage
+from src.shared.constants import CRAWL_SKIPPED_EXTENSIONS
+from src.shared.schemas import CrawlOptions
+
+logger = logging.getLogger(__name__)
+
+
+class DomainRateLimiter:
+    """
+    Bounds the number of concurrent requests to each domain and spaces out
+    the start of consecutive requests to it.
+    """
+
+    def __init__(self, concurrency: int, requests_per_second: float):
+        self._semaphores = defaultdict(lambda: asyncio.Semaphore(concurrency))
+        self._next_start = defaultdict(float)
+        self._interval = 1.0 / requests_per_second if requests_per_second > 0 else 0.0
+
+    @asynccontextmanager
+    async def limit(self, url: str):
+        domain = urlparse(url).netloc
+        async with self._semaphores[domain]:
+            now = asyncio.get_running_loop().time()
+            start = max(now, self._next_start[domain])
+            self._next_start[domain] = start + self._interval
+            if start > now:
+                await asyncio.sleep(start - now)
+            yield
+
+
+def normalize_url(url: str) -> Optional[str]:
+    """Drops the fragment and lower-cases the scheme and host. Returns None for non-HTTP URLs."""
+    url, _ = urldefrag(url.strip())
+    parsed = urlparse(url)
+    if parsed.scheme.lower() not in ("http", "https") or not parsed.netloc:
+        return None
+    return parsed._replace(scheme=parsed.scheme.lower(), netloc=parsed.netloc.lower()).geturl()
+
+
+class SiteCrawler:
+    """
+    Breadth-first crawl of a site from a root URL, limited to the root's domain,
+    `maxDepth` link hops and `maxPages` pages. Discovered links must match one of
+    the include patterns (if any) and none of the exclude patterns.
+
+    Pages are fetched concurrently and yielded as soon as each one arrives, so the
+    caller can chunk and embed a page while the next ones are still downloading.
+    """
+
+    def __init__(
+        self,
+        root_url: str,
+        options: CrawlOptions,
+        scraper: Scraper,
+        limiter: Optional[DomainRateLimiter] = None,
+    ):
+        self.root_url = normalize_url(root_url)
+        if not self.root_url:
+            raise InvalidURLError(f"The URL '{root_url}' is invalid or could not be scraped.")
+        self.options = options
+        self.scraper = scraper
+        self.limiter = limiter or DomainRateLimiter(
+            settings.CRAWL_DOMAIN_CONCURRENCY, settings.CRAWL_DOMAIN_REQUESTS_PER_SECOND
+        )
+        self.domain = urlparse(self.root_url).netloc
+        self.include = [regex.compile(pattern) for pattern in options.includePatterns]
+        self.exclude = [regex.compile(pattern) for pattern in options.excludePatterns]
+        self.failed: list[str] = []
+
+    def _in_scope(self, url: str) -> bool:
+        parsed = urlparse(url)
+        if parsed.netloc != self.domain:
+            return False
+        if parsed.path.lower().endswith(CRAWL_SKIPPED_EXTENSIONS):
+            return False
+        if self.include and not any(pattern.search(url) for pattern in self.include):
+            return False
+        return not any(pattern.search(url) for pattern in self.exclude)
+
+    async def _fetch(self, url: str) -> Optional[ScrapedPage]:
+        async with self.limiter.limit(url):
+            return await self.scraper.scrape(url, include_links=True)
+
+    async def pages(self) -> AsyncIterator[ScrapedPage]:
+        seen = {self.root_url}
+        frontier = deque([(self.root_url, 0)])
+        in_flight = {}
+
+        def fill():
+            while frontier and len(in_flight) < settings.CRAWL_MAX_CONCURRENCY:
+                url, depth = frontier.popleft()
+                in_flight[asyncio.create_task(self._fetch(url))] = (url, depth)
+
+        try:
+            fill()
+            while in_flight:
+                done, _ = await asyncio.wait(in_flight, return_when=asyncio.FIRST_COMPLETED)
+                arrived = []
+                for task in done:
+                    url, depth = in_flight.pop(task)
+                    try:
+                        page = task.result()
+                    except InvalidURLError:
+                        if url == self.root_url:
+                            raise
+                        logger.warning(f"Skipping invalid URL {url} found while crawling {self.root_url}.")
+                        self.failed.append(url)
+                        continue
+                    except Exception as e:
+                        logger.warning(f"Failed to scrape {url} while crawling {self.root_url}: {e}")
+                        self.failed.append(url)
+                        continue
+                    if not page:
+                        continue
+
+                    if depth < self.options.maxDepth:
+                        for link in page.links:
+                            link = normalize_url(urljoin(page.url, link))
+                            if not link or link in seen or len(seen) >= self.options.maxPages:
+                                continue
+                            if self._in_scope(link):
+                                seen.add(link)
+                                frontier.append((link, depth + 1))
+                    arrived.append(page)
+
+                # Start the next fetches before handing pages over, so downloads
+                # continue while the caller processes them.
+                fill()
+                for page in arrived:
+                    yield page
+        finally:
+            for task in in_flight:
+                task.cancel()
@@ -0,0 +1,208 @@
+import base64
+import json
+import logging
+import multiprocessing
+import os
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+from functools import lru_cache
+from typing import Iterable, Iterator, Optional
+
+import pypandoc
+import regex
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+from src.config import settings
+from src.shared.constants import INVALID_UNICODE_CLEANUP_REGEX
+from src.shared.enums import DocType
+from src.shared.schemas import DocumentData
+
+logger = logging.getLogger(__name__)
+
+# Uploaded files are read and split in segments of about this many characters,
+# cut at paragraph boundaries, so memory use does not grow with the file size.
+FILE_SEGMENT_CHARS = 64 * 1024
+
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_lock = threading.Lock()
+
+
+def new_text_splitter() -> RecursiveCharacterTextSplitter:
+    return RecursiveCharacterTextSplitter.from_tiktoken_encoder(
+        chunk_size=512,
+        chunk_overlap=128,
+    )
+
+
+@lru_cache(maxsize=1)
+def get_text_splitter() -> RecursiveCharacterTextSplitter:
+    """
+    Returns this process's text splitter. Building one loads the tiktoken
+    encoder, so it is built once and reused; splitting is stateless.
+    """
+    return new_text_splitter()
+
+
+def clean_text(text: str) -> str:
+    return regex.sub(INVALID_UNICODE_CLEANUP_REGEX, '', text)
+
+
+def split_text(text: str) -> list[str]:
+    """Cleans and splits text into chunks with this process's splitter."""
+    return get_text_splitter().split_text(clean_text(text))
+
+
+def parse_document(document_data: DocumentData) -> Optional[list[str]]:
+    """
+    Decodes, converts, cleans and splits a document into chunk texts.
+    Returns None for unsupported document types. Runs inside a pool process.
+    """
+    decoded_data = base64.b64decode(document_data.data)
+    if document_data.docType == DocType.DOCX:
+        # Note: pypandoc requires pandoc to be installed on the system.
+        content = pypandoc.convert_text(decoded_data, "markdown", format="docx")
+    elif document_data.docType == DocType.TXT:
+        content = decoded_data.decode('utf-8')
+    else:
+        return None
+    return split_text(content)
+
+
+def _iter_text_segments(path: str) -> Iterator[str]:
+    """
+    Reads a text file in segments of roughly `FILE_SEGMENT_CHARS`, ending each
+    segment on a blank line (or, failing that, a line break) so that segment
+    boundaries fall where the splitter would prefer to cut anyway.
+    """
+    lines = []
+    size = 0
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            lines.append(line)
+            size += len(line)
+            at_paragraph_end = not line.strip()
+            if (size >= FILE_SEGMENT_CHARS and at_paragraph_end) or size >= 4 * FILE_SEGMENT_CHARS:
+                yield "".join(lines)
+                lines = []
+                size = 0
+    if lines:
+        yield "".join(lines)
+
+
+def _write_chunks(segments: Iterable[str], output_path: str) -> int:
+    count = 0
+    with open(output_path, "w", encoding="utf-8") as out:
+        for segment in segments:
+            for chunk in split_text(segment):
+                out.write(json.dumps(chunk) + "\n")
+                count += 1
+    return count
+
+
+def parse_document_file(input_path: str, doc_type: DocType, output_path: str) -> Optional[int]:
+    """
+    Converts, cleans and splits a document stored on disk, writing the chunk
+    texts to `output_path` as JSON lines. Returns the number of chunks, or None
+    for unsupported document types. Runs inside a pool process.
+    """
+    if doc_type == DocType.DOCX:
+        # Pandoc reads the file itself and writes the markdown next to it.
+        markdown_path = f"{input_path}.md"
+        pypandoc.convert_file(input_path, "markdown", format="docx", outputfile=markdown_path)
+        try:
+            return _write_chunks(_iter_text_segments(markdown_path), output_path)
+        finally:
+            os.remove(markdown_path)
+    elif doc_type == DocType.TXT:
+        return _write_chunks(_iter_text_segments(input_path), output_path)
+    return None
+
+
+def iter_chunk_file(path: str, batch_size: int) -> Iterator[list[str]]:
+    """Reads the chunk texts written by `parse_document_file` in batches."""
+    batch = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            batch.append(json.loads(line))
+            if len(batch) >= batch_size:
+                yield batch
+                batch = []
+    if batch:
+        yield batch
+
+
+def _init_worker():
+    # Warm the splitter (and its tiktoken encoder) before the first task arrives.
+    get_text_splitter()
+
+
+def _get_pool() -> ProcessPoolExecutor:
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            # Spawn rather than fork: the ingestion worker has threads and an event loop.
+            _pool = ProcessPoolExecutor(
+                max_workers=settings.DOCUMENT_PROCESSING_WORKERS,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_worker,
+            )
+            logger.info(f"Started document processing pool with {settings.DOCUMENT_PROCESSING_WORKERS} workers.")
+        return _pool
+
+
+def _submit(fn, *args) -> Future:
+    global _pool
+    try:
+        return _get_pool().submit(fn, *args)
+    except BrokenProcessPool:
+        logger.warning("Document processing pool is broken, starting a new one.")
+        with _pool_lock:
+            _pool = None
+        return _get_pool().submit(fn, *args)
+
+
+class DocumentParseBatch:
+    """
+    Documents submitted together to the processing pool. Iterating yields
+    `(index, future)` pairs in completion order, so callers can handle each
+    document as soon as it is parsed while the others are still being converted.
+    Used as a context manager, documents not consumed yet are cancelled on exit.
+    """
+
+    def __init__(self, documents: list[DocumentData]):
+        self._futures = {_submit(parse_document, document_data): i for i, document_data in enumerate(documents)}
+
+    def __iter__(self) -> Iterator[tuple[int, Future]]:
+        for future in as_completed(self._futures):
+            yield self._futures[future], future
+
+    def __enter__(self) -> "DocumentParseBatch":
+        return self
+
+    def __exit__(self, *exc_info):
+        for future in self._futures:
+            future.cancel()
+
+
+def parse_documents(documents: list[DocumentData]) -> DocumentParseBatch:
+    """Submits documents to the processing pool; see `DocumentParseBatch`."""
+    return DocumentParseBatch(documents)
+
+
+def parse_document_in_pool(document_data: DocumentData) -> Optional[list[str]]:
+    """Parses a single document in the processing pool and waits for the result."""
+    return _submit(parse_document, document_data).result()
+
+
+def parse_document_file_in_pool(input_path: str, doc_type: DocType, output_path: str) -> Optional[int]:
+    """Parses a document file in the processing pool and waits for the chunk count."""
+    return _submit(parse_document_file, input_path, doc_type, output_path).result()
+
+
+def shutdown_document_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(cancel_futures=True)
+            _pool = None
@@ -0,0 +1,236 @@
+import asyncio
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Awaitable, Callable
+
+import numpy as np
+import regex
+from cachetools import TTLCache
+from langchain_core.embeddings import Embeddings
+
+from src.shared.metrics import metrics
+from src.shared.utils.hashing import cache_key_hash
+
+logger = logging.getLogger(__name__)
+
+
+class EmbeddingCacheStore:
+    """
+    On-disk store of embedding vectors keyed by (model, text hash), backed by SQLite.
+
+    The store is bounded to `max_entries` vectors; when it grows past that, the
+    least recently used entries are evicted. WAL mode lets the API and the
+    ingestion worker share the same file.
+    """
+
+    def __init__(self, path: str, max_entries: int):
+        self.path = path
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            " model TEXT NOT NULL,"
+            " text_hash TEXT NOT NULL,"
+            " vector BLOB NOT NULL,"
+            " last_used REAL NOT NULL,"
+            " PRIMARY KEY (model, text_hash))"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS embeddings_last_used ON embeddings (last_used)")
+        self._approximate_size = self._count()
+
+    def _count(self) -> int:
+        return self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+
+    def get_many(self, model: str, text_hashes: list[str]) -> dict[str, list[float]]:
+        if not text_hashes:
+            return {}
+
+        found = {}
+        with self._lock:
+            # Stay well under SQLite's bound parameter limit.
+            for start in range(0, len(text_hashes), 500):
+                chunk = text_hashes[start:start + 500]
+                placeholders = ",".join("?" * len(chunk))
+                rows = self._conn.execute(
+                    f"SELECT text_hash, vector FROM embeddings WHERE model = ? AND text_hash IN ({placeholders})",
+                    [model, *chunk],
+                ).fetchall()
+                found.update(
+                    (text_hash, np.frombuffer(vector, dtype=np.float32).tolist()) for text_hash, vector in rows
+                )
+            if found:
+                now = time.time()
+                self._conn.executemany(
+                    "UPDATE embeddings SET last_used = ? WHERE model = ? AND text_hash = ?",
+                    [(now, model, text_hash) for text_hash in found],
+                )
+        return found
+
+    def put_many(self, model: str, vectors: dict[str, list[float]]):
+        if not vectors:
+            return
+
+        now = time.time()
+        with self._lock:
+            self._conn.executemany(
+                "INSERT INTO embeddings (model, text_hash, vector, last_used) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT (model, text_hash) DO UPDATE SET last_used = excluded.last_used",
+                [
+                    (model, text_hash, np.asarray(vector, dtype=np.float32).tobytes(), now)
+                    for text_hash, vector in vectors.items()
+                ],
+            )
+            self._approximate_size += len(vectors)
+            if self._approximate_size > self.max_entries:
+                self._evict()
+
+    def _evict(self):
+        self._approximate_size = self._count()
+        excess = self._approximate_size - self.max_entries
+        if excess <= 0:
+            return
+        self._conn.execute(
+            "DELETE FROM embeddings WHERE rowid IN (SELECT rowid FROM embeddings ORDER BY last_used LIMIT ?)",
+            (excess,),
+        )
+        self._approximate_size -= excess
+        metrics.increment("embedding_cache.evictions", excess)
+        logger.info(f"Evicted {excess} least recently used entries from the embedding cache.")
+
+
+class CachedEmbeddings(Embeddings):
+    """
+    Embeddings wrapper that serves vectors for previously seen texts from an
+    `EmbeddingCacheStore` and only sends the misses to the underlying model.
+    """
+
+    def __init__(self, underlying: Embeddings, model: str, store: EmbeddingCacheStore):
+        self.underlying = underlying
+        self.model = model
+        self.store = store
+
+    def _lookup(self, texts: list[str]) -> tuple[list[str], dict[str, list[float]], list[str]]:
+        text_hashes = [cache_key_hash(text) for text in texts]
+        try:
+            cached = self.store.get_many(self.model, list(dict.fromkeys(text_hashes)))
+        except sqlite3.Error as e:
+            logger.warning(f"Embedding cache lookup failed, computing all embeddings: {e}")
+            cached = {}
+
+        missing = {}
+        for text, text_hash in zip(texts, text_hashes):
+            if text_hash not in cached:
+                missing.setdefault(text_hash, text)
+
+        miss_count = sum(1 for text_hash in text_hashes if text_hash in missing)
+        metrics.increment("embedding_cache.hits", len(texts) - miss_count)
+        metrics.increment("embedding_cache.misses", miss_count)
+        return text_hashes, cached, list(missing)
+
+    def _store(self, vectors: dict[str, list[float]]):
+        try:
+            self.store.put_many(self.model, vectors)
+        except sqlite3.Error as e:
+            logger.warning(f"Failed to write {len(vectors)} embeddings to the cache: {e}")
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        text_hashes, cached, missing_hashes = self._lookup(texts)
+        if missing_hashes:
+            text_by_hash = dict(zip(text_hashes, texts))
+            computed = self.underlying.embed_documents([text_by_hash[h] for h in missing_hashes])
+            new_vectors = dict(zip(missing_hashes, computed))
+            self._store(new_vectors)
+            cached.update(new_vectors)
+        return [cached[text_hash] for text_hash in text_hashes]
+
+    def embed_query(self, text: str) -> list[float]:
+        text_hashes, cached, missing_hashes = self._lookup([text])
+        if missing_hashes:
+            vector = self.underlying.embed_query(text)
+            self._store({text_hashes[0]: vector})
+            return vector
+        return cached[text_hashes[0]]
+
+    async def aembed_documents(self, texts: list[str]) -> list[list[float]]:
+        text_hashes, cached, missing_hashes = await asyncio.to_thread(self._lookup, texts)
+        if missing_hashes:
+            text_by_hash = dict(zip(text_hashes, texts))
+            computed = await self.underlying.aembed_documents([text_by_hash[h] for h in missing_hashes])
+            new_vectors = dict(zip(missing_hashes, computed))
+            await asyncio.to_thread(self._store, new_vectors)
+            cached.update(new_vectors)
+        return [cached[text_hash] for text_hash in text_hashes]
+
+    async def aembed_query(self, text: str) -> list[float]:
+        text_hashes, cached, missing_hashes = await asyncio.to_thread(self._lookup, [text])
+        if missing_hashes:
+            vector = await self.underlying.aembed_query(text)
+            await asyncio.to_thread(self._store, {text_hashes[0]: vector})
+            return vector
+        return cached[text_hashes[0]]
+
+
+class QueryEmbeddingCache:
+    """
+    In-process LRU cache with a TTL for the embeddings of retrieval queries,
+    keyed on the model and the normalized query text. Many turns ask the same
+    few questions, so a hit saves the embedding round-trip on the critical path.
+    """
+
+    def __init__(self, max_entries: int, ttl_seconds: float):
+        self._cache = TTLCache(maxsize=max_entries, ttl=ttl_seconds)
+        self._lock = threading.Lock()
+        metrics.register_gauge(
+            "query_embedding_cache.hit_rate",
+            lambda: metrics.ratio("query_embedding_cache.hits", "query_embedding_cache.lookups"),
+        )
+        metrics.register_gauge("query_embedding_cache.size", lambda: len(self._cache))
+
+    @staticmethod
+    def normalize(query: str) -> str:
+        """Case-folds the query, collapses whitespace and drops trailing punctuation."""
+        return regex.sub(r"\s+", " ", query).strip().rstrip("?!.").strip().casefold()
+
+    def _get(self, key: tuple[str, str]):
+        metrics.increment("query_embedding_cache.lookups")
+        with self._lock:
+            vector = self._cache.get(key)
+        if vector is not None:
+            metrics.increment("query_embedding_cache.hits")
+        return vector
+
+    def _set(self, key: tuple[str, str], vector: list[float]):
+        with self._lock:
+            self._cache[key] = vector
+
+    def get_or_compute(self, model: str, query: str, compute: Callable[[str], list[float]]) -> list[float]:
+        key = (model, self.normalize(query))
+        vector = self._get(key)
+        if vector is None:
+            vector = compute(query)
+            self._set(key, vector)
+        return vector
+
+    async def aget_or_compute(
+        self,
+        model: str,
+        query: str,
+        compute: Callable[[str], Awaitable[list[float]]],
+    ) -> list[float]:
+        key = (model, self.normalize(query))
+        vector = self._get(key)
+        if vector is None:
+            vector = await compute(query)
+            self._set(key, vector)
+        return vector
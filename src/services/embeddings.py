@@ -1,34 +1,84 @@
-import base64
+import asyncio
 import logging
+import sqlite3
+from collections import defaultdict
+from contextlib import aclosing
+from dataclasses import dataclass
+from datetime import datetime, timezone
 from urllib.parse import urlparse
 
-import pypandoc
 import regex
 from typing import Any, Dict, Optional
 
-from firecrawl import Firecrawl
-from firecrawl.v2.utils.error_handler import BadRequestError
 from langchain_core.documents import Document
 from langchain_core.prompts import ChatPromptTemplate
-from langchain_openai import ChatOpenAI
-from langchain_text_splitters import RecursiveCharacterTextSplitter
 
 from src.config import settings
-from src.services.vector_store import get_vector_store
+from src.services.document_processing import (
+    iter_chunk_file,
+    parse_document_file_in_pool,
+    parse_document_in_pool,
+    parse_documents,
+    split_text,
+)
+from src.services.ingestion_jobs import (
+    IngestionJobCancelledError,
+    IngestionJobContext,
+    wait_for_practice_ingestion_jobs,
+)
+from src.services.embedding_cache import QueryEmbeddingCache
+from src.services.crawler import DomainRateLimiter, SiteCrawler, normalize_url
+from src.services.knowledge_sources import (
+    chunks_fingerprint,
+    delete_knowledge_sources,
+    delete_practice_knowledge_sources,
+    get_knowledge_source,
+    get_knowledge_sources,
+    list_knowledge_sources,
+    mark_knowledge_sources_checked,
+    page_fingerprint,
+    record_knowledge_sources,
+)
+from src.services.lexical_index import LexicalIndex
+from src.services.llm_clients import get_llm_clients
+from src.services.practice_data import delete_practice_interactions, delete_practice_settings
+from src.services.reranker import get_reranker
+from src.services.retrieval_calibration import (
+    aget_similarity_threshold,
+    delete_practice_retrieval_scores,
+    get_similarity_threshold,
+    score_recorder,
+)
+from src.services.scrapers import InvalidURLError, ScrapedPage, create_scraper
+from src.services.uploads import discard_upload, upload_path
+from src.services.vector_store import get_embeddings, get_vector_store
 from src.shared.constants import (
-    INVALID_UNICODE_CLEANUP_REGEX,
-    VECTOR_EMBEDDINGS_SIMILARITY_THRESHOLD,
-    VECTOR_EMBEDDINGS_QUERY_SYSTEM_PROMPT
+    EMBEDDINGS_BATCH_SIZE,
+    HYBRID_SEARCH_CANDIDATES,
+    LEXICAL_FAST_PATH_MIN_MARGIN,
+    LEXICAL_MIN_RELATIVE_SCORE,
+    LEXICAL_STRONG_MATCH_MIN_COVERAGE,
+    LEXICAL_STRONG_MATCH_MIN_TERMS,
+    RETRIEVAL_TOP_K,
+    RRF_K,
+    VECTOR_EMBEDDINGS_QUERY_SYSTEM_PROMPT,
+    VECTOR_STORE_DELETE_BATCH_SIZE,
+    VECTOR_STORE_FILTER_BATCH_SIZE,
 )
-from src.shared.enums import DocType, SourceType
-from src.shared.schemas import DocumentData, QAPair
+from src.shared.enums import SourceType
+from src.shared.metrics import metrics
+from src.shared.schemas import CrawlOptions, CreateEmbeddingsRequest, DocumentData, PurgeSource, QAPair
+from src.shared.utils.hashing import content_hash
 
 logger = logging.getLogger(__name__)
 
 
-class InvalidURLError(ValueError):
-    """Custom exception for invalid URLs provided for scraping."""
-    pass
+_query_embedding_cache = QueryEmbeddingCache(
+    max_entries=settings.QUERY_EMBEDDING_CACHE_MAX_ENTRIES,
+    ttl_seconds=settings.QUERY_EMBEDDING_CACHE_TTL_SECONDS,
+)
+
+_lexical_index = LexicalIndex(settings.LEXICAL_INDEX_PATH)
 
 
 def _sanitize_for_doc_id(text: str) -> str:
@@ -36,351 +86,1033 @@ def _sanitize_for_doc_id(text: str) -> str:
     return regex.sub(r'[^a-zA-Z0-9]+', '_', text.lower()).strip('_')
 
 
-def store_data_from_qa_pair(qa_pair: QAPair, practice_id: int):
+def _checkpoint(job: Optional[IngestionJobContext], progress: float):
+    """Reports progress to the running ingestion job, if any, and stops if it was cancelled."""
+    if job:
+        job.checkpoint(progress)
+
+
+def _update_lexical_index(
+    practice_id: int,
+    removed_ids: list[str],
+    documents: Optional[list[Document]] = None,
+    ids: Optional[list[str]] = None,
+):
     """
-    Stores a Q&A pair in Chroma.
+    Mirrors vector store writes into the practice's BM25 index. All current chunks
+    are (re-)indexed, not just the changed ones, so re-ingesting a source also
+    backfills chunks stored before the lexical index existed.
     """
-    vector_store = get_vector_store()
+    if not settings.LEXICAL_INDEX_ENABLED:
+        return
+    _lexical_index.remove(practice_id, removed_ids)
+    if documents:
+        _lexical_index.upsert(practice_id, documents, ids)
 
-    doc_id = _sanitize_for_doc_id(qa_pair.question)
 
-    try:
-        logger.info(f"Checking for existing document with doc_id '{doc_id}' for practice_id: {practice_id}...")
-        existing_docs = vector_store.get(
-            where={
-                "$and": [
-                    {"practice_id": practice_id},
-                    {"source_type": SourceType.QA_PAIR.value},
-                    {"doc_id": doc_id}
-                ]
-            },
-            include=[]
-        )
-        existing_ids = existing_docs.get("ids", [])
+@dataclass
+class PreparedSource:
+    """
+    Chunks of a single knowledge source ready to be written to the vector store,
+    along with its key in the source registry and the metadata filter that
+    matches its previously stored chunks.
+    """
+    label: str
+    practice_id: int
+    source_type: SourceType
+    source_key: str
+    name: str
+    where: Dict[str, Any]
+    documents: list[Document]
+    ids: list[str]
+    # Set for web pages, whose content fingerprint is recorded once stored.
+    page: Optional[ScrapedPage] = None
+    crawl_root: Optional[str] = None
 
-        if existing_ids:
-            logger.info(f"Found {len(existing_ids)} existing documents for Q&A pair. Deleting them before adding new document...")
-            vector_store.delete(ids=existing_ids)
-            logger.info(f"Successfully deleted {len(existing_ids)} existing documents for Q&A pair.")
-        else:
-            logger.info(f"No existing document found for Q&A pair with doc_id '{doc_id}'.")
-    except Exception as e:
-        logger.error(f"Error while checking/deleting existing documents for Q&A pair: {e}", exc_info=True)
-        raise
+
+def _assign_chunk_ids(docs: list[Document], id_prefix: str) -> tuple[list[Document], list[str]]:
+    """
+    Stores each chunk's content hash in its metadata and derives the chunk id from
+    it, so an unchanged chunk keeps its id across re-ingestions even if it moved
+    within the source. Repeated chunks are only kept once.
+    """
+    unique_docs = []
+    ids = []
+    for doc in docs:
+        chunk_hash = content_hash(doc.page_content)
+        chunk_id = f"{id_prefix}_{chunk_hash}"
+        if chunk_id in ids:
+            continue
+        doc.metadata["content_hash"] = chunk_hash
+        unique_docs.append(doc)
+        ids.append(chunk_id)
+    return unique_docs, ids
+
+
+def _prepare_qa_pair(qa_pair: QAPair, practice_id: int) -> PreparedSource:
+    doc_id = _sanitize_for_doc_id(qa_pair.question)
 
     content = f"Q: {qa_pair.question}\nA: {qa_pair.answer}"
     doc = Document(page_content=content)
     doc.metadata["doc_id"] = doc_id
     doc.metadata["practice_id"] = practice_id
     doc.metadata["source_type"] = SourceType.QA_PAIR.value
+    doc.metadata["content_hash"] = content_hash(content)
+
+    return PreparedSource(
+        label=f"Q&A pair '{qa_pair.question}'",
+        practice_id=practice_id,
+        source_type=SourceType.QA_PAIR,
+        source_key=doc_id,
+        name=qa_pair.question,
+        where={
+            "$and": [
+                {"practice_id": practice_id},
+                {"source_type": SourceType.QA_PAIR.value},
+                {"doc_id": doc_id}
+            ]
+        },
+        documents=[doc],
+        ids=[doc_id],
+    )
+
+
+def _document_source(name: str, practice_id: int, docs: list[Document], ids: list[str]) -> PreparedSource:
+    doc_id = _sanitize_for_doc_id(name)
+    return PreparedSource(
+        label=f"document {name}",
+        practice_id=practice_id,
+        source_type=SourceType.DOCUMENT,
+        source_key=doc_id,
+        name=name,
+        where={
+            "$and": [
+                {"practice_id": practice_id},
+                {"source_type": SourceType.DOCUMENT.value},
+                {"doc_id": doc_id}
+            ]
+        },
+        documents=docs,
+        ids=ids,
+    )
+
+
+def _build_document_source(
+    document_data: DocumentData,
+    practice_id: int,
+    chunks: Optional[list[str]],
+) -> Optional[PreparedSource]:
+    """Builds the prepared source of a document from the chunk texts parsed by the processing pool."""
+    if chunks is None:
+        logger.warning(f"Unsupported docType: {document_data.docType}. Skipping.")
+        return None
+
+    doc_id = _sanitize_for_doc_id(document_data.name)
+    docs = [Document(page_content=chunk) for chunk in chunks]
+    logger.info(f"Split content from {document_data.name} into {len(docs)} documents.")
+
+    docs, ids = _assign_chunk_ids(docs, doc_id)
+    for doc in docs:
+        doc.metadata["doc_id"] = doc_id
+        doc.metadata["practice_id"] = practice_id
+        doc.metadata["source_type"] = SourceType.DOCUMENT.value
+
+    return _document_source(document_data.name, practice_id, docs, ids)
+
 
+def _prepare_document(document_data: DocumentData, practice_id: int) -> Optional[PreparedSource]:
     try:
-        logger.info(f"Adding new Q&A pair document to vector store with ID {doc_id}.")
-        vector_store.add_documents(documents=[doc], ids=[doc_id])
-        logger.info(
-            f"Successfully added new Q&A pair from '{qa_pair.question}' to the collection."
-        )
+        chunks = parse_document_in_pool(document_data)
     except Exception as e:
-        logger.error(f"Error adding Q&A pair document to vector store for practice_id {practice_id}: {e}", exc_info=True)
+        logger.error(f"Error processing document {document_data.name}: {e}", exc_info=True)
         raise
+    return _build_document_source(document_data, practice_id, chunks)
+
+
+def _build_website_source(page: ScrapedPage, practice_id: int, crawl_root: Optional[str] = None) -> PreparedSource:
+    parsed_url = urlparse(page.url)
+    endpoint = parsed_url.netloc + parsed_url.path
+    sanitized_url = _sanitize_for_doc_id(endpoint)
+
+    docs = [Document(page_content=chunk) for chunk in split_text(page.markdown)]
+    logger.info(f"Split content from {page.url} into {len(docs)} documents.")
+
+    docs, ids = _assign_chunk_ids(docs, sanitized_url)
+    for doc, doc_id in zip(docs, ids):
+        doc.metadata["doc_id"] = doc_id
+        doc.metadata["practice_id"] = practice_id
+        doc.metadata["source_type"] = SourceType.WEB_PAGE.value
+        doc.metadata["source_page_title"] = page.title
+        doc.metadata["source_url"] = page.url
+        if crawl_root:
+            doc.metadata["crawl_root"] = crawl_root
+
+    return PreparedSource(
+        label=f"URL {page.url}",
+        practice_id=practice_id,
+        source_type=SourceType.WEB_PAGE,
+        source_key=page.url,
+        name=page.title,
+        where={
+            "$and": [
+                {"practice_id": practice_id},
+                {"source_type": SourceType.WEB_PAGE.value},
+                {"source_url": page.url}
+            ]
+        },
+        documents=docs,
+        ids=ids,
+        page=page,
+        crawl_root=crawl_root,
+    )
+
+
+async def _scrape_page(website: str) -> Optional[ScrapedPage]:
+    async with create_scraper() as scraper:
+        return await scraper.scrape(website)
+
+
+def _prepare_website(website: str, practice_id: int) -> Optional[PreparedSource]:
+    logger.info(f"Scraping {website} for practice_id: {practice_id}...")
+    page = asyncio.run(_scrape_page(website))
+    if not page:
+        logger.warning(f"No markdown content scraped from {website}. Skipping.")
+        return None
+    return _build_website_source(page, practice_id)
+
+
+def _prepare_source(request: CreateEmbeddingsRequest) -> Optional[PreparedSource]:
+    if request.sourceType == SourceType.WEB_PAGE:
+        return _prepare_website(request.sourceData.webPageURL, request.practiceId)
+    elif request.sourceType == SourceType.QA_PAIR:
+        return _prepare_qa_pair(request.sourceData.qa_pair, request.practiceId)
+    elif request.sourceType == SourceType.DOCUMENT:
+        return _prepare_document(request.sourceData.document, request.practiceId)
+    raise ValueError(f"Source type '{request.sourceType.value}' not supported.")
 
 
-def store_data_from_document(document_data: DocumentData, practice_id: int):
+def _get_existing_chunk_hashes(vector_store, practice_id: int, where: Dict[str, Any]) -> Dict[str, Optional[str]]:
     """
-    Processes a document and stores its content in Chroma.
+    Returns the ids of the practice's stored chunks matching a filter, mapped to
+    their content hash. Chunks ingested before hashes were stored map to None.
+    """
+    existing_docs = vector_store.get(practice_id, where=where, include=["metadatas"])
+    return {
+        id_: (metadata or {}).get("content_hash")
+        for id_, metadata in zip(existing_docs.get("ids", []), existing_docs.get("metadatas", []))
+    }
+
+
+def _diff_chunks(
+    existing_hashes: Dict[str, Optional[str]],
+    documents_by_id: Dict[str, Document],
+) -> tuple[list[str], list[str]]:
+    """
+    Compares stored chunks against the new chunk set of the same sources.
+    Returns the ids to delete (no longer present) and the ids to add (new or changed).
+    """
+    ids_to_delete = [id_ for id_ in existing_hashes if id_ not in documents_by_id]
+    ids_to_add = [
+        id_ for id_, doc in documents_by_id.items()
+        if existing_hashes.get(id_) != doc.metadata.get("content_hash")
+    ]
+    return ids_to_delete, ids_to_add
+
+
+def _get_registered_chunk_hashes(vector_store, source: PreparedSource) -> Dict[str, Optional[str]]:
+    """
+    Returns the stored chunks of a source from the source registry. Unless the
+    registry fallback is disabled, sources missing from it (possibly ingested
+    before it existed) are looked up in the vector store.
+    """
+    registered = get_knowledge_source(source.practice_id, source.source_type, source.source_key)
+    if registered:
+        return dict(registered.chunks)
+    if not settings.KNOWLEDGE_SOURCE_REGISTRY_FALLBACK:
+        return {}
+    return _get_existing_chunk_hashes(vector_store, source.practice_id, source.where)
+
+
+def _registry_entry(source: PreparedSource, chunk_hashes: Optional[Dict[str, str]] = None) -> dict:
+    """Registry columns of a stored source. `chunk_hashes` defaults to the source's prepared chunks."""
+    if chunk_hashes is None:
+        chunk_hashes = {id_: doc.metadata["content_hash"] for id_, doc in zip(source.ids, source.documents)}
+    entry = {
+        "practice_id": source.practice_id,
+        "source_type": source.source_type.value,
+        "source_key": source.source_key,
+        "name": source.name,
+        "chunks": chunk_hashes,
+        "content_hash": page_fingerprint(source.page) if source.page else chunks_fingerprint(chunk_hashes.values()),
+    }
+    if source.page:
+        entry["crawl_root"] = source.crawl_root
+        entry["last_checked_at"] = datetime.now(timezone.utc)
+    return entry
+
+
+def _sync_source_chunks(source: PreparedSource) -> dict:
+    """
+    Brings the stored chunks of a source in line with its new chunks. Only added
+    or changed chunks are embedded and only removed ones are deleted.
+    Returns the number of added, removed and unchanged chunks.
     """
     vector_store = get_vector_store()
-    doc_id = _sanitize_for_doc_id(document_data.name)
+    documents_by_id = dict(zip(source.ids, source.documents))
 
     try:
-        logger.info(f"Checking for existing document with doc_id '{doc_id}' for practice_id: {practice_id}...")
-        existing_docs = vector_store.get(
-            where={
-                "$and": [
-                    {"practice_id": practice_id},
-                    {"source_type": SourceType.DOCUMENT.value},
-                    {"doc_type": document_data.docType},
-                    {"doc_id": doc_id}
-                ]
-            },
-            include=[]
+        logger.info(f"Checking for existing documents for {source.label} and practice_id: {source.practice_id}...")
+        existing_hashes = _get_registered_chunk_hashes(vector_store, source)
+        ids_to_delete, ids_to_add = _diff_chunks(existing_hashes, documents_by_id)
+        logger.info(
+            f"Found {len(existing_hashes)} existing chunks for {source.label}: "
+            f"{len(ids_to_add)} to add, {len(ids_to_delete)} to delete, "
+            f"{len(documents_by_id) - len(ids_to_add)} unchanged."
         )
-        existing_ids = existing_docs.get("ids", [])
 
-        if existing_ids:
-            logger.info(f"Found {len(existing_ids)} existing documents for document. Deleting them before adding new document...")
-            vector_store.delete(ids=existing_ids)
-            logger.info(f"Successfully deleted {len(existing_ids)} existing documents for document.")
-        else:
-            logger.info(f"No existing document found for document with doc_id '{doc_id}'.")
+        if ids_to_delete:
+            vector_store.delete(source.practice_id, ids=ids_to_delete)
+            logger.info(f"Successfully deleted {len(ids_to_delete)} stale chunks for {source.label}.")
     except Exception as e:
-        logger.error(f"Error while checking/deleting existing documents for document: {e}", exc_info=True)
+        logger.error(f"Error while checking/deleting existing documents for {source.label}: {e}", exc_info=True)
         raise
 
     try:
-        decoded_data = base64.b64decode(document_data.data)
-        if document_data.docType == DocType.DOCX:
-            # Note: pypandoc requires pandoc to be installed on the system.
-            content = pypandoc.convert_text(decoded_data, "markdown", format="docx")
-        elif document_data.docType == DocType.TXT:
-            content = decoded_data.decode('utf-8')
-        else:
-            logger.warning(f"Unsupported docType: {document_data.docType}. Skipping.")
-            return
+        if ids_to_add:
+            vector_store.add_documents(documents=[documents_by_id[id_] for id_ in ids_to_add], ids=ids_to_add)
+            logger.info(
+                f"Successfully added {len(ids_to_add)} new chunks from {source.label} to the collection."
+            )
     except Exception as e:
-        logger.error(f"Error processing document {document_data.name}: {e}", exc_info=True)
+        logger.error(f"Error adding documents to vector store for {source.label} and practice_id {source.practice_id}: {e}", exc_info=True)
         raise
 
-    cleaned_content = regex.sub(INVALID_UNICODE_CLEANUP_REGEX, '', content)
+    _update_lexical_index(source.practice_id, ids_to_delete, source.documents, source.ids)
+    record_knowledge_sources([_registry_entry(source)])
 
-    text_splitter = RecursiveCharacterTextSplitter.from_tiktoken_encoder(
-        chunk_size=512,
-        chunk_overlap=128,
-    )
-    docs = text_splitter.create_documents([cleaned_content])
-    logger.info(f"Split content from {document_data.name} into {len(docs)} documents.")
+    return {
+        "added": len(ids_to_add),
+        "removed": len(ids_to_delete),
+        "unchanged": len(documents_by_id) - len(ids_to_add),
+    }
 
-    ids = []
-    for i, doc in enumerate(docs):
-        chunk_id = f"{doc_id}_{i}"
-        doc.metadata["doc_id"] = doc_id
-        doc.metadata["practice_id"] = practice_id
-        doc.metadata["source_type"] = SourceType.DOCUMENT.value
-        ids.append(chunk_id)
+
+def store_data_from_qa_pair(qa_pair: QAPair, practice_id: int, job: Optional[IngestionJobContext] = None) -> Optional[dict]:
+    """
+    Stores a Q&A pair in the vector store.
+    """
+    _checkpoint(job, 0.0)
+    return _sync_source_chunks(_prepare_qa_pair(qa_pair, practice_id))
+
+
+def _store_uploaded_document(document_data: DocumentData, practice_id: int, job: Optional[IngestionJobContext] = None) -> Optional[dict]:
+    """
+    Stores a document spooled to disk by the upload endpoint. The processing pool
+    writes its chunks to a file, which is then embedded batch by batch, so memory
+    use stays bounded by the batch size rather than the document size. The
+    uploaded file is removed once the document has been processed.
+    """
+    vector_store = get_vector_store()
+    input_path = upload_path(document_data.uploadId)
+    chunks_path = f"{input_path}.chunks.jsonl"
+    # Chunks are streamed from the chunk file rather than held on the source.
+    source = _document_source(document_data.name, practice_id, [], [])
+    doc_id = source.source_key
+    label = source.label
 
     try:
-        logger.info(f"Adding {len(docs)} new document chunks to vector store.")
-        vector_store.add_documents(documents=docs, ids=ids)
+        chunk_count = parse_document_file_in_pool(input_path, document_data.docType, chunks_path)
+        if chunk_count is None:
+            logger.warning(f"Unsupported docType: {document_data.docType}. Skipping.")
+            return None
+        logger.info(f"Split content from {document_data.name} into {chunk_count} documents.")
+
+        _checkpoint(job, 0.5)
+        existing_hashes = _get_registered_chunk_hashes(vector_store, source)
+
+        # New chunks are added before stale ones are deleted, so the document
+        # stays searchable while it is being replaced.
+        chunk_hashes = {}
+        added = 0
+        processed = 0
+        for chunks in iter_chunk_file(chunks_path, EMBEDDINGS_BATCH_SIZE):
+            docs, ids = _assign_chunk_ids([Document(page_content=chunk) for chunk in chunks], doc_id)
+            batch = [(doc, id_) for doc, id_ in zip(docs, ids) if id_ not in chunk_hashes]
+            for doc, id_ in batch:
+                doc.metadata["doc_id"] = doc_id
+                doc.metadata["practice_id"] = practice_id
+                doc.metadata["source_type"] = SourceType.DOCUMENT.value
+                chunk_hashes[id_] = doc.metadata["content_hash"]
+
+            to_add = [(doc, id_) for doc, id_ in batch if existing_hashes.get(id_) != doc.metadata["content_hash"]]
+            if to_add:
+                vector_store.add_documents(documents=[doc for doc, _ in to_add], ids=[id_ for _, id_ in to_add])
+                added += len(to_add)
+            _update_lexical_index(practice_id, [], [doc for doc, _ in batch], [id_ for _, id_ in batch])
+
+            processed += len(chunks)
+            if job:
+                job.progress = 0.5 + 0.5 * processed / max(chunk_count, 1)
+
+        ids_to_delete = [id_ for id_ in existing_hashes if id_ not in chunk_hashes]
+        for ids in _batched(ids_to_delete, VECTOR_STORE_DELETE_BATCH_SIZE):
+            vector_store.delete(practice_id, ids=ids)
+        _update_lexical_index(practice_id, ids_to_delete)
+        record_knowledge_sources([_registry_entry(source, chunk_hashes)])
         logger.info(
-            f"Successfully added {len(docs)} new chunks from {document_data.name} to the collection."
+            f"Synced {label}: {added} chunks added, {len(ids_to_delete)} removed, "
+            f"{len(chunk_hashes) - added} unchanged."
         )
+    except IngestionJobCancelledError:
+        raise
     except Exception as e:
-        logger.error(f"Error adding document chunks to vector store for practice_id {practice_id}: {e}", exc_info=True)
+        logger.error(f"Error storing {label} for practice_id {practice_id}: {e}", exc_info=True)
         raise
+    finally:
+        discard_upload(document_data.uploadId)
+
+    return {"added": added, "removed": len(ids_to_delete), "unchanged": len(chunk_hashes) - added}
 
 
-def store_data_from_website(website: str, practice_id: int):
+def store_data_from_document(document_data: DocumentData, practice_id: int, job: Optional[IngestionJobContext] = None) -> Optional[dict]:
     """
-    Scrapes a website and stores its content in Chroma.
+    Processes a document and stores its content in the vector store.
+    The document is converted and split before existing chunks are updated,
+    and only chunks whose content changed are re-embedded.
     """
-    if not settings.FIRECRAWL_API_KEY:
-        raise ValueError("FIRECRAWL_API_KEY not found in settings")
+    _checkpoint(job, 0.0)
+    if document_data.uploadId:
+        return _store_uploaded_document(document_data, practice_id, job)
+    source = _prepare_document(document_data, practice_id)
+    if not source:
+        return None
 
-    vector_store = get_vector_store()
-    firecrawl = Firecrawl(
-        api_key=settings.FIRECRAWL_API_KEY,
+    _checkpoint(job, 0.5)
+    return _sync_source_chunks(source)
+
+
+def store_data_from_website(website: str, practice_id: int, job: Optional[IngestionJobContext] = None) -> Optional[dict]:
+    """
+    Scrapes a website and stores its content in the vector store.
+    The page is scraped and split before existing chunks are updated,
+    and only chunks whose content changed are re-embedded.
+    """
+    _checkpoint(job, 0.0)
+    source = _prepare_website(website, practice_id)
+    if not source:
+        return None
+
+    _checkpoint(job, 0.5)
+    return _sync_source_chunks(source)
+
+
+async def _crawl_and_store_site(
+    root_url: str,
+    crawl: CrawlOptions,
+    practice_id: int,
+    job: Optional[IngestionJobContext] = None,
+) -> dict:
+    totals = {"pages": 0, "added": 0, "removed": 0, "unchanged": 0}
+    async with create_scraper() as scraper:
+        crawler = SiteCrawler(root_url, crawl, scraper)
+        async with aclosing(crawler.pages()) as pages:
+            async for page in pages:
+                # Each page is written as a whole, so stopping between pages
+                # never leaves one half-replaced.
+                _checkpoint(job, totals["pages"] / crawl.maxPages)
+                source = _build_website_source(page, practice_id, crawl_root=crawler.root_url)
+                stats = await asyncio.to_thread(_sync_source_chunks, source)
+                totals["pages"] += 1
+                for key, value in stats.items():
+                    totals[key] += value
+
+    logger.info(
+        f"Crawled {totals['pages']} pages from {root_url} for practice_id {practice_id}: "
+        f"{totals['added']} chunks added, {totals['removed']} removed, {len(crawler.failed)} pages failed."
     )
+    return {**totals, "failedPages": crawler.failed}
 
-    parsed_url = urlparse(website)
-    endpoint = parsed_url.netloc + parsed_url.path
-    sanitized_url = _sanitize_for_doc_id(endpoint)
 
-    try:
-        logger.info(f"Checking for existing documents with URL prefix '{sanitized_url}' for practice_id: {practice_id}...")
-        existing_docs = vector_store.get(
-            where={
-                "$and": [
-                    {"practice_id": practice_id},
-                    {"source_type": SourceType.WEB_PAGE.value},
-                    {"source_url": website}
-                ]
-            },
-            include=[]
-        )
-        existing_ids = existing_docs.get("ids", [])
-        
-        if existing_ids:
-            logger.info(f"Found {len(existing_ids)} existing documents for URL {website}. Deleting them before adding new chunks...")
-            vector_store.delete(ids=existing_ids)
-            logger.info(f"Successfully deleted {len(existing_ids)} existing chunks for {website}.")
-        else:
-            logger.info(f"No existing documents found for URL {website}.")
-    except Exception as e:
-        logger.error(f"Error while checking/deleting existing documents for {website}: {e}", exc_info=True)
-        raise
+def store_data_from_site(
+    root_url: str,
+    crawl: CrawlOptions,
+    practice_id: int,
+    job: Optional[IngestionJobContext] = None,
+) -> dict:
+    """
+    Crawls a site from a root URL and stores every page found in the vector store.
+    Pages are fetched concurrently under per-domain limits, and each page is
+    chunked and embedded as soon as it arrives while the crawl continues.
+    """
+    _checkpoint(job, 0.0)
+    logger.info(f"Crawling {root_url} for practice_id: {practice_id} (depth {crawl.maxDepth}, up to {crawl.maxPages} pages)...")
+    return asyncio.run(_crawl_and_store_site(root_url, crawl, practice_id, job))
 
-    logger.info(f"Scraping {website} for practice_id: {practice_id}...")
-    try:
-        scraped_website = firecrawl.scrape(
-            url=website,
-            formats=["markdown"],
-            exclude_tags=
-                ["script", "style", "img", "a", "source", "track", "embed", "base", "col", "area", "form", "input"],
-        )
-    except BadRequestError as e:
-        logger.warning(f"Firecrawl failed to scrape URL {website} due to a bad request: {e}")
-        raise InvalidURLError(f"The URL '{website}' is invalid or could not be scraped.") from e
-    output_markdown = scraped_website.markdown
-    if not output_markdown:
-        logger.warning(f"No markdown content scraped from {website}. Skipping.")
-        return
-        
-    cleaned_markdown = regex.sub(INVALID_UNICODE_CLEANUP_REGEX, '', output_markdown)
 
-    text_splitter = RecursiveCharacterTextSplitter.from_tiktoken_encoder(
-        chunk_size=512,
-        chunk_overlap=128,
+async def _refresh_web_pages(practice_id: int, job: Optional[IngestionJobContext] = None) -> dict:
+    known_pages = {
+        source.source_key: source
+        for source in await asyncio.to_thread(list_knowledge_sources, practice_id, SourceType.WEB_PAGE, with_chunks=False)
+    }
+    urls = list(known_pages)
+
+    report = {"checked": len(urls), "refreshed": 0, "skipped": 0, "failed": 0, "added": 0, "removed": 0, "pages": []}
+    if not urls:
+        return report
+
+    limiter = DomainRateLimiter(settings.CRAWL_DOMAIN_CONCURRENCY, settings.CRAWL_DOMAIN_REQUESTS_PER_SECOND)
+    semaphore = asyncio.Semaphore(settings.CRAWL_MAX_CONCURRENCY)
+    unchanged = []
+
+    async with create_scraper(fresh=True) as scraper:
+        async def fetch(url: str):
+            try:
+                async with semaphore, limiter.limit(url):
+                    return url, await scraper.scrape(url), None
+            except Exception as e:
+                return url, None, e
+
+        tasks = [asyncio.create_task(fetch(url)) for url in urls]
+        try:
+            for n, next_result in enumerate(asyncio.as_completed(tasks)):
+                url, page, error = await next_result
+                known = known_pages[url]
+                if error or not page:
+                    reason = str(error) if error else "No content could be scraped from the page."
+                    logger.warning(f"Failed to refresh {url} for practice_id {practice_id}: {reason}")
+                    report["failed"] += 1
+                    report["pages"].append({"url": url, "status": "failed", "error": reason})
+                    continue
+
+                fingerprint = page_fingerprint(page)
+                # Pages registered from existing chunks have no fingerprint and are re-ingested once.
+                if known.content_hash == fingerprint:
+                    unchanged.append(url)
+                    report["skipped"] += 1
+                    report["pages"].append({"url": url, "status": "skipped"})
+                    continue
+
+                # Each page is written as a whole, so stopping between pages
+                # never leaves one half-replaced.
+                _checkpoint(job, n / len(urls))
+                source = _build_website_source(page, practice_id, crawl_root=known.crawl_root)
+                stats = await asyncio.to_thread(_sync_source_chunks, source)
+                report["refreshed"] += 1
+                report["added"] += stats["added"]
+                report["removed"] += stats["removed"]
+                report["pages"].append({"url": url, "status": "refreshed", **stats})
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    await asyncio.to_thread(mark_knowledge_sources_checked, practice_id, SourceType.WEB_PAGE, unchanged)
+    logger.info(
+        f"Refreshed web pages for practice_id {practice_id}: {report['checked']} checked, "
+        f"{report['refreshed']} refreshed, {report['skipped']} unchanged, {report['failed']} failed."
     )
-    docs = text_splitter.create_documents([cleaned_markdown])
-    logger.info(f"Split content from {website} into {len(docs)} documents.")
+    return report
 
-    ids = []
-    for i, doc in enumerate(docs):
-        doc_id = f"{sanitized_url}_{i}"
-        doc.metadata["doc_id"] = doc_id
-        doc.metadata["practice_id"] = practice_id
-        doc.metadata["source_type"] = SourceType.WEB_PAGE.value
-        doc.metadata["source_page_title"] = getattr(scraped_website.metadata, 'title', 'No Title')
-        doc.metadata["source_url"] = website
-        ids.append(doc_id)
 
-    try:
-        logger.info(f"Adding {len(docs)} new documents to vector store.")
-        vector_store.add_documents(documents=docs, ids=ids)
+def refresh_web_pages(practice_id: int, job: Optional[IngestionJobContext] = None) -> dict:
+    """
+    Re-fetches every web page stored for a practice and re-ingests only the pages
+    whose content fingerprint changed since they were last stored. Pages that
+    cannot be fetched are reported as failed and left as they are.
+    Returns a report of the refreshed, skipped and failed pages.
+    """
+    _checkpoint(job, 0.0)
+    logger.info(f"Refreshing web pages for practice_id: {practice_id}...")
+    return asyncio.run(_refresh_web_pages(practice_id, job))
+
+
+def _batched(items: list, size: int):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def store_data_batch(
+    requests: list[CreateEmbeddingsRequest],
+    job: Optional[IngestionJobContext] = None,
+) -> list[dict]:
+    """
+    Stores many knowledge sources at once.
+
+    Sources are prepared one by one, then the existence checks, deletes and
+    embedding requests for all of them are grouped into large batches, so the
+    number of vector store and embedding round-trips grows with the number of
+    batches rather than the number of sources.
+
+    Returns one result entry per request, in request order.
+    """
+    results = [
+        {"index": i, "sourceType": request.sourceType.value, "status": "pending"}
+        for i, request in enumerate(requests)
+    ]
+
+    prepared = []
+    handled = 0
+
+    def prepare(i: int, build):
+        nonlocal handled
+        _checkpoint(job, 0.5 * handled / len(requests))
+        handled += 1
+        try:
+            source = build()
+        except Exception as e:
+            logger.error(f"Failed to prepare batch item {i} for practice_id {requests[i].practiceId}: {e}", exc_info=True)
+            results[i].update(status="failed", error=str(e))
+            return
+        if not source:
+            results[i].update(status="skipped", chunks=0)
+            return
+        prepared.append((i, source))
+
+    # Documents are converted and split in the processing pool while the other
+    # sources are prepared here, and are picked up in completion order.
+    document_indexes = [i for i, request in enumerate(requests) if request.sourceType == SourceType.DOCUMENT]
+    with parse_documents([requests[i].sourceData.document for i in document_indexes]) as parsed_documents:
+        for i, request in enumerate(requests):
+            if request.sourceType != SourceType.DOCUMENT:
+                prepare(i, lambda: _prepare_source(request))
+
+        for n, future in parsed_documents:
+            i = document_indexes[n]
+            request = requests[i]
+            prepare(i, lambda: _build_document_source(request.sourceData.document, request.practiceId, future.result()))
+
+    prepared.sort(key=lambda item: item[0])
+    _checkpoint(job, 0.5)
+    if not prepared:
+        return results
+
+    vector_store = get_vector_store()
+
+    registered = get_knowledge_sources(
+        [(source.practice_id, source.source_type.value, source.source_key) for _, source in prepared]
+    )
+    # Chunk ids are only unique within a practice, so chunks are compared and
+    # deleted per practice.
+    existing_hashes = defaultdict(dict)
+    unregistered = defaultdict(list)
+    for _, source in prepared:
+        entry = registered.get((source.practice_id, source.source_type.value, source.source_key))
+        if entry:
+            existing_hashes[source.practice_id].update(entry.chunks)
+        elif settings.KNOWLEDGE_SOURCE_REGISTRY_FALLBACK:
+            unregistered[source.practice_id].append(source)
+    # Sources that may have been ingested before the registry existed are looked up in the vector store.
+    for practice_id, practice_sources in unregistered.items():
+        for sources in _batched(practice_sources, VECTOR_STORE_FILTER_BATCH_SIZE):
+            where = sources[0].where if len(sources) == 1 else {"$or": [source.where for source in sources]}
+            existing_hashes[practice_id].update(_get_existing_chunk_hashes(vector_store, practice_id, where))
+
+    # Later items win when the same chunk id appears more than once in the batch.
+    documents_by_id = defaultdict(dict)
+    for _, source in prepared:
+        documents_by_id[source.practice_id].update(zip(source.ids, source.documents))
+
+    ids_to_add = []
+    for practice_id, practice_documents in documents_by_id.items():
+        ids_to_delete, practice_ids_to_add = _diff_chunks(existing_hashes[practice_id], practice_documents)
         logger.info(
-            f"Successfully added {len(docs)} new chunks from {website} to the collection."
+            f"Found {len(existing_hashes[practice_id])} existing chunks for the batch sources of practice_id "
+            f"{practice_id}: {len(practice_ids_to_add)} to add, {len(ids_to_delete)} to delete."
         )
-    except Exception as e:
-        logger.error(f"Error adding documents to vector store for website {website} and practice_id {practice_id}: {e}", exc_info=True)
-        raise
+        for ids in _batched(ids_to_delete, VECTOR_STORE_DELETE_BATCH_SIZE):
+            vector_store.delete(practice_id, ids=ids)
+        _update_lexical_index(practice_id, ids_to_delete)
+        ids_to_add.extend((practice_id, id_) for id_ in practice_ids_to_add)
+
+    batches = list(_batched(ids_to_add, EMBEDDINGS_BATCH_SIZE))
+    for n, batch_keys in enumerate(batches):
+        vector_store.add_documents(
+            documents=[documents_by_id[practice_id][id_] for practice_id, id_ in batch_keys],
+            ids=[id_ for _, id_ in batch_keys],
+        )
+        if job:
+            job.progress = 0.5 + 0.5 * (n + 1) / len(batches)
+    logger.info(f"Added {len(ids_to_add)} chunks from {len(prepared)} sources in {len(batches)} batches.")
 
+    for _, source in prepared:
+        _update_lexical_index(source.practice_id, [], source.documents, source.ids)
+    record_knowledge_sources([_registry_entry(source) for _, source in prepared])
 
-def delete_data_from_document(document_name: str, practice_id: int) -> int:
+    added_keys = set(ids_to_add)
+    for i, source in prepared:
+        added = sum(1 for id_ in source.ids if (source.practice_id, id_) in added_keys)
+        results[i].update(status="succeeded", chunks=len(source.documents), added=added)
+    return results
+
+
+def _delete_sources(
+    practice_id: int,
+    source_type: SourceType,
+    sources: list,
+    where: Dict[str, Any],
+    label: str,
+) -> int:
     """
-    Deletes all chunks of a document from Chroma based on the document name and practice ID.
-    Returns the number of documents deleted.
+    Deletes the chunks of registered sources by id and removes them from the
+    registry. Sources ingested before the registry existed are not in it, so when
+    none are registered and the registry fallback is enabled, the chunks are
+    looked up in the vector store with `where`. Returns the number of chunks deleted.
     """
     vector_store = get_vector_store()
-    doc_id = _sanitize_for_doc_id(document_name)
 
     try:
-        logger.info(f"Searching for document to delete with doc_id: {doc_id} and practice_id: {practice_id}...")
-        existing_docs = vector_store.get(
-            where={
-                "$and": [
-                    {"practice_id": practice_id},
-                    {"source_type": SourceType.DOCUMENT.value},
-                    {"doc_id": doc_id}
-                ]
-            },
-            include=[]
-        )
-        existing_ids = existing_docs.get("ids", [])
+        if sources or not settings.KNOWLEDGE_SOURCE_REGISTRY_FALLBACK:
+            existing_ids = [id_ for source in sources for id_ in source.chunks]
+        else:
+            logger.info(f"No registered sources for {label} and practice_id: {practice_id}, searching the vector store...")
+            existing_ids = vector_store.get(practice_id, where=where, include=[]).get("ids", [])
 
         if existing_ids:
-            logger.info(f"Found {len(existing_ids)} documents for document. Deleting them...")
-            vector_store.delete(ids=existing_ids)
-            logger.info(f"Successfully deleted {len(existing_ids)} chunks for document.")
-            return len(existing_ids)
+            logger.info(f"Found {len(existing_ids)} chunks for {label}. Deleting them...")
+            for ids in _batched(existing_ids, VECTOR_STORE_DELETE_BATCH_SIZE):
+                vector_store.delete(practice_id, ids=ids)
+            _update_lexical_index(practice_id, existing_ids)
+            logger.info(f"Successfully deleted {len(existing_ids)} chunks for {label}.")
         else:
-            logger.info(f"No existing documents found for document.")
-            return 0
+            logger.info(f"No existing documents found for {label}.")
+
+        if sources:
+            delete_knowledge_sources(practice_id, source_type, [source.source_key for source in sources])
+        return len(existing_ids)
     except Exception as e:
-        logger.error(f"Error while deleting document chunks: {e}", exc_info=True)
+        logger.error(f"Error while deleting chunks for {label}: {e}", exc_info=True)
         raise
 
 
-def delete_data_from_qa_pair(question: str, practice_id: int) -> int:
+def _registered_source(practice_id: int, source_type: SourceType, source_key: str) -> list:
+    source = get_knowledge_source(practice_id, source_type, source_key)
+    return [source] if source else []
+
+
+def delete_data_from_document(document_name: str, practice_id: int) -> int:
     """
-    Deletes a Q&A pair from Chroma based on the question and practice ID.
+    Deletes all chunks of a document from the vector store based on the document name and practice ID.
     Returns the number of documents deleted.
     """
-    vector_store = get_vector_store()
-    doc_id = _sanitize_for_doc_id(question)
+    doc_id = _sanitize_for_doc_id(document_name)
+    return _delete_sources(
+        practice_id,
+        SourceType.DOCUMENT,
+        _registered_source(practice_id, SourceType.DOCUMENT, doc_id),
+        where={
+            "$and": [
+                {"practice_id": practice_id},
+                {"source_type": SourceType.DOCUMENT.value},
+                {"doc_id": doc_id}
+            ]
+        },
+        label=f"document {document_name}",
+    )
 
-    try:
-        logger.info(f"Searching for Q&A pair to delete with doc_id: {doc_id} and practice_id: {practice_id}...")
-        existing_docs = vector_store.get(
-            where={
-                "$and": [
-                    {"practice_id": practice_id},
-                    {"source_type": SourceType.QA_PAIR.value},
-                    {"doc_id": doc_id}
-                ]
-            },
-            include=[]
-        )
-        existing_ids = existing_docs.get("ids", [])
 
-        if existing_ids:
-            logger.info(f"Found {len(existing_ids)} documents for Q&A pair. Deleting them...")
-            vector_store.delete(ids=existing_ids)
-            logger.info(f"Successfully deleted {len(existing_ids)} chunks for Q&A pair.")
-            return len(existing_ids)
-        else:
-            logger.info(f"No existing documents found for Q&A pair.")
-            return 0
-    except Exception as e:
-        logger.error(f"Error while deleting Q&A pair documents: {e}", exc_info=True)
-        raise
+def delete_data_from_qa_pair(question: str, practice_id: int) -> int:
+    """
+    Deletes a Q&A pair from the vector store based on the question and practice ID.
+    Returns the number of documents deleted.
+    """
+    doc_id = _sanitize_for_doc_id(question)
+    return _delete_sources(
+        practice_id,
+        SourceType.QA_PAIR,
+        _registered_source(practice_id, SourceType.QA_PAIR, doc_id),
+        where={
+            "$and": [
+                {"practice_id": practice_id},
+                {"source_type": SourceType.QA_PAIR.value},
+                {"doc_id": doc_id}
+            ]
+        },
+        label=f"Q&A pair '{question}'",
+    )
 
 
-def delete_data_from_website(website: str, practice_id: int) -> int:
+def delete_data_from_website(website: str, practice_id: int, crawl: bool = False) -> int:
     """
-    Deletes all documents from Chroma that are associated with a specific website URL and practice ID.
+    Deletes all documents from the vector store that are associated with a specific website URL and practice ID.
+    With `crawl`, deletes every page stored by a crawl from that root URL instead.
     Returns the number of documents deleted.
     """
-    vector_store = get_vector_store()
+    if crawl:
+        crawl_root = normalize_url(website) or website
+        sources = list_knowledge_sources(practice_id, SourceType.WEB_PAGE, crawl_root=crawl_root)
+        url_filter = {"crawl_root": crawl_root}
+    else:
+        sources = _registered_source(practice_id, SourceType.WEB_PAGE, website)
+        url_filter = {"source_url": website}
 
-    try:
-        logger.info(f"Searching for documents to delete for URL: {website} and practice_id: {practice_id}...")
-        existing_docs = vector_store.get(
-            where={
-                "$and": [
-                    {"practice_id": practice_id},
-                    {"source_type": SourceType.WEB_PAGE.value},
-                    {"source_url": website}
-                ]
-            },
-            include=[]
-        )
-        existing_ids = existing_docs.get("ids", [])
+    return _delete_sources(
+        practice_id,
+        SourceType.WEB_PAGE,
+        sources,
+        where={
+            "$and": [
+                {"practice_id": practice_id},
+                {"source_type": SourceType.WEB_PAGE.value},
+                url_filter
+            ]
+        },
+        label=f"URL {website}",
+    )
 
-        if existing_ids:
-            logger.info(f"Found {len(existing_ids)} documents for URL {website}. Deleting them...")
-            vector_store.delete(ids=existing_ids)
-            logger.info(f"Successfully deleted {len(existing_ids)} chunks for {website}.")
-            return len(existing_ids)
+
+def _resolve_purge_sources(practice_id: int, sources: list[PurgeSource]) -> tuple[list, list[Dict[str, Any]]]:
+    """
+    Looks up the listed sources in the registry. Returns the registered sources
+    and, while the registry fallback is enabled, the vector store filters of
+    the sources that are not registered.
+    """
+    registered = {}
+    keyed_filters = {}
+    unregistered_crawls = []
+    for source in sources:
+        if source.sourceType == SourceType.WEB_PAGE and source.sourceData.crawl:
+            crawl_root = normalize_url(source.sourceData.webPageURL) or source.sourceData.webPageURL
+            crawl_sources = list_knowledge_sources(practice_id, SourceType.WEB_PAGE, crawl_root=crawl_root)
+            for entry in crawl_sources:
+                registered[(entry.practice_id, entry.source_type, entry.source_key)] = entry
+            if not crawl_sources:
+                unregistered_crawls.append(
+                    {"$and": [{"practice_id": practice_id}, {"source_type": SourceType.WEB_PAGE.value}, {"crawl_root": crawl_root}]}
+                )
+            continue
+
+        if source.sourceType == SourceType.WEB_PAGE:
+            key, where = source.sourceData.webPageURL, {"source_url": source.sourceData.webPageURL}
+        elif source.sourceType == SourceType.QA_PAIR:
+            key = _sanitize_for_doc_id(source.sourceData.qa_pair.question)
+            where = {"doc_id": key}
         else:
-            logger.info(f"No existing documents found for URL {website}.")
-            return 0
-    except Exception as e:
-        logger.error(f"Error while deleting documents for {website}: {e}", exc_info=True)
-        raise
+            key = _sanitize_for_doc_id(source.sourceData.document.name)
+            where = {"doc_id": key}
+        keyed_filters[(practice_id, source.sourceType.value, key)] = {
+            "$and": [{"practice_id": practice_id}, {"source_type": source.sourceType.value}, where]
+        }
 
+    registered.update(get_knowledge_sources(list(keyed_filters)))
+    if not settings.KNOWLEDGE_SOURCE_REGISTRY_FALLBACK:
+        return list(registered.values()), []
+    unregistered = [where for key, where in keyed_filters.items() if key not in registered]
+    return list(registered.values()), unregistered + unregistered_crawls
 
-def retrieve_data(query: str, practice_id: int, filters: Optional[Dict[str, Any]] = None) -> tuple[str, bool]:
-    """
-    Retrieves data from the vector store based on a query and optional filters,
-    and generates a response using an LLM.
 
-    Args:
-        query: The user's question.
-        practice_id: The practice ID to filter the search results.
-        filters: A dictionary of metadata to filter the search results.
+def purge_practice_data(
+    practice_id: int,
+    source_types: Optional[list[SourceType]] = None,
+    sources: Optional[list[PurgeSource]] = None,
+    job: Optional[IngestionJobContext] = None,
+) -> dict:
+    """
+    Deletes knowledge base content of a practice in bulk: everything, only the
+    sources of the given types, or only the listed sources. Purging the whole
+    practice also deletes its conversations and settings.
 
-    Returns:
-        A tuple containing:
-        - The content of the model's response (str).
-        - A boolean indicating if relevant data was found (bool).
+    Chunk ids come from the source registry and are deleted in large batches.
+    Whole-practice and per-type purges then sweep the vector store for chunks
+    the registry does not know about, so nothing is left behind. A cancelled
+    purge stops between batches and can simply be run again. A whole-practice
+    purge first waits for the practice's ingestion jobs, which were asked to
+    cancel when it was queued, so none of them writes content back.
+    Returns the number of chunks, sources and interactions deleted.
     """
+    whole_practice = not source_types and not sources
     vector_store = get_vector_store()
+    _checkpoint(job, 0.0)
+    if whole_practice:
+        wait_for_practice_ingestion_jobs(practice_id, job)
+
+    if sources:
+        registered, sweep_filters = _resolve_purge_sources(practice_id, sources)
+    else:
+        registered = list_knowledge_sources(practice_id)
+        if source_types:
+            registered = [source for source in registered if SourceType(source.source_type) in source_types]
+            type_filter = {"source_type": {"$in": [source_type.value for source_type in source_types]}}
+            sweep_filters = [{"$and": [{"practice_id": practice_id}, type_filter]}]
+        else:
+            sweep_filters = [{"practice_id": practice_id}]
+
+    total = max(sum(source.chunk_count for source in registered), 1)
+    deleted = 0
 
+    def delete_batch(ids: list[str]):
+        nonlocal deleted
+        _checkpoint(job, 0.9 * min(deleted / total, 1.0))
+        vector_store.delete(practice_id, ids=ids)
+        if not whole_practice:
+            _update_lexical_index(practice_id, ids)
+        deleted += len(ids)
+
+    registered_ids = [id_ for source in registered for id_ in source.chunks]
+    logger.info(f"Purging {len(registered)} registered sources ({len(registered_ids)} chunks) of practice_id {practice_id}...")
+    for ids in _batched(registered_ids, VECTOR_STORE_DELETE_BATCH_SIZE):
+        delete_batch(ids)
+
+    for where_batch in _batched(sweep_filters, VECTOR_STORE_FILTER_BATCH_SIZE):
+        where = where_batch[0] if len(where_batch) == 1 else {"$or": where_batch}
+        previous_ids = None
+        while True:
+            ids = vector_store.get(practice_id, where=where, include=[], limit=VECTOR_STORE_DELETE_BATCH_SIZE).get("ids", [])
+            if not ids or ids == previous_ids:
+                break
+            delete_batch(ids)
+            previous_ids = ids
+
+    _checkpoint(job, 0.9)
+    if whole_practice:
+        if settings.LEXICAL_INDEX_ENABLED:
+            _lexical_index.clear(practice_id)
+        sources_deleted = delete_practice_knowledge_sources(practice_id)
+        interactions_deleted = delete_practice_interactions(practice_id)
+        delete_practice_settings(practice_id)
+        delete_practice_retrieval_scores(practice_id)
+    elif source_types:
+        sources_deleted = delete_practice_knowledge_sources(practice_id, source_types)
+        interactions_deleted = 0
+    else:
+        sources_deleted = 0
+        for source_type in SourceType:
+            keys = [source.source_key for source in registered if source.source_type == source_type.value]
+            if keys:
+                sources_deleted += delete_knowledge_sources(practice_id, source_type, keys)
+        interactions_deleted = 0
+
+    logger.info(
+        f"Purged practice_id {practice_id}: {deleted} chunks, {sources_deleted} sources "
+        f"and {interactions_deleted} interactions deleted."
+    )
+    return {
+        "chunksDeleted": deleted,
+        "sourcesDeleted": sources_deleted,
+        "interactionsDeleted": interactions_deleted,
+    }
+
+
+def _build_search_filters(practice_id: int, filters: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
     search_filters = filters.copy() if filters else {}
     search_filters["practice_id"] = practice_id
+    return search_filters
 
-    results_with_scores = vector_store.similarity_search_with_score(
-        query=query, k=3, filter=search_filters
-    )
 
-    if not results_with_scores:
-        logger.warning(f"No results found for query: '{query}' with filters: {search_filters}")
-        return "No relevant information was found to answer your question.", False
+def _chunk_key(doc: Document) -> str:
+    return doc.id or f"{doc.metadata.get('doc_id')}_{doc.metadata.get('content_hash')}"
+
 
-    filtered_results_with_scores = [
-        (doc, score) for doc, score in results_with_scores if score < VECTOR_EMBEDDINGS_SIMILARITY_THRESHOLD
+@dataclass
+class LexicalResults:
+    """
+    BM25 candidates of a query, best first, with their score relative to the
+    best one. Raw BM25 scores depend on the corpus size and term rarity, so
+    they are only compared within a query. `strong_keys` are the candidates
+    matching enough of the query's terms to count as a hit on their own.
+    """
+
+    results: list[tuple[Document, float]]
+    strong_keys: set[str]
+
+
+def _lexical_search(query: str, practice_id: int, filters: Optional[Dict[str, Any]] = None) -> LexicalResults:
+    """Returns the BM25 candidates for a query, or none if the lexical index is disabled or unavailable."""
+    if not settings.LEXICAL_INDEX_ENABLED:
+        return LexicalResults([], set())
+    try:
+        results = _lexical_index.search(practice_id, query, HYBRID_SEARCH_CANDIDATES, filters)
+        if not results:
+            return LexicalResults([], set())
+
+        top_score = results[0][1]
+        relative = [(doc, score / top_score if top_score > 0 else 0.0) for doc, score in results]
+        relative = [(doc, score) for doc, score in relative if score >= LEXICAL_MIN_RELATIVE_SCORE]
+
+        # Short queries such as "thanks" can never be a strong match, however
+        # rare their terms are in the practice's documents.
+        term_count = len(_lexical_index.query_terms(query))
+        strong_keys = set()
+        if term_count >= LEXICAL_STRONG_MATCH_MIN_TERMS:
+            matched = _lexical_index.matched_term_counts(practice_id, query, [doc.id for doc, _ in relative])
+            strong_keys = {
+                _chunk_key(doc) for doc, _ in relative
+                if matched.get(doc.id, 0) >= max(LEXICAL_STRONG_MATCH_MIN_TERMS, LEXICAL_STRONG_MATCH_MIN_COVERAGE * term_count)
+            }
+        return LexicalResults(relative, strong_keys)
+    except sqlite3.Error as e:
+        logger.warning(f"Lexical search failed for practice_id {practice_id}, using vector search only: {e}")
+        return LexicalResults([], set())
+
+
+def _lexical_fast_path(lexical: LexicalResults) -> Optional[list[tuple[Document, float]]]:
+    """
+    Returns the lexical results to answer from when the best BM25 match is a
+    strong match and clearly ahead of the runner-up, in which case the query
+    embedding and vector search are skipped. Returns None otherwise.
+    """
+    if not settings.LEXICAL_FAST_PATH_ENABLED or not lexical.results:
+        return None
+
+    top_doc, top_score = lexical.results[0]
+    runner_up_score = lexical.results[1][1] if len(lexical.results) > 1 else 0.0
+    if _chunk_key(top_doc) not in lexical.strong_keys or top_score < runner_up_score * LEXICAL_FAST_PATH_MIN_MARGIN:
+        return None
+
+    metrics.increment("retrieval.lexical_fast_path")
+    return [
+        (doc, score) for doc, score in lexical.results[:RETRIEVAL_TOP_K] if _chunk_key(doc) in lexical.strong_keys
     ]
 
+
+def _fuse_results(
+    vector_results: list[tuple[Document, float]],
+    lexical: LexicalResults,
+    similarity_threshold: float,
+    limit: int = RETRIEVAL_TOP_K,
+) -> list[tuple[Document, float]]:
+    """
+    Merges the vector results within the practice's similarity threshold and the
+    lexical results with reciprocal rank fusion. Lexical candidates only join
+    when the vector search found the query relevant too; otherwise only strong
+    lexical matches do, so a few rare words cannot make an off-topic message,
+    such as a thank-you, a knowledge base hit. Returns the top `limit` results
+    with their fused score, highest first.
+    """
+    vector_hits = [doc for doc, distance in vector_results if distance < similarity_threshold]
+    if vector_hits:
+        lexical_hits = [doc for doc, _ in lexical.results]
+    else:
+        lexical_hits = [doc for doc, _ in lexical.results if _chunk_key(doc) in lexical.strong_keys]
+    rankings = [vector_hits, lexical_hits]
+    metrics.increment("retrieval.hybrid")
+
+    documents = {}
+    fused_scores = {}
+    for ranking in rankings:
+        for rank, doc in enumerate(ranking, start=1):
+            key = _chunk_key(doc)
+            documents.setdefault(key, doc)
+            fused_scores[key] = fused_scores.get(key, 0.0) + 1.0 / (RRF_K + rank)
+
+    top_keys = sorted(fused_scores, key=fused_scores.get, reverse=True)[:limit]
+    return [(documents[key], fused_scores[key]) for key in top_keys]
+
+
+def _record_best_distance(practice_id: int, vector_results: list[tuple[Document, float]]):
+    """Adds the distance of the closest chunk to the practice's score histogram, for threshold calibration."""
+    if settings.RETRIEVAL_SCORE_RECORDING_ENABLED and vector_results:
+        score_recorder.record(practice_id, min(distance for _, distance in vector_results))
+
+
+def _select_relevant_documents(
+    query: str,
+    results_with_scores: list[tuple[Document, float]],
+) -> list[Document]:
+    """
+    Keeps, among the relevant results, only the ones of the highest-priority
+    source type present.
+    """
+    filtered_results_with_scores = results_with_scores
+
     if filtered_results_with_scores:
         source_types_present = {doc.metadata.get("source_type") for doc, _ in filtered_results_with_scores}
 
@@ -400,7 +1132,7 @@ def retrieve_data(query: str, practice_id: int, filters: Optional[Dict[str, Any]
     logger.info(f"Found {len(filtered_results_with_scores)} results for query: '{query}'")
     for doc, score in filtered_results_with_scores:
         doc_id = doc.metadata.get('doc_id', 'N/A')
-        logger.info(f"  - Document ID: {doc_id}, Score (distance): {score:.4f}")
+        logger.info(f"  - Document ID: {doc_id}, Score: {score:.4f}")
 
     results = [
         doc for doc, _ in filtered_results_with_scores
@@ -408,19 +1140,179 @@ def retrieve_data(query: str, practice_id: int, filters: Optional[Dict[str, Any]
 
     if not results:
         logger.warning(
-            f"No results found within similarity threshold ({VECTOR_EMBEDDINGS_SIMILARITY_THRESHOLD}) for query: '{query}'"
+            f"No results found within similarity threshold for query: '{query}'"
         )
-        return "No relevant information was found to answer your question.", False
+    return results
 
-    context = "\n---\n".join([doc.page_content for doc in results])
+
+def _build_answer_chain():
     prompt = ChatPromptTemplate.from_template(VECTOR_EMBEDDINGS_QUERY_SYSTEM_PROMPT)
-    model = ChatOpenAI(
-        model=settings.OPENAI_MODEL,
-        temperature=0,
+    return prompt | get_llm_clients().get_chat_model()
+
+
+def _format_context(documents: list[Document]) -> str:
+    return "\n---\n".join([doc.page_content for doc in documents])
+
+
+def _retrieve_documents(query: str, practice_id: int, filters: Optional[Dict[str, Any]] = None) -> list[Document]:
+    """
+    Returns the ranked chunks relevant to a query, best first.
+
+    Candidates come from the practice's BM25 index and the vector store, fused by
+    rank. When the lexical match is confident enough, the vector search and its
+    query embedding are skipped. When the reranker is enabled, a wider fused
+    candidate set is scored by the cross-encoder and only its best few are kept.
+    """
+    lexical = _lexical_search(query, practice_id, filters)
+    results_with_scores = _lexical_fast_path(lexical)
+
+    if results_with_scores is None:
+        reranker = get_reranker()
+        limit = settings.RERANKER_CANDIDATES if reranker else RETRIEVAL_TOP_K
+        query_embedding = _query_embedding_cache.get_or_compute(
+            settings.EMBEDDINGS_MODEL, query, get_embeddings().embed_query
+        )
+        vector_results = get_vector_store().similarity_search_by_vector_with_score(
+            embedding=query_embedding,
+            k=max(HYBRID_SEARCH_CANDIDATES, limit),
+            filter=_build_search_filters(practice_id, filters),
+        )
+        _record_best_distance(practice_id, vector_results)
+        results_with_scores = _fuse_results(
+            vector_results, lexical, get_similarity_threshold(practice_id), limit
+        )
+        if reranker:
+            results_with_scores = reranker.rerank(query, results_with_scores, settings.RERANKER_TOP_N)
+
+    return _select_relevant_documents(query, results_with_scores)
+
+
+async def aembed_retrieval_query(query: str) -> list[float]:
+    """Embeds a retrieval query, through the query embedding cache."""
+    return await _query_embedding_cache.aget_or_compute(
+        settings.EMBEDDINGS_MODEL, query, get_embeddings().aembed_query
     )
 
-    chain = prompt | model
 
-    response = chain.invoke({"context": context, "question": query})
+async def _aretrieve_documents(
+    query: str,
+    practice_id: int,
+    filters: Optional[Dict[str, Any]] = None,
+    query_embedding: Optional[list[float]] = None,
+) -> list[Document]:
+    """
+    Async counterpart of `_retrieve_documents`. `query_embedding` is the vector
+    of the query if the caller already computed it.
+    """
+    lexical = await asyncio.to_thread(_lexical_search, query, practice_id, filters)
+    results_with_scores = _lexical_fast_path(lexical)
+
+    if results_with_scores is None:
+        reranker = get_reranker()
+        limit = settings.RERANKER_CANDIDATES if reranker else RETRIEVAL_TOP_K
+        if query_embedding is None:
+            query_embedding = await aembed_retrieval_query(query)
+        vector_results = await get_vector_store().asimilarity_search_by_vector_with_score(
+            embedding=query_embedding,
+            k=max(HYBRID_SEARCH_CANDIDATES, limit),
+            filter=_build_search_filters(practice_id, filters),
+        )
+        _record_best_distance(practice_id, vector_results)
+        results_with_scores = _fuse_results(
+            vector_results, lexical, await aget_similarity_threshold(practice_id), limit
+        )
+        if reranker:
+            # Inference is CPU-bound, keep it off the event loop.
+            results_with_scores = await asyncio.to_thread(
+                reranker.rerank, query, results_with_scores, settings.RERANKER_TOP_N
+            )
+
+    return _select_relevant_documents(query, results_with_scores)
+
+
+async def aretrieve_context(
+    query: str,
+    practice_id: int,
+    filters: Optional[Dict[str, Any]] = None,
+    query_embedding: Optional[list[float]] = None,
+) -> tuple[str, bool]:
+    """
+    Retrieves the knowledge base context for a query without generating an answer.
+
+    The caller answers from the context as part of its own generation step, which
+    saves the separate LLM call made by `aretrieve_data`.
+
+    Args:
+        query: The user's question.
+        practice_id: The practice ID to filter the search results.
+        filters: A dictionary of metadata to filter the search results.
+        query_embedding: The query's vector, from `aembed_retrieval_query`, if
+            the caller already computed it.
+
+    Returns:
+        A tuple containing:
+        - The relevant chunks, best first, separated by `---` (str). Empty if none were found.
+        - A boolean indicating if relevant data was found (bool).
+    """
+    results = await _aretrieve_documents(query, practice_id, filters, query_embedding)
+    if not results:
+        return "", False
+    return _format_context(results), True
+
+
+async def agenerate_answer(query: str, context: str) -> str:
+    """Answers a query from retrieved context with a dedicated LLM call."""
+    response = await _build_answer_chain().ainvoke({"context": context, "question": query})
+    return response.content
+
+
+def retrieve_data(query: str, practice_id: int, filters: Optional[Dict[str, Any]] = None) -> tuple[str, bool]:
+    """
+    Retrieves data from the knowledge base based on a query and optional filters,
+    and generates a response using an LLM.
+
+    Candidates come from the practice's BM25 index and the vector store, fused by
+    rank. When the lexical match is confident enough, the vector search and its
+    query embedding are skipped.
+
+    Args:
+        query: The user's question.
+        practice_id: The practice ID to filter the search results.
+        filters: A dictionary of metadata to filter the search results.
+
+    Returns:
+        A tuple containing:
+        - The content of the model's response (str).
+        - A boolean indicating if relevant data was found (bool).
+    """
+    results = _retrieve_documents(query, practice_id, filters)
+    if not results:
+        return "No relevant information was found to answer your question.", False
+
+    response = _build_answer_chain().invoke({"context": _format_context(results), "question": query})
 
     return response.content, True
+
+
+async def aretrieve_data(query: str, practice_id: int, filters: Optional[Dict[str, Any]] = None) -> tuple[str, bool]:
+    """
+    Async counterpart of `retrieve_data` for use on the event loop.
+
+    The query embedding, vector search and answer generation are awaited, so a slow
+    retrieval no longer blocks other requests served by the same worker.
+
+    Args:
+        query: The user's question.
+        practice_id: The practice ID to filter the search results.
+        filters: A dictionary of metadata to filter the search results.
+
+    Returns:
+        A tuple containing:
+        - The content of the model's response (str).
+        - A boolean indicating if relevant data was found (bool).
+    """
+    results = await _aretrieve_documents(query, practice_id, filters)
+    if not results:
+        return "No relevant information was found to answer your question.", False
+
+    return await agenerate_answer(query, _format_context(results)), True
@@ -0,0 +1,349 @@
+import logging
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Any, Optional
+
+from sqlalchemy import and_, func, or_, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+from sqlalchemy.orm import Session
+
+from src.config import settings
+from src.database.db import get_sync_engine
+from src.database.models import IngestionJob
+from src.services.uploads import discard_upload
+from src.shared.enums import IngestionJobLease, IngestionJobStatus, IngestionJobType
+from src.shared.schemas import (
+    CalibrateThresholdsRequest,
+    CreateEmbeddingsBatchRequest,
+    CreateEmbeddingsRequest,
+    PurgeEmbeddingsRequest,
+)
+
+logger = logging.getLogger(__name__)
+
+# Jobs that write to a practice's knowledge base, and must not outlive a purge of it.
+KNOWLEDGE_WRITING_JOB_TYPES = [
+    IngestionJobType.INGEST.value,
+    IngestionJobType.BATCH_INGEST.value,
+    IngestionJobType.WEB_REFRESH.value,
+]
+
+
+class IngestionJobCancelledError(Exception):
+    """Raised at an ingestion checkpoint when the job has been cancelled."""
+    pass
+
+
+class IngestionJobContext:
+    """
+    Handle passed to the ingestion functions while they run on a worker thread.
+
+    The worker's heartbeat reads `progress` and flags cancellation, and the
+    ingestion code calls `checkpoint` between stages. Checkpoints are only placed
+    before any write to the vector store, so a cancelled job never leaves a
+    source half-replaced. A job whose lease was lost to another worker is stopped
+    the same way, but its status is left to the worker that now holds it.
+    """
+
+    def __init__(self, job_id: str):
+        self.job_id = job_id
+        self.progress = 0.0
+        self.lease_lost = False
+        self._cancelled = threading.Event()
+
+    def cancel(self):
+        self._cancelled.set()
+
+    def lose_lease(self):
+        self.lease_lost = True
+        self._cancelled.set()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancelled.is_set()
+
+    def checkpoint(self, progress: float):
+        self.progress = max(self.progress, min(progress, 1.0))
+        if self._cancelled.is_set():
+            raise IngestionJobCancelledError(f"Ingestion job {self.job_id} was cancelled.")
+
+
+def _now() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+def _discard_job_upload(payload: dict):
+    """Deletes the uploaded file of a document ingestion job that will never run."""
+    upload_id = ((payload.get("sourceData") or {}).get("document") or {}).get("uploadId")
+    if upload_id:
+        discard_upload(upload_id)
+
+
+async def enqueue_ingestion_job(db: AsyncSession, request: CreateEmbeddingsRequest) -> IngestionJob:
+    """
+    Persists an embeddings request as a queued ingestion job.
+    """
+    job = IngestionJob(
+        job_type=IngestionJobType.INGEST.value,
+        practice_id=request.practiceId,
+        source_type=request.sourceType.value,
+        payload=request.model_dump(mode="json"),
+        status=IngestionJobStatus.QUEUED.value,
+    )
+    db.add(job)
+    await db.commit()
+    await db.refresh(job)
+    logger.info(f"Queued ingestion job {job.id} ({job.source_type}) for practice_id: {job.practice_id}")
+    return job
+
+
+async def enqueue_batch_ingestion_job(db: AsyncSession, request: CreateEmbeddingsBatchRequest) -> IngestionJob:
+    """
+    Persists a batch of embeddings requests as a single queued ingestion job.
+    Practice and source type are only set on the job when all items share them.
+    """
+    practice_ids = {item.practiceId for item in request.items}
+    source_types = {item.sourceType for item in request.items}
+    job = IngestionJob(
+        job_type=IngestionJobType.BATCH_INGEST.value,
+        practice_id=practice_ids.pop() if len(practice_ids) == 1 else None,
+        source_type=source_types.pop().value if len(source_types) == 1 else None,
+        payload=request.model_dump(mode="json"),
+        status=IngestionJobStatus.QUEUED.value,
+    )
+    db.add(job)
+    await db.commit()
+    await db.refresh(job)
+    logger.info(f"Queued batch ingestion job {job.id} with {len(request.items)} items.")
+    return job
+
+
+async def enqueue_purge_job(db: AsyncSession, request: PurgeEmbeddingsRequest) -> IngestionJob:
+    """
+    Persists a bulk delete of a practice's knowledge base as a queued job.
+    Purging the whole practice also cancels its queued and running ingestion
+    jobs, so none of them writes content back after the purge.
+    """
+    if not request.sourceTypes and not request.sources:
+        await _cancel_practice_ingestion_jobs(db, request.practiceId)
+
+    job = IngestionJob(
+        job_type=IngestionJobType.PURGE.value,
+        practice_id=request.practiceId,
+        source_type=request.sourceTypes[0].value if request.sourceTypes and len(request.sourceTypes) == 1 else None,
+        payload=request.model_dump(mode="json"),
+        status=IngestionJobStatus.QUEUED.value,
+    )
+    db.add(job)
+    await db.commit()
+    await db.refresh(job)
+    logger.info(f"Queued purge job {job.id} for practice_id: {job.practice_id}")
+    return job
+
+
+async def enqueue_calibration_job(db: AsyncSession, request: CalibrateThresholdsRequest) -> IngestionJob:
+    """
+    Persists a similarity threshold calibration as a queued job. The practice is
+    only set on the job when a single one is calibrated.
+    """
+    job = IngestionJob(
+        job_type=IngestionJobType.CALIBRATE_THRESHOLDS.value,
+        practice_id=request.practiceIds[0] if request.practiceIds and len(request.practiceIds) == 1 else None,
+        payload=request.model_dump(mode="json"),
+        status=IngestionJobStatus.QUEUED.value,
+    )
+    db.add(job)
+    await db.commit()
+    await db.refresh(job)
+    logger.info(f"Queued similarity threshold calibration job {job.id}.")
+    return job
+
+
+async def get_ingestion_job(db: AsyncSession, job_id: str) -> Optional[IngestionJob]:
+    return await db.get(IngestionJob, job_id)
+
+
+async def cancel_ingestion_job(db: AsyncSession, job_id: str) -> Optional[IngestionJob]:
+    """
+    Cancels a job. Queued jobs are cancelled immediately, running jobs are flagged
+    and stop at their next checkpoint. Finished jobs are returned unchanged.
+    """
+    job = await db.get(IngestionJob, job_id, with_for_update=True)
+    if not job:
+        return None
+
+    _cancel_job(job)
+    await db.commit()
+    await db.refresh(job)
+    return job
+
+
+def _cancel_job(job: IngestionJob):
+    if job.status == IngestionJobStatus.QUEUED.value:
+        job.status = IngestionJobStatus.CANCELLED.value
+        job.finished_at = _now()
+        _discard_job_upload(job.payload)
+        logger.info(f"Cancelled queued ingestion job {job.id}.")
+    elif job.status == IngestionJobStatus.RUNNING.value:
+        job.cancel_requested = True
+        logger.info(f"Requested cancellation of running ingestion job {job.id}.")
+
+
+async def _cancel_practice_ingestion_jobs(db: AsyncSession, practice_id: int):
+    """
+    Cancels the practice's unfinished jobs that write to its knowledge base.
+    Batches spanning several practices have no practice set and are left alone.
+    """
+    result = await db.execute(
+        select(IngestionJob)
+        .where(
+            IngestionJob.practice_id == practice_id,
+            IngestionJob.job_type.in_(KNOWLEDGE_WRITING_JOB_TYPES),
+            IngestionJob.status.in_([IngestionJobStatus.QUEUED.value, IngestionJobStatus.RUNNING.value]),
+        )
+        .with_for_update()
+    )
+    for job in result.scalars():
+        _cancel_job(job)
+
+
+async def claim_next_ingestion_job(db: AsyncSession, worker_id: str) -> Optional[IngestionJob]:
+    """
+    Claims the oldest runnable job for this worker. A job is runnable when it is
+    queued, or when it is running but its lease expired because the worker that
+    held it died. `SKIP LOCKED` lets several workers poll the table concurrently.
+    """
+    now = _now()
+    lease_expired = and_(
+        IngestionJob.status == IngestionJobStatus.RUNNING.value,
+        IngestionJob.lease_expires_at < now,
+    )
+
+    # A job asked to cancel whose worker died is not run again.
+    await db.execute(
+        update(IngestionJob)
+        .where(lease_expired, IngestionJob.cancel_requested.is_(True))
+        .values(status=IngestionJobStatus.CANCELLED.value, finished_at=now, lease_expires_at=None)
+    )
+    exhausted = await db.execute(
+        update(IngestionJob)
+        .where(lease_expired)
+        .where(IngestionJob.attempts >= settings.INGESTION_JOB_MAX_ATTEMPTS)
+        .values(
+            status=IngestionJobStatus.FAILED.value,
+            error="Ingestion job exceeded the maximum number of attempts.",
+            finished_at=now,
+            lease_expires_at=None,
+        )
+        .returning(IngestionJob.id, IngestionJob.payload)
+    )
+    for failed_job_id, failed_payload in exhausted.all():
+        logger.warning(f"Ingestion job {failed_job_id} failed after {settings.INGESTION_JOB_MAX_ATTEMPTS} attempts.")
+        _discard_job_upload(failed_payload)
+
+    result = await db.execute(
+        select(IngestionJob)
+        .where(or_(IngestionJob.status == IngestionJobStatus.QUEUED.value, lease_expired))
+        .order_by(IngestionJob.created_at)
+        .limit(1)
+        .with_for_update(skip_locked=True)
+    )
+    job = result.scalar_one_or_none()
+    if not job:
+        await db.commit()
+        return None
+
+    job.status = IngestionJobStatus.RUNNING.value
+    job.worker_id = worker_id
+    job.attempts += 1
+    job.started_at = job.started_at or now
+    job.lease_expires_at = now + timedelta(seconds=settings.INGESTION_JOB_LEASE_SECONDS)
+    await db.commit()
+    await db.refresh(job)
+    return job
+
+
+async def renew_ingestion_job_lease(
+    db: AsyncSession, job_id: str, worker_id: str, progress: float
+) -> IngestionJobLease:
+    """
+    Extends the lease of a running job and records its progress. The lease is
+    lost when the job was claimed by another worker or finished in the meantime.
+    """
+    job = await db.get(IngestionJob, job_id, with_for_update=True)
+    if not job or job.worker_id != worker_id or job.status != IngestionJobStatus.RUNNING.value:
+        await db.commit()
+        return IngestionJobLease.LOST
+
+    job.progress = progress
+    job.lease_expires_at = _now() + timedelta(seconds=settings.INGESTION_JOB_LEASE_SECONDS)
+    cancel_requested = job.cancel_requested
+    await db.commit()
+    return IngestionJobLease.CANCEL_REQUESTED if cancel_requested else IngestionJobLease.RENEWED
+
+
+async def finish_ingestion_job(
+    db: AsyncSession,
+    job_id: str,
+    worker_id: str,
+    status: IngestionJobStatus,
+    error: Optional[str] = None,
+    result: Optional[Any] = None,
+) -> bool:
+    """
+    Records the outcome of a job, if this worker still holds it.
+    Returns False when the job was claimed by another worker meanwhile.
+    """
+    values = {
+        "status": status.value,
+        "error": error,
+        "result": result,
+        "finished_at": _now(),
+        "lease_expires_at": None,
+    }
+    if status == IngestionJobStatus.SUCCEEDED:
+        values["progress"] = 1.0
+    updated = await db.execute(
+        update(IngestionJob)
+        .where(
+            IngestionJob.id == job_id,
+            IngestionJob.worker_id == worker_id,
+            IngestionJob.status == IngestionJobStatus.RUNNING.value,
+        )
+        .values(**values)
+    )
+    await db.commit()
+    return updated.rowcount > 0
+
+
+def wait_for_practice_ingestion_jobs(practice_id: int, job: Optional[IngestionJobContext] = None):
+    """
+    Blocks until no live job writes to the practice's knowledge base, for at most
+    one lease. Jobs asked to cancel stop at their next checkpoint, which comes
+    before any write; the wait covers the writes already under way. Jobs whose
+    worker died are not waited for: the next claim marks them cancelled.
+    """
+    statement = (
+        select(func.count())
+        .select_from(IngestionJob)
+        .where(
+            IngestionJob.practice_id == practice_id,
+            IngestionJob.job_type.in_(KNOWLEDGE_WRITING_JOB_TYPES),
+            IngestionJob.status == IngestionJobStatus.RUNNING.value,
+            IngestionJob.lease_expires_at > func.now(),
+        )
+    )
+    deadline = time.monotonic() + settings.INGESTION_JOB_LEASE_SECONDS
+    while True:
+        with Session(get_sync_engine()) as session:
+            running = session.scalar(statement)
+        if not running:
+            return
+        if time.monotonic() >= deadline:
+            logger.warning(f"{running} ingestion jobs of practice_id {practice_id} are still running, purging anyway.")
+            return
+        if job:
+            job.checkpoint(job.progress)
+        time.sleep(settings.INGESTION_JOB_HEARTBEAT_SECONDS)
@@ -0,0 +1,175 @@
+import logging
+from datetime import datetime, timezone
+from typing import Iterable, Optional
+
+from sqlalchemy import delete, func, select, tuple_, update
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, defer
+
+from src.database.db import get_sync_engine
+from src.database.models import KnowledgeSource
+from src.services.document_processing import clean_text
+from src.services.scrapers import ScrapedPage
+from src.shared.enums import SourceType
+from src.shared.utils.hashing import content_hash
+
+logger = logging.getLogger(__name__)
+
+# Large enough to keep round-trips few, small enough to stay well below the
+# bind parameter limit of a single statement.
+REGISTRY_BATCH_SIZE = 1000
+
+SourceKey = tuple[int, str, str]
+
+
+def page_fingerprint(page: ScrapedPage) -> str:
+    """Fingerprint of a page's scraped content, compared to detect changed pages."""
+    return content_hash(f"{page.title}\n{clean_text(page.markdown)}")
+
+
+def chunks_fingerprint(chunk_hashes: Iterable[str]) -> str:
+    """Fingerprint of a source from the content hashes of its chunks, in order."""
+    return content_hash("\n".join(chunk_hashes))
+
+
+# The functions below are blocking: they are called from the ingestion code,
+# which runs on worker threads outside the event loop.
+
+
+def get_knowledge_source(practice_id: int, source_type: SourceType, source_key: str) -> Optional[KnowledgeSource]:
+    with Session(get_sync_engine()) as session:
+        return session.get(KnowledgeSource, (practice_id, source_type.value, source_key))
+
+
+def get_knowledge_sources(keys: list[SourceKey]) -> dict[SourceKey, KnowledgeSource]:
+    """Looks up many sources by `(practice_id, source_type, source_key)`."""
+    found = {}
+    with Session(get_sync_engine()) as session:
+        for start in range(0, len(keys), REGISTRY_BATCH_SIZE):
+            batch = keys[start:start + REGISTRY_BATCH_SIZE]
+            rows = session.scalars(
+                select(KnowledgeSource).where(
+                    tuple_(KnowledgeSource.practice_id, KnowledgeSource.source_type, KnowledgeSource.source_key).in_(batch)
+                )
+            )
+            for row in rows:
+                found[(row.practice_id, row.source_type, row.source_key)] = row
+    return found
+
+
+def list_knowledge_sources(
+    practice_id: int,
+    source_type: Optional[SourceType] = None,
+    crawl_root: Optional[str] = None,
+    with_chunks: bool = True,
+) -> list[KnowledgeSource]:
+    """
+    Lists a practice's sources. Without `with_chunks`, the chunk map, which holds
+    an entry per chunk, is not loaded and must not be accessed.
+    """
+    statement = select(KnowledgeSource).where(KnowledgeSource.practice_id == practice_id)
+    if not with_chunks:
+        statement = statement.options(defer(KnowledgeSource.chunks, raiseload=True))
+    if source_type:
+        statement = statement.where(KnowledgeSource.source_type == source_type.value)
+    if crawl_root:
+        statement = statement.where(KnowledgeSource.crawl_root == crawl_root)
+    with Session(get_sync_engine()) as session:
+        return list(session.scalars(statement.order_by(KnowledgeSource.source_key)))
+
+
+def record_knowledge_sources(entries: list[dict]):
+    """
+    Inserts or replaces registry entries. Each entry holds the column values of
+    a source: practice_id, source_type, source_key, name, chunks, content_hash
+    and optionally crawl_root and last_checked_at.
+    """
+    rows = [
+        {"crawl_root": None, "last_checked_at": None, **entry, "chunk_count": len(entry["chunks"])}
+        for entry in entries
+    ]
+    statement = insert(KnowledgeSource)
+    statement = statement.on_conflict_do_update(
+        index_elements=["practice_id", "source_type", "source_key"],
+        set_={
+            "name": statement.excluded.name,
+            "chunks": statement.excluded.chunks,
+            "chunk_count": statement.excluded.chunk_count,
+            "content_hash": statement.excluded.content_hash,
+            "last_checked_at": statement.excluded.last_checked_at,
+            # A page stored on its own keeps the crawl it was found by.
+            "crawl_root": func.coalesce(statement.excluded.crawl_root, KnowledgeSource.crawl_root),
+            "updated_at": func.now(),
+        },
+    )
+    with get_sync_engine().begin() as conn:
+        for start in range(0, len(rows), REGISTRY_BATCH_SIZE):
+            conn.execute(statement, rows[start:start + REGISTRY_BATCH_SIZE])
+
+
+def mark_knowledge_sources_checked(practice_id: int, source_type: SourceType, source_keys: list[str]):
+    """Records that sources were fetched again and found unchanged."""
+    now = datetime.now(timezone.utc)
+    with get_sync_engine().begin() as conn:
+        for start in range(0, len(source_keys), REGISTRY_BATCH_SIZE):
+            conn.execute(
+                update(KnowledgeSource)
+                .where(
+                    KnowledgeSource.practice_id == practice_id,
+                    KnowledgeSource.source_type == source_type.value,
+                    KnowledgeSource.source_key.in_(source_keys[start:start + REGISTRY_BATCH_SIZE]),
+                )
+                .values(last_checked_at=now)
+            )
+
+
+def delete_knowledge_sources(practice_id: int, source_type: SourceType, source_keys: list[str]) -> int:
+    deleted = 0
+    with get_sync_engine().begin() as conn:
+        for start in range(0, len(source_keys), REGISTRY_BATCH_SIZE):
+            result = conn.execute(
+                delete(KnowledgeSource).where(
+                    KnowledgeSource.practice_id == practice_id,
+                    KnowledgeSource.source_type == source_type.value,
+                    KnowledgeSource.source_key.in_(source_keys[start:start + REGISTRY_BATCH_SIZE]),
+                )
+            )
+            deleted += result.rowcount
+    return deleted
+
+
+def delete_practice_knowledge_sources(practice_id: int, source_types: Optional[list[SourceType]] = None) -> int:
+    """Removes all of a practice's sources from the registry, or only those of the given types."""
+    statement = delete(KnowledgeSource).where(KnowledgeSource.practice_id == practice_id)
+    if source_types:
+        statement = statement.where(KnowledgeSource.source_type.in_([source_type.value for source_type in source_types]))
+    with get_sync_engine().begin() as conn:
+        return conn.execute(statement).rowcount
+
+
+async def list_practice_knowledge_sources(
+    db: AsyncSession,
+    practice_id: int,
+    source_type: Optional[SourceType] = None,
+    limit: int = 100,
+    offset: int = 0,
+) -> tuple[list[KnowledgeSource], int]:
+    """
+    Returns a page of a practice's sources, ordered by type and key, and the
+    total count. The chunk maps are not loaded.
+    """
+    conditions = [KnowledgeSource.practice_id == practice_id]
+    if source_type:
+        conditions.append(KnowledgeSource.source_type == source_type.value)
+
+    total = await db.scalar(select(func.count()).select_from(KnowledgeSource).where(*conditions))
+    result = await db.execute(
+        select(KnowledgeSource)
+        .options(defer(KnowledgeSource.chunks, raiseload=True))
+        .where(*conditions)
+        .order_by(KnowledgeSource.source_type, KnowledgeSource.source_key)
+        .limit(limit)
+        .offset(offset)
+    )
+    return list(result.scalars()), total
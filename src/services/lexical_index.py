@@ -0,0 +1,183 @@
+import json
+import logging
+import os
+import sqlite3
+import threading
+from typing import Any, Dict, Optional
+
+import regex
+from langchain_core.documents import Document
+
+from src.shared.constants import LEXICAL_STOPWORDS
+
+logger = logging.getLogger(__name__)
+
+
+class LexicalIndex:
+    """
+    Per-practice BM25 inverted index over the knowledge base chunks, kept next to
+    the vector store and updated by the ingestion code.
+
+    Each practice gets its own SQLite file with an FTS5 index, so term statistics
+    (and therefore BM25 scores) only reflect that practice's documents. WAL mode
+    lets the ingestion worker write while the API reads.
+    """
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        self._connections: Dict[int, sqlite3.Connection] = {}
+        self._locks: Dict[int, threading.Lock] = {}
+        self._guard = threading.Lock()
+
+    def _connect(self, practice_id: int) -> tuple[sqlite3.Connection, threading.Lock]:
+        with self._guard:
+            if practice_id not in self._connections:
+                os.makedirs(self.directory, exist_ok=True)
+                path = os.path.join(self.directory, f"practice_{int(practice_id)}.sqlite3")
+                conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+                conn.execute("PRAGMA journal_mode=WAL")
+                conn.execute("PRAGMA synchronous=NORMAL")
+                conn.executescript(
+                    """
+                    CREATE TABLE IF NOT EXISTS chunks (
+                        rowid INTEGER PRIMARY KEY,
+                        chunk_id TEXT NOT NULL UNIQUE,
+                        metadata TEXT NOT NULL,
+                        content TEXT NOT NULL
+                    );
+                    CREATE VIRTUAL TABLE IF NOT EXISTS chunks_fts USING fts5(
+                        content,
+                        content='chunks',
+                        content_rowid='rowid',
+                        tokenize='porter unicode61 remove_diacritics 2'
+                    );
+                    CREATE TRIGGER IF NOT EXISTS chunks_ai AFTER INSERT ON chunks BEGIN
+                        INSERT INTO chunks_fts (rowid, content) VALUES (new.rowid, new.content);
+                    END;
+                    CREATE TRIGGER IF NOT EXISTS chunks_ad AFTER DELETE ON chunks BEGIN
+                        INSERT INTO chunks_fts (chunks_fts, rowid, content) VALUES ('delete', old.rowid, old.content);
+                    END;
+                    """
+                )
+                self._connections[practice_id] = conn
+                self._locks[practice_id] = threading.Lock()
+            return self._connections[practice_id], self._locks[practice_id]
+
+    @staticmethod
+    def query_terms(query: str) -> list[str]:
+        """Lowercased word tokens of a query, without stopwords and repeats."""
+        terms = regex.findall(r"\w+", query.casefold())
+        return list(dict.fromkeys(term for term in terms if term not in LEXICAL_STOPWORDS))
+
+    def upsert(self, practice_id: int, documents: list[Document], ids: list[str]):
+        """Indexes chunks, replacing any indexed chunks with the same ids."""
+        if not documents:
+            return
+
+        conn, lock = self._connect(practice_id)
+        with lock:
+            conn.execute("BEGIN")
+            try:
+                conn.executemany("DELETE FROM chunks WHERE chunk_id = ?", [(id_,) for id_ in ids])
+                conn.executemany(
+                    "INSERT INTO chunks (chunk_id, metadata, content) VALUES (?, ?, ?)",
+                    [
+                        (id_, json.dumps(doc.metadata), doc.page_content)
+                        for doc, id_ in zip(documents, ids)
+                    ],
+                )
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+
+    def remove(self, practice_id: int, ids: list[str]):
+        """Removes chunks by id. Ids that are not indexed are ignored."""
+        if not ids:
+            return
+
+        conn, lock = self._connect(practice_id)
+        with lock:
+            conn.execute("BEGIN")
+            try:
+                conn.executemany("DELETE FROM chunks WHERE chunk_id = ?", [(id_,) for id_ in ids])
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+
+    def clear(self, practice_id: int):
+        """
+        Removes every chunk of a practice. The file itself is kept, since other
+        processes may have it open.
+        """
+        conn, lock = self._connect(practice_id)
+        with lock:
+            conn.execute("BEGIN")
+            try:
+                conn.execute("DELETE FROM chunks")
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+            conn.execute("INSERT INTO chunks_fts (chunks_fts) VALUES ('optimize')")
+
+    def search(
+        self,
+        practice_id: int,
+        query: str,
+        k: int,
+        filters: Optional[Dict[str, Any]] = None,
+    ) -> list[tuple[Document, float]]:
+        """
+        Returns up to `k` chunks matching any of the query terms with their BM25
+        score, highest first. `filters` are equality matches on chunk metadata.
+        """
+        terms = self.query_terms(query)
+        if not terms:
+            return []
+
+        match = " OR ".join(f'"{term}"' for term in terms)
+        # Over-fetch when filtering, since filters are applied after ranking.
+        limit = k * 5 if filters else k
+
+        conn, lock = self._connect(practice_id)
+        with lock:
+            rows = conn.execute(
+                "SELECT chunks.chunk_id, chunks.metadata, chunks.content, bm25(chunks_fts) AS rank "
+                "FROM chunks_fts JOIN chunks ON chunks.rowid = chunks_fts.rowid "
+                "WHERE chunks_fts MATCH ? ORDER BY rank LIMIT ?",
+                (match, limit),
+            ).fetchall()
+
+        results = []
+        for chunk_id, metadata, content, rank in rows:
+            metadata = json.loads(metadata)
+            if filters and any(metadata.get(key) != value for key, value in filters.items()):
+                continue
+            # FTS5 returns BM25 negated so that better matches sort first.
+            results.append((Document(id=chunk_id, page_content=content, metadata=metadata), -rank))
+        return results[:k]
+
+    def matched_term_counts(self, practice_id: int, query: str, chunk_ids: list[str]) -> Dict[str, int]:
+        """
+        Returns how many distinct query terms each chunk matches. Terms are matched
+        by the index, so stemming applies as it does in `search`.
+        """
+        terms = self.query_terms(query)
+        counts = dict.fromkeys(chunk_ids, 0)
+        if not terms or not chunk_ids:
+            return counts
+
+        placeholders = ", ".join("?" for _ in chunk_ids)
+        conn, lock = self._connect(practice_id)
+        with lock:
+            for term in terms:
+                rows = conn.execute(
+                    "SELECT chunks.chunk_id FROM chunks_fts JOIN chunks ON chunks.rowid = chunks_fts.rowid "
+                    f"WHERE chunks_fts MATCH ? AND chunks.chunk_id IN ({placeholders})",
+                    (f'"{term}"', *chunk_ids),
+                ).fetchall()
+                for (chunk_id,) in rows:
+                    counts[chunk_id] += 1
+        return counts
@@ -0,0 +1,209 @@
+import json
+import logging
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import timedelta
+from typing import Optional, Sequence
+
+from cachetools import TTLCache
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import AIMessage, BaseMessage
+from langchain_core.tools import BaseTool
+from langchain_core.utils.function_calling import convert_to_openai_tool
+from sqlalchemy import delete, func, select
+from sqlalchemy.dialects.postgresql import insert
+
+from src.config import settings
+from src.database.db import AsyncSessionFactory
+from src.database.models import LLMCacheEntry
+from src.shared.enums import LLMCacheBackendType
+from src.shared.metrics import metrics
+from src.shared.utils.hashing import cache_key_hash
+
+logger = logging.getLogger(__name__)
+
+_llm_cache = None
+
+# Set while a workflow that opted out of the cache runs. Tasks started by the
+# workflow inherit it.
+_cache_bypassed: ContextVar[bool] = ContextVar("llm_cache_bypassed", default=False)
+
+
+@contextmanager
+def llm_cache_bypassed(bypassed: bool = True):
+    token = _cache_bypassed.set(bypassed)
+    try:
+        yield
+    finally:
+        _cache_bypassed.reset(token)
+
+
+class MemoryLLMCacheBackend:
+    """In-process LRU cache with a TTL. Each API process has its own."""
+
+    def __init__(self, max_entries: int, ttl_seconds: int):
+        self._cache = TTLCache(maxsize=max_entries, ttl=ttl_seconds)
+        self._lock = threading.Lock()
+        metrics.register_gauge("llm_cache.size", lambda: len(self._cache))
+
+    async def aget(self, key: str) -> Optional[dict]:
+        with self._lock:
+            return self._cache.get(key)
+
+    async def aset(self, key: str, model: str, response: dict):
+        with self._lock:
+            self._cache[key] = response
+
+    async def apurge_expired(self) -> int:
+        with self._lock:
+            size = len(self._cache)
+            self._cache.expire()
+            return size - len(self._cache)
+
+
+class PostgresLLMCacheBackend:
+    """
+    Cache stored in the `llm_response_cache` table, shared by all API processes.
+    Expired entries are ignored on read and deleted by `apurge_expired`.
+    """
+
+    def __init__(self, ttl_seconds: int):
+        self.ttl = timedelta(seconds=ttl_seconds)
+
+    async def aget(self, key: str) -> Optional[dict]:
+        async with AsyncSessionFactory() as db:
+            result = await db.execute(
+                select(LLMCacheEntry.response)
+                .where(LLMCacheEntry.key == key, LLMCacheEntry.expires_at > func.now())
+            )
+            return result.scalar_one_or_none()
+
+    async def aset(self, key: str, model: str, response: dict):
+        statement = insert(LLMCacheEntry).values(
+            key=key, model=model, response=response, expires_at=func.now() + self.ttl
+        )
+        statement = statement.on_conflict_do_update(
+            index_elements=["key"],
+            set_={
+                "response": statement.excluded.response,
+                "created_at": func.now(),
+                "expires_at": statement.excluded.expires_at,
+            },
+        )
+        async with AsyncSessionFactory() as db:
+            await db.execute(statement)
+            await db.commit()
+
+    async def apurge_expired(self) -> int:
+        async with AsyncSessionFactory() as db:
+            result = await db.execute(delete(LLMCacheEntry).where(LLMCacheEntry.expires_at <= func.now()))
+            await db.commit()
+            return result.rowcount
+
+
+def _create_memory_backend():
+    return MemoryLLMCacheBackend(settings.LLM_CACHE_MAX_ENTRIES, settings.LLM_CACHE_TTL_SECONDS)
+
+
+def _create_postgres_backend():
+    return PostgresLLMCacheBackend(settings.LLM_CACHE_TTL_SECONDS)
+
+
+_LLM_CACHE_BACKENDS = {
+    LLMCacheBackendType.MEMORY: _create_memory_backend,
+    LLMCacheBackendType.POSTGRES: _create_postgres_backend,
+}
+
+
+class LLMResponseCache:
+    """
+    Caches chat model responses of temperature-0 calls, which are deterministic
+    enough to be shared across sessions, keyed on a hash of the model, the bound
+    tools and the full message list. Cached calls see today's date but not the
+    time, and the date is part of the system prompt and therefore of the key.
+    Cache errors are logged and treated as misses, so the cache never fails a
+    call.
+    """
+
+    def __init__(self, backend):
+        self.backend = backend
+        metrics.register_gauge("llm_cache.hit_rate", lambda: metrics.ratio("llm_cache.hits", "llm_cache.lookups"))
+
+    @staticmethod
+    def key(
+        model: BaseChatModel,
+        messages: Sequence[BaseMessage],
+        tools: Optional[Sequence[BaseTool]] = None,
+        tool_choice: Optional[str] = None,
+    ) -> Optional[str]:
+        """Returns the cache key of a call, or None if the call must not be cached."""
+        if _cache_bypassed.get():
+            metrics.increment("llm_cache.bypassed")
+            return None
+        if getattr(model, "temperature", None) != 0:
+            return None
+
+        payload = {
+            "model": getattr(model, "model_name", None) or type(model).__name__,
+            "tools": [convert_to_openai_tool(tool) for tool in tools or []],
+            "tool_choice": tool_choice,
+            "messages": [
+                [message.type, message.content, getattr(message, "tool_calls", None), getattr(message, "tool_call_id", None)]
+                for message in messages
+            ],
+        }
+        return cache_key_hash(json.dumps(payload, sort_keys=True, default=str))
+
+    async def aget(self, key: str) -> Optional[AIMessage]:
+        metrics.increment("llm_cache.lookups")
+        try:
+            response = await self.backend.aget(key)
+        except Exception as e:
+            logger.warning(f"LLM cache lookup failed, calling the model: {e}")
+            metrics.increment("llm_cache.errors")
+            return None
+        if response is None:
+            return None
+
+        metrics.increment("llm_cache.hits")
+        metrics.increment("llm_cache.saved_tokens", response.get("total_tokens", 0))
+        return AIMessage(content=response["content"], tool_calls=response.get("tool_calls", []))
+
+    async def aset(self, key: str, model: BaseChatModel, message: AIMessage):
+        # Empty responses are more likely a glitch than the answer to keep.
+        if not message.content and not message.tool_calls:
+            return
+        usage = message.usage_metadata or {}
+        response = {
+            "content": message.content,
+            "tool_calls": [
+                {"name": call["name"], "args": call["args"], "id": call.get("id")} for call in message.tool_calls
+            ],
+            "total_tokens": usage.get("total_tokens", 0),
+        }
+        try:
+            await self.backend.aset(key, getattr(model, "model_name", None) or type(model).__name__, response)
+        except Exception as e:
+            logger.warning(f"Could not store the LLM response in the cache: {e}")
+            metrics.increment("llm_cache.errors")
+
+    async def apurge_expired(self) -> int:
+        return await self.backend.apurge_expired()
+
+
+def get_llm_cache() -> Optional[LLMResponseCache]:
+    """Returns a singleton instance of the LLM response cache, or None if it is disabled."""
+    global _llm_cache
+    if not settings.LLM_CACHE_ENABLED:
+        return None
+    if _llm_cache is not None:
+        return _llm_cache
+
+    factory = _LLM_CACHE_BACKENDS.get(settings.LLM_CACHE_BACKEND)
+    if not factory:
+        raise ValueError(f"Unsupported LLM cache backend: {settings.LLM_CACHE_BACKEND}")
+
+    logger.info(f"Using {settings.LLM_CACHE_BACKEND.value} LLM response cache.")
+    _llm_cache = LLMResponseCache(factory())
+    return _llm_cache
@@ -0,0 +1,115 @@
+import logging
+from typing import Optional
+
+import httpx
+from langchain_core.language_models import BaseChatModel
+from langchain_openai import ChatOpenAI
+from starlette.requests import HTTPConnection
+
+from src.config import settings
+from src.shared.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+_llm_clients = None
+
+
+def _pool_connections(transport: httpx.AsyncHTTPTransport | httpx.HTTPTransport, idle: bool) -> int:
+    # httpx does not expose its connection pool; the httpcore pool beneath it does.
+    pool = getattr(transport, "_pool", None)
+    if pool is None:
+        return 0
+    return sum(1 for connection in pool.connections if connection.is_idle() == idle)
+
+
+def _count_response(response: httpx.Response):
+    metrics.increment("llm.responses")
+    if response.status_code >= 400:
+        metrics.increment(f"llm.responses_{response.status_code // 100}xx")
+
+
+async def _acount_response(response: httpx.Response):
+    _count_response(response)
+
+
+class LLMClientRegistry:
+    """
+    Application-scoped chat models. All models share one pooled HTTP client per
+    I/O mode, so connections, TLS sessions and keep-alive are reused across
+    requests and conversation turns instead of being set up for each call.
+    """
+
+    def __init__(self):
+        limits = httpx.Limits(
+            max_connections=settings.LLM_MAX_CONNECTIONS,
+            max_keepalive_connections=settings.LLM_MAX_KEEPALIVE_CONNECTIONS,
+            keepalive_expiry=settings.LLM_KEEPALIVE_EXPIRY_SECONDS,
+        )
+        timeout = httpx.Timeout(
+            settings.LLM_TIMEOUT_SECONDS,
+            connect=settings.LLM_CONNECT_TIMEOUT_SECONDS,
+            pool=settings.LLM_POOL_TIMEOUT_SECONDS,
+        )
+        self._async_transport = httpx.AsyncHTTPTransport(limits=limits)
+        self._sync_transport = httpx.HTTPTransport(limits=limits)
+        self.http_async_client = httpx.AsyncClient(
+            transport=self._async_transport,
+            timeout=timeout,
+            event_hooks={"response": [_acount_response]},
+        )
+        self.http_client = httpx.Client(
+            transport=self._sync_transport,
+            timeout=timeout,
+            event_hooks={"response": [_count_response]},
+        )
+        self._chat_models: dict[tuple[str, float], ChatOpenAI] = {}
+
+        metrics.register_gauge("llm.pool.active_connections", lambda: self.pool_connections(idle=False))
+        metrics.register_gauge("llm.pool.idle_connections", lambda: self.pool_connections(idle=True))
+
+    def pool_connections(self, idle: bool) -> int:
+        return _pool_connections(self._async_transport, idle) + _pool_connections(self._sync_transport, idle)
+
+    def get_chat_model(self, model: Optional[str] = None, temperature: float = 0) -> ChatOpenAI:
+        """Returns the shared chat model for a model name and temperature, creating it on first use."""
+        key = (model or settings.OPENAI_MODEL, temperature)
+        chat_model = self._chat_models.get(key)
+        if chat_model is None:
+            chat_model = ChatOpenAI(
+                model=key[0],
+                temperature=temperature,
+                max_retries=settings.LLM_MAX_RETRIES,
+                # Streamed responses report their token usage too, e.g. for the LLM cache.
+                stream_usage=True,
+                http_client=self.http_client,
+                http_async_client=self.http_async_client,
+            )
+            self._chat_models[key] = chat_model
+        return chat_model
+
+    async def aclose(self):
+        await self.http_async_client.aclose()
+        self.http_client.close()
+
+
+def get_llm_clients() -> LLMClientRegistry:
+    """
+    Returns the singleton LLM client registry. The API creates it on startup;
+    other processes, such as scripts, create it on first use.
+    """
+    global _llm_clients
+    if _llm_clients is None:
+        _llm_clients = LLMClientRegistry()
+    return _llm_clients
+
+
+async def close_llm_clients():
+    global _llm_clients
+    if _llm_clients is not None:
+        await _llm_clients.aclose()
+        _llm_clients = None
+
+
+def get_chat_model(connection: HTTPConnection) -> BaseChatModel:
+    """FastAPI dependency to get the shared chat model, for HTTP and WebSocket endpoints."""
+    return connection.app.state.llm_clients.get_chat_model()
@@ -0,0 +1,101 @@
+import asyncio
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import onnxruntime
+from langchain_core.embeddings import Embeddings
+from tokenizers import Tokenizer
+
+logger = logging.getLogger(__name__)
+
+
+class OnnxEmbeddings(Embeddings):
+    """
+    Sentence embeddings computed locally on CPU with onnxruntime.
+
+    `model_path` is a directory holding `model.onnx` and the matching
+    `tokenizer.json`, e.g. an export of `sentence-transformers/all-MiniLM-L6-v2`.
+    The session is created and warmed up on construction and reused for every
+    call. Async calls run the inference on a dedicated thread pool, so they do
+    not block the event loop or compete with `asyncio.to_thread` callers.
+    """
+
+    def __init__(
+        self,
+        model_path: str,
+        batch_size: int,
+        max_length: int,
+        pooling: str = "mean",
+        normalize: bool = True,
+        threads: int = 0,
+        workers: int = 2,
+    ):
+        self.batch_size = batch_size
+        self.pooling = pooling
+        self.normalize = normalize
+
+        self._tokenizer = Tokenizer.from_file(os.path.join(model_path, "tokenizer.json"))
+        self._tokenizer.enable_truncation(max_length=max_length)
+        self._tokenizer.enable_padding()
+
+        options = onnxruntime.SessionOptions()
+        if threads:
+            options.intra_op_num_threads = threads
+        self._session = onnxruntime.InferenceSession(
+            os.path.join(model_path, "model.onnx"),
+            sess_options=options,
+            providers=["CPUExecutionProvider"],
+        )
+        self._input_names = {model_input.name for model_input in self._session.get_inputs()}
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="onnx-embeddings")
+
+        self.dimensions = len(self._embed_batch(["warm-up"])[0])
+        logger.info(f"Loaded ONNX embeddings model from {model_path} ({self.dimensions} dimensions)")
+
+    def _embed_batch(self, texts: list[str]) -> np.ndarray:
+        encodings = self._tokenizer.encode_batch(texts)
+        attention_mask = np.array([encoding.attention_mask for encoding in encodings], dtype=np.int64)
+        inputs = {
+            "input_ids": np.array([encoding.ids for encoding in encodings], dtype=np.int64),
+            "attention_mask": attention_mask,
+            "token_type_ids": np.array([encoding.type_ids for encoding in encodings], dtype=np.int64),
+        }
+        output = self._session.run(None, {name: value for name, value in inputs.items() if name in self._input_names})[0]
+
+        if output.ndim == 2:
+            # The model already pools its output into sentence embeddings.
+            vectors = output
+        elif self.pooling == "cls":
+            vectors = output[:, 0]
+        else:
+            mask = attention_mask[:, :, None].astype(output.dtype)
+            vectors = (output * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+
+        if self.normalize:
+            vectors = vectors / np.clip(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12, None)
+        return vectors
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        if not texts:
+            return []
+
+        # Batching texts of similar length keeps the padding, and the wasted
+        # compute, to a minimum. The vectors are returned in the input order.
+        order = sorted(range(len(texts)), key=lambda i: len(texts[i]))
+        vectors = [None] * len(texts)
+        for start in range(0, len(order), self.batch_size):
+            batch = order[start:start + self.batch_size]
+            for i, vector in zip(batch, self._embed_batch([texts[i] for i in batch])):
+                vectors[i] = vector.tolist()
+        return vectors
+
+    def embed_query(self, text: str) -> list[float]:
+        return self._embed_batch([text])[0].tolist()
+
+    async def aembed_documents(self, texts: list[str]) -> list[list[float]]:
+        return await asyncio.get_running_loop().run_in_executor(self._executor, self.embed_documents, texts)
+
+    async def aembed_query(self, text: str) -> list[float]:
+        return await asyncio.get_running_loop().run_in_executor(self._executor, self.embed_query, text)
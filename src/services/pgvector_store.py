@@ -0,0 +1,159 @@
+import logging
+from typing import Any, Dict, Optional
+
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from sqlalchemy import and_, delete, func, not_, or_, select, text, true
+from sqlalchemy.dialects.postgresql import insert
+
+from src.config import settings
+from src.database.db import engine, get_sync_engine
+from src.database.models import Chunk
+from src.services.vector_store import VectorStoreBackend
+
+logger = logging.getLogger(__name__)
+
+
+def _equals(key: str, value: Any):
+    if key == "practice_id":
+        return Chunk.practice_id == value
+    return Chunk.chunk_metadata.contains({key: value})
+
+
+def _where_clause(where: Optional[Dict[str, Any]]):
+    """
+    Translates a Chroma-style `where` filter into a SQL condition. Equality on
+    practice_id uses the partition key column, so Postgres prunes the other
+    partitions; other keys use JSONB containment, which the GIN index serves.
+    """
+    if not where:
+        return true()
+
+    clauses = []
+    for key, value in where.items():
+        if key == "$and":
+            clauses.append(and_(*[_where_clause(condition) for condition in value]))
+        elif key == "$or":
+            clauses.append(or_(*[_where_clause(condition) for condition in value]))
+        elif isinstance(value, dict):
+            for operator, operand in value.items():
+                if operator == "$eq":
+                    clauses.append(_equals(key, operand))
+                elif operator == "$ne":
+                    clauses.append(not_(_equals(key, operand)))
+                elif operator == "$in":
+                    clauses.append(or_(*[_equals(key, item) for item in operand]))
+                elif operator == "$nin":
+                    clauses.append(not_(or_(*[_equals(key, item) for item in operand])))
+                else:
+                    raise ValueError(f"Unsupported filter operator: {operator}")
+        else:
+            clauses.append(_equals(key, value))
+    return and_(*clauses)
+
+
+class PgVectorStore(VectorStoreBackend):
+    """
+    Vector store backed by the `chunks` table in Postgres with the pgvector
+    extension. Searches run as a single query against the practice's partition
+    and its HNSW index; the async search goes through the application's asyncpg
+    engine, while the blocking methods used by ingestion use a sync engine.
+    """
+
+    def __init__(self, embeddings: Embeddings):
+        self.embeddings = embeddings
+
+    def get(self, practice_id, where=None, include=None, limit=None):
+        include_metadatas = "metadatas" in (include or [])
+        columns = [Chunk.id, Chunk.chunk_metadata] if include_metadatas else [Chunk.id]
+        statement = select(*columns).where(Chunk.practice_id == practice_id, _where_clause(where)).limit(limit)
+
+        with get_sync_engine().connect() as conn:
+            rows = conn.execute(statement).all()
+
+        return {
+            "ids": [row.id for row in rows],
+            "metadatas": [row.chunk_metadata for row in rows] if include_metadatas else None,
+        }
+
+    def add_documents(self, documents, ids):
+        if not documents:
+            return
+
+        vectors = self.embeddings.embed_documents([doc.page_content for doc in documents])
+        rows = []
+        for doc, id_, vector in zip(documents, ids, vectors):
+            practice_id = doc.metadata.get("practice_id")
+            if practice_id is None:
+                raise ValueError(f"Chunk {id_} has no practice_id in its metadata.")
+            rows.append(
+                {
+                    "practice_id": practice_id,
+                    "id": id_,
+                    "document": doc.page_content,
+                    "chunk_metadata": doc.metadata,
+                    "embedding": vector,
+                }
+            )
+
+        statement = insert(Chunk).values(rows)
+        statement = statement.on_conflict_do_update(
+            index_elements=[Chunk.practice_id, Chunk.id],
+            set_={
+                "document": statement.excluded.document,
+                "chunk_metadata": statement.excluded.chunk_metadata,
+                "embedding": statement.excluded.embedding,
+                "updated_at": func.now(),
+            },
+        )
+        with get_sync_engine().begin() as conn:
+            conn.execute(statement)
+
+    def delete(self, practice_id, ids):
+        if not ids:
+            return
+        with get_sync_engine().begin() as conn:
+            conn.execute(delete(Chunk).where(Chunk.practice_id == practice_id, Chunk.id.in_(ids)))
+
+    @staticmethod
+    def _search_settings() -> list:
+        statements = [text(f"SET LOCAL hnsw.ef_search = {int(settings.PGVECTOR_HNSW_EF_SEARCH)}")]
+        if settings.PGVECTOR_HNSW_ITERATIVE_SCAN != "off":
+            # Keeps scanning the index until k rows pass the filter, instead of
+            # returning fewer results when other practices share the partition.
+            statements.append(text(f"SET LOCAL hnsw.iterative_scan = {settings.PGVECTOR_HNSW_ITERATIVE_SCAN}"))
+        return statements
+
+    @staticmethod
+    def _search_statement(embedding, k, filter):
+        distance = Chunk.embedding.l2_distance(embedding)
+        return (
+            select(Chunk.id, Chunk.document, Chunk.chunk_metadata, distance.label("distance"))
+            .where(_where_clause(filter))
+            .order_by(distance)
+            .limit(k)
+        )
+
+    @staticmethod
+    def _to_results(rows) -> list[tuple[Document, float]]:
+        # pgvector returns the L2 distance; square it to match Chroma's scores.
+        # Iterative scans in relaxed order may return rows slightly out of order.
+        results = [
+            (Document(id=row.id, page_content=row.document, metadata=row.chunk_metadata), row.distance ** 2)
+            for row in rows
+        ]
+        return sorted(results, key=lambda result: result[1])
+
+    def similarity_search_by_vector_with_score(self, embedding, k, filter=None):
+        with get_sync_engine().begin() as conn:
+            for statement in self._search_settings():
+                conn.execute(statement)
+            rows = conn.execute(self._search_statement(embedding, k, filter)).all()
+        return self._to_results(rows)
+
+    async def asimilarity_search_by_vector_with_score(self, embedding, k, filter=None):
+        async with engine.begin() as conn:
+            for statement in self._search_settings():
+                await conn.execute(statement)
+            rows = (await conn.execute(self._search_statement(embedding, k, filter))).all()
+        return self._to_results(rows)
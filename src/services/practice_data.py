@@ -0,0 +1,41 @@
+import logging
+
+from sqlalchemy import delete, select
+
+from src.database.db import get_sync_engine
+from src.database.models import Interaction, PracticeSettings
+
+logger = logging.getLogger(__name__)
+
+INTERACTIONS_DELETE_BATCH_SIZE = 5000
+
+# These functions are blocking: they are called by the purge job, which runs
+# on an ingestion worker thread outside the event loop.
+
+
+def delete_practice_interactions(practice_id: int) -> int:
+    """
+    Deletes the conversation sessions of a practice. Rows are deleted in batches,
+    each in its own transaction, so a practice with a long history neither holds
+    locks on all of its rows at once nor loses progress if the job is retried.
+    Returns the number of sessions deleted.
+    """
+    deleted = 0
+    while True:
+        batch = (
+            select(Interaction.session_id)
+            .where(Interaction.practice_id == practice_id)
+            .limit(INTERACTIONS_DELETE_BATCH_SIZE)
+            .scalar_subquery()
+        )
+        with get_sync_engine().begin() as conn:
+            count = conn.execute(delete(Interaction).where(Interaction.session_id.in_(batch))).rowcount
+        deleted += count
+        if count < INTERACTIONS_DELETE_BATCH_SIZE:
+            logger.info(f"Deleted {deleted} interactions of practice_id {practice_id}.")
+            return deleted
+
+
+def delete_practice_settings(practice_id: int):
+    with get_sync_engine().begin() as conn:
+        conn.execute(delete(PracticeSettings).where(PracticeSettings.practice_id == practice_id))
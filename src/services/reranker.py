@@ -0,0 +1,168 @@
+import logging
+import os
+import time
+from typing import Optional
+
+import numpy as np
+import onnxruntime
+from langchain_core.documents import Document
+from tokenizers import Tokenizer
+
+from src.config import settings
+from src.shared.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+_reranker = None
+
+
+class CrossEncoderReranker:
+    """
+    Scores (query, chunk) pairs with a cross-encoder exported to ONNX, on CPU.
+
+    `model_path` is a directory holding `model.onnx` and the matching
+    `tokenizer.json`, e.g. an export of `cross-encoder/ms-marco-MiniLM-L-6-v2`.
+    The model is loaded and warmed up on construction, so no query pays for it.
+    If it cannot be loaded or inference fails, candidates are returned in their
+    original order.
+    """
+
+    def __init__(
+        self,
+        model_path: str,
+        batch_size: int,
+        max_length: int,
+        latency_budget_ms: float,
+        threads: int = 0,
+    ):
+        self.model_path = model_path
+        self.batch_size = batch_size
+        self.max_length = max_length
+        self.latency_budget_ms = latency_budget_ms
+        self.threads = threads
+        self._session = None
+        self._tokenizer = None
+        self._input_names: set[str] = set()
+        # Running estimate of the scoring time of one candidate, used to size
+        # batches to the remaining latency budget.
+        self._candidate_ms = 0.0
+        self._load()
+
+    def _load(self):
+        try:
+            tokenizer = Tokenizer.from_file(os.path.join(self.model_path, "tokenizer.json"))
+            tokenizer.enable_truncation(max_length=self.max_length)
+            tokenizer.enable_padding()
+
+            options = onnxruntime.SessionOptions()
+            if self.threads:
+                options.intra_op_num_threads = self.threads
+            session = onnxruntime.InferenceSession(
+                os.path.join(self.model_path, "model.onnx"),
+                sess_options=options,
+                providers=["CPUExecutionProvider"],
+            )
+            self._tokenizer = tokenizer
+            self._input_names = {model_input.name for model_input in session.get_inputs()}
+            self._session = session
+
+            # The first run initializes the session. The timed one scores a
+            # full-length pair, so the first estimate errs on the slow side.
+            self._score_batch("warm-up", ["warm-up"])
+            started = time.perf_counter()
+            self._score_batch("warm-up", ["warm-up " * self.max_length])
+            self._candidate_ms = (time.perf_counter() - started) * 1000
+        except Exception as e:
+            logger.error(f"Could not load the reranker model from {self.model_path}, reranking is disabled: {e}", exc_info=True)
+            self._session = None
+            return
+
+        logger.info(f"Loaded reranker model from {self.model_path} ({self._candidate_ms:.1f} ms per candidate)")
+
+    def _score_batch(self, query: str, texts: list[str]) -> list[float]:
+        encodings = self._tokenizer.encode_batch([(query, text) for text in texts])
+        inputs = {
+            "input_ids": np.array([encoding.ids for encoding in encodings], dtype=np.int64),
+            "attention_mask": np.array([encoding.attention_mask for encoding in encodings], dtype=np.int64),
+            "token_type_ids": np.array([encoding.type_ids for encoding in encodings], dtype=np.int64),
+        }
+        logits = self._session.run(None, {name: value for name, value in inputs.items() if name in self._input_names})[0]
+        # Single-logit models score relevance directly; two-class models put it last.
+        return logits.reshape(len(texts), -1)[:, -1].tolist()
+
+    def _next_batch_size(self, remaining_ms: float) -> int:
+        """Returns how many candidates are expected to fit in the remaining budget, at most one batch."""
+        if self._candidate_ms <= 0:
+            return self.batch_size
+        return min(self.batch_size, int(remaining_ms / self._candidate_ms))
+
+    def rerank(
+        self,
+        query: str,
+        results_with_scores: list[tuple[Document, float]],
+        top_n: int,
+    ) -> list[tuple[Document, float]]:
+        """
+        Returns the `top_n` candidates with the highest cross-encoder score, best
+        first, paired with that score.
+
+        Candidates are scored in their original order, in batches sized to what
+        the remaining latency budget is expected to allow, the first one
+        included. Once the budget is spent no further batch is started, and the
+        unscored candidates rank after the scored ones with a score of -inf.
+        """
+        if not results_with_scores or self._session is None:
+            return results_with_scores[:top_n]
+
+        documents = [doc for doc, _ in results_with_scores]
+        scores = []
+        started = time.perf_counter()
+        try:
+            while len(scores) < len(documents):
+                size = self._next_batch_size(self.latency_budget_ms - (time.perf_counter() - started) * 1000)
+                if size <= 0:
+                    metrics.increment("retrieval.rerank_budget_exceeded")
+                    logger.warning(
+                        f"Reranker latency budget of {self.latency_budget_ms} ms spent, "
+                        f"{len(documents) - len(scores)} candidates left unscored."
+                    )
+                    break
+                batch = documents[len(scores):len(scores) + size]
+                batch_started = time.perf_counter()
+                scores.extend(self._score_batch(query, [doc.page_content for doc in batch]))
+                batch_ms = (time.perf_counter() - batch_started) * 1000
+                self._candidate_ms = 0.8 * self._candidate_ms + 0.2 * batch_ms / len(batch)
+        except Exception as e:
+            logger.error(f"Reranking failed, keeping the retrieval order: {e}", exc_info=True)
+            metrics.increment("retrieval.rerank_errors")
+            return results_with_scores[:top_n]
+
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        metrics.increment("retrieval.rerank")
+        metrics.increment("retrieval.rerank_candidates", len(documents))
+        metrics.increment("retrieval.rerank_ms", elapsed_ms)
+
+        scored = sorted(zip(documents, scores), key=lambda item: item[1], reverse=True)
+        unscored = [(doc, float("-inf")) for doc in documents[len(scores):]]
+        return (scored + unscored)[:top_n]
+
+
+def get_reranker() -> Optional[CrossEncoderReranker]:
+    """Returns a singleton instance of the reranker, or None if reranking is disabled."""
+    global _reranker
+    if not settings.RERANKER_ENABLED:
+        return None
+    if _reranker is not None:
+        return _reranker
+
+    if not settings.RERANKER_MODEL_PATH:
+        raise ValueError("RERANKER_MODEL_PATH not found in settings")
+
+    _reranker = CrossEncoderReranker(
+        settings.RERANKER_MODEL_PATH,
+        batch_size=settings.RERANKER_BATCH_SIZE,
+        max_length=settings.RERANKER_MAX_LENGTH,
+        latency_budget_ms=settings.RERANKER_LATENCY_BUDGET_MS,
+        threads=settings.RERANKER_THREADS,
+    )
+    return _reranker
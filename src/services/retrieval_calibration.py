@@ -0,0 +1,260 @@
+import asyncio
+import logging
+import threading
+from collections import defaultdict
+from typing import Optional
+
+from cachetools import TTLCache
+from sqlalchemy import delete, func, select, update
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from src.config import settings
+from src.database.db import get_sync_engine
+from src.database.models import RetrievalCalibration, RetrievalScoreHistogram
+from src.services.ingestion_jobs import IngestionJobContext
+from src.shared.constants import (
+    RETRIEVAL_SCORE_BUCKET_WIDTH,
+    RETRIEVAL_SCORE_BUCKETS,
+    VECTOR_EMBEDDINGS_SIMILARITY_THRESHOLD,
+)
+from src.shared.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+
+def score_bucket(distance: float) -> int:
+    return min(max(int(distance / RETRIEVAL_SCORE_BUCKET_WIDTH), 0), RETRIEVAL_SCORE_BUCKETS - 1)
+
+
+def bucket_upper_bound(bucket: int) -> float:
+    return round((bucket + 1) * RETRIEVAL_SCORE_BUCKET_WIDTH, 6)
+
+
+class RetrievalScoreRecorder:
+    """
+    Counts, per practice, the distance of the closest chunk of each vector search
+    into histogram buckets. Counts are kept in memory and added to the
+    `retrieval_score_histograms` table by `flush`, so recording never waits on
+    the database.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pending: dict[tuple[int, int], int] = defaultdict(int)
+
+    def record(self, practice_id: int, distance: float):
+        with self._lock:
+            self._pending[(practice_id, score_bucket(distance))] += 1
+
+    def flush(self) -> int:
+        """Writes the pending counts. Blocking. Returns the number of queries written."""
+        with self._lock:
+            pending, self._pending = self._pending, defaultdict(int)
+        if not pending:
+            return 0
+
+        rows = [
+            {"practice_id": practice_id, "bucket": bucket, "count": count}
+            for (practice_id, bucket), count in pending.items()
+        ]
+        statement = insert(RetrievalScoreHistogram)
+        statement = statement.on_conflict_do_update(
+            index_elements=["practice_id", "bucket"],
+            set_={"count": RetrievalScoreHistogram.count + statement.excluded.count, "updated_at": func.now()},
+        )
+        try:
+            with get_sync_engine().begin() as conn:
+                conn.execute(statement, rows)
+        except Exception:
+            # Keep the counts for the next flush rather than losing them.
+            with self._lock:
+                for key, count in pending.items():
+                    self._pending[key] += count
+            raise
+        return sum(pending.values())
+
+
+score_recorder = RetrievalScoreRecorder()
+
+_threshold_cache = TTLCache(maxsize=10_000, ttl=settings.RETRIEVAL_THRESHOLD_CACHE_TTL_SECONDS)
+_threshold_cache_lock = threading.Lock()
+
+
+def get_similarity_threshold(practice_id: int) -> float:
+    """
+    Returns the practice's calibrated similarity threshold, or the global one if
+    it has not been calibrated. Blocking on a cache miss; thresholds are cached
+    for RETRIEVAL_THRESHOLD_CACHE_TTL_SECONDS.
+    """
+    with _threshold_cache_lock:
+        threshold = _threshold_cache.get(practice_id)
+    if threshold is not None:
+        return threshold
+
+    try:
+        with Session(get_sync_engine()) as session:
+            calibration = session.get(RetrievalCalibration, practice_id)
+        threshold = calibration.similarity_threshold if calibration else VECTOR_EMBEDDINGS_SIMILARITY_THRESHOLD
+    except Exception as e:
+        logger.warning(f"Could not load the similarity threshold of practice_id {practice_id}, using the global one: {e}")
+        metrics.increment("retrieval.threshold_lookup_errors")
+        return VECTOR_EMBEDDINGS_SIMILARITY_THRESHOLD
+
+    with _threshold_cache_lock:
+        _threshold_cache[practice_id] = threshold
+    return threshold
+
+
+async def aget_similarity_threshold(practice_id: int) -> float:
+    """Async counterpart of `get_similarity_threshold`; only a cache miss leaves the event loop."""
+    with _threshold_cache_lock:
+        threshold = _threshold_cache.get(practice_id)
+    if threshold is not None:
+        return threshold
+    return await asyncio.to_thread(get_similarity_threshold, practice_id)
+
+
+def _threshold_for_pass_rate(counts: dict[int, int], pass_rate: float) -> float:
+    """Returns the upper bound of the first bucket at which `pass_rate` of the samples are covered."""
+    total = sum(counts.values())
+    covered = 0
+    for bucket in sorted(counts):
+        covered += counts[bucket]
+        if covered >= pass_rate * total:
+            return bucket_upper_bound(bucket)
+    return bucket_upper_bound(RETRIEVAL_SCORE_BUCKETS - 1)
+
+
+def _decay_histograms():
+    """
+    Ages the recorded counts: each loses half its weight per
+    RETRIEVAL_SCORE_HALF_LIFE_DAYS since it was last aged, and buckets that
+    drop to zero are removed. Counts flushed since then are aged as if they
+    were that old, which errs on the side of forgetting. Blocking.
+    """
+    half_life_seconds = settings.RETRIEVAL_SCORE_HALF_LIFE_DAYS * 86400
+    age_seconds = func.extract("epoch", func.now() - RetrievalScoreHistogram.decayed_at)
+    with get_sync_engine().begin() as conn:
+        conn.execute(
+            update(RetrievalScoreHistogram).values(
+                count=func.floor(RetrievalScoreHistogram.count * func.power(0.5, age_seconds / half_life_seconds)),
+                decayed_at=func.now(),
+            )
+        )
+        conn.execute(delete(RetrievalScoreHistogram).where(RetrievalScoreHistogram.count <= 0))
+
+
+def calibrate_similarity_thresholds(
+    practice_ids: Optional[list[int]] = None,
+    job: Optional[IngestionJobContext] = None,
+) -> dict:
+    """
+    Computes per-practice similarity thresholds from the recorded histograms.
+
+    Relevance is not labelled, so the global threshold is taken as the reference:
+    the share of all recorded queries it lets through becomes the target pass
+    rate, and each practice gets the distance below which that same share of its
+    own queries falls. A practice whose corpus sits further from its users'
+    questions thus gets a looser threshold, and a tighter one in the opposite
+    case. A practice whose users ask many off-topic questions would look the
+    same as one with a distant corpus, so loosening is capped at
+    RETRIEVAL_CALIBRATION_MAX_LOOSENING above the global threshold, on top of
+    the configured bounds. Practices with too few samples keep the global
+    threshold. The histograms are aged first, so the thresholds follow the
+    current corpus rather than its whole history.
+
+    Blocking; runs on an ingestion worker thread.
+    """
+    _decay_histograms()
+    with Session(get_sync_engine()) as session:
+        rows = session.execute(
+            select(RetrievalScoreHistogram.practice_id, RetrievalScoreHistogram.bucket, RetrievalScoreHistogram.count)
+        ).all()
+
+    histograms: dict[int, dict[int, int]] = defaultdict(dict)
+    global_counts: dict[int, int] = defaultdict(int)
+    for practice_id, bucket, count in rows:
+        histograms[practice_id][bucket] = count
+        global_counts[bucket] += count
+
+    total = sum(global_counts.values())
+    if not total:
+        logger.info("No retrieval scores recorded yet, nothing to calibrate.")
+        return {"targetPassRate": None, "calibrated": [], "skipped": []}
+
+    # Buckets straddling the global threshold count as passing, as they do for
+    # the calibrated thresholds, which are bucket upper bounds.
+    passing = sum(
+        count for bucket, count in global_counts.items()
+        if bucket * RETRIEVAL_SCORE_BUCKET_WIDTH < VECTOR_EMBEDDINGS_SIMILARITY_THRESHOLD
+    )
+    target_pass_rate = passing / total
+
+    calibrated = []
+    skipped = []
+    entries = []
+    selected = sorted(practice_ids or histograms)
+    for i, practice_id in enumerate(selected):
+        if job:
+            job.checkpoint(i / len(selected))
+        counts = histograms.get(practice_id, {})
+        samples = sum(counts.values())
+        if samples < settings.RETRIEVAL_CALIBRATION_MIN_SAMPLES:
+            skipped.append({"practiceId": practice_id, "samples": samples})
+            continue
+
+        threshold = min(
+            max(_threshold_for_pass_rate(counts, target_pass_rate), settings.RETRIEVAL_CALIBRATION_MIN_THRESHOLD),
+            settings.RETRIEVAL_CALIBRATION_MAX_THRESHOLD,
+            VECTOR_EMBEDDINGS_SIMILARITY_THRESHOLD + settings.RETRIEVAL_CALIBRATION_MAX_LOOSENING,
+        )
+        entries.append({
+            "practice_id": practice_id,
+            "similarity_threshold": threshold,
+            "target_pass_rate": target_pass_rate,
+            "samples": samples,
+        })
+        calibrated.append({"practiceId": practice_id, "samples": samples, "similarityThreshold": threshold})
+
+    if entries:
+        statement = insert(RetrievalCalibration)
+        statement = statement.on_conflict_do_update(
+            index_elements=["practice_id"],
+            set_={
+                "similarity_threshold": statement.excluded.similarity_threshold,
+                "target_pass_rate": statement.excluded.target_pass_rate,
+                "samples": statement.excluded.samples,
+                "calibrated_at": func.now(),
+            },
+        )
+        with get_sync_engine().begin() as conn:
+            conn.execute(statement, entries)
+
+    logger.info(
+        f"Calibrated similarity thresholds of {len(calibrated)} practices "
+        f"(target pass rate {target_pass_rate:.3f}), {len(skipped)} skipped for lack of samples."
+    )
+    return {"targetPassRate": target_pass_rate, "calibrated": calibrated, "skipped": skipped}
+
+
+def delete_practice_retrieval_scores(practice_id: int):
+    """Removes a practice's recorded histogram and calibrated threshold. Blocking."""
+    with get_sync_engine().begin() as conn:
+        conn.execute(delete(RetrievalScoreHistogram).where(RetrievalScoreHistogram.practice_id == practice_id))
+        conn.execute(delete(RetrievalCalibration).where(RetrievalCalibration.practice_id == practice_id))
+
+
+async def get_retrieval_score_histogram(
+    db: AsyncSession,
+    practice_id: int,
+) -> tuple[list[RetrievalScoreHistogram], Optional[RetrievalCalibration]]:
+    """Returns the practice's histogram buckets, ordered by distance, and its calibration if any."""
+    result = await db.execute(
+        select(RetrievalScoreHistogram)
+        .where(RetrievalScoreHistogram.practice_id == practice_id)
+        .order_by(RetrievalScoreHistogram.bucket)
+    )
+    calibration = await db.get(RetrievalCalibration, practice_id)
+    return list(result.scalars()), calibration
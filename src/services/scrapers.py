@@ -0,0 +1,166 @@
+import asyncio
+import logging
+from abc import ABC, abstractmethod
+from dataclasses import dataclass, field
+from typing import Optional
+from urllib.parse import urljoin
+
+import httpx
+import regex
+from bs4 import BeautifulSoup
+from firecrawl import Firecrawl
+from firecrawl.v2.utils.error_handler import BadRequestError
+
+from src.config import settings
+from src.shared.enums import WebScraperType
+
+logger = logging.getLogger(__name__)
+
+EXCLUDED_TAGS = ["script", "style", "img", "a", "source", "track", "embed", "base", "col", "area", "form", "input"]
+
+
+class InvalidURLError(ValueError):
+    """Custom exception for invalid URLs provided for scraping."""
+    pass
+
+
+@dataclass
+class ScrapedPage:
+    url: str
+    markdown: str
+    title: str = "No Title"
+    links: list[str] = field(default_factory=list)
+
+
+class Scraper(ABC):
+    """
+    Fetches web pages as markdown. Scrapers are async context managers so that
+    connections can be reused across the pages of a crawl.
+
+    Scrapers created with `fresh` bypass any cache of previously scraped pages,
+    which change detection relies on.
+    """
+
+    async def __aenter__(self) -> "Scraper":
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.aclose()
+
+    async def aclose(self):
+        pass
+
+    @abstractmethod
+    async def scrape(self, url: str, include_links: bool = False) -> Optional[ScrapedPage]:
+        """
+        Returns the page content, and its outgoing links when `include_links` is set.
+        Returns None when the page has no content. Raises InvalidURLError when
+        the URL cannot be scraped at all.
+        """
+
+
+class FirecrawlScraper(Scraper):
+    """Scrapes pages through the Firecrawl API."""
+
+    def __init__(self, fresh: bool = False):
+        if not settings.FIRECRAWL_API_KEY:
+            raise ValueError("FIRECRAWL_API_KEY not found in settings")
+        self.client = Firecrawl(api_key=settings.FIRECRAWL_API_KEY)
+        # Firecrawl serves recently cached results unless told otherwise.
+        self.options = {"max_age": 0} if fresh else {}
+
+    async def scrape(self, url, include_links=False):
+        formats = ["markdown", "links"] if include_links else ["markdown"]
+        try:
+            result = await asyncio.to_thread(
+                self.client.scrape, url=url, formats=formats, exclude_tags=EXCLUDED_TAGS, **self.options
+            )
+        except BadRequestError as e:
+            logger.warning(f"Firecrawl failed to scrape URL {url} due to a bad request: {e}")
+            raise InvalidURLError(f"The URL '{url}' is invalid or could not be scraped.") from e
+
+        if not result.markdown:
+            return None
+        return ScrapedPage(
+            url=url,
+            markdown=result.markdown,
+            title=getattr(result.metadata, "title", None) or "No Title",
+            links=list(result.links or []),
+        )
+
+
+class HttpScraper(Scraper):
+    """
+    Fetches pages directly over HTTP and extracts their text with BeautifulSoup.
+    Needs no external service, which also makes it usable against a local
+    stand-in server in tests.
+    """
+
+    def __init__(self, client: Optional[httpx.AsyncClient] = None, fresh: bool = False):
+        headers = {"User-Agent": settings.CRAWL_USER_AGENT}
+        if fresh:
+            headers["Cache-Control"] = "no-cache"
+        self.client = client or httpx.AsyncClient(
+            timeout=settings.CRAWL_REQUEST_TIMEOUT_SECONDS,
+            follow_redirects=True,
+            headers=headers,
+        )
+
+    async def aclose(self):
+        await self.client.aclose()
+
+    @staticmethod
+    def _to_markdown(soup: BeautifulSoup) -> str:
+        for level in range(1, 7):
+            for heading in soup.find_all(f"h{level}"):
+                heading.insert_before(f"\n\n{'#' * level} ")
+                heading.insert_after("\n\n")
+        for item in soup.find_all("li"):
+            item.insert_before("\n- ")
+        for block in soup.find_all(["p", "div", "section", "article", "br", "tr"]):
+            block.insert_after("\n\n")
+        text = soup.get_text()
+        text = regex.sub(r"[ \t]+", " ", text)
+        text = regex.sub(r" *\n *", "\n", text)
+        return regex.sub(r"\n{3,}", "\n\n", text).strip()
+
+    async def scrape(self, url, include_links=False):
+        try:
+            response = await self.client.get(url)
+        except (httpx.InvalidURL, httpx.UnsupportedProtocol) as e:
+            raise InvalidURLError(f"The URL '{url}' is invalid or could not be scraped.") from e
+        except httpx.HTTPError as e:
+            logger.warning(f"Failed to fetch {url}: {e}")
+            return None
+
+        if response.status_code >= 400:
+            logger.warning(f"Fetching {url} returned HTTP {response.status_code}.")
+            return None
+        if "html" not in response.headers.get("content-type", ""):
+            logger.info(f"Skipping {url}, it is not an HTML page.")
+            return None
+
+        soup = BeautifulSoup(response.text, "html.parser")
+        title = soup.title.get_text(strip=True) if soup.title else ""
+        links = []
+        if include_links:
+            base_url = str(response.url)
+            links = [urljoin(base_url, anchor["href"]) for anchor in soup.find_all("a", href=True)]
+
+        for tag in soup(EXCLUDED_TAGS + ["head", "noscript", "nav", "footer"]):
+            tag.decompose()
+        markdown = self._to_markdown(soup.body or soup)
+        if not markdown:
+            return None
+        return ScrapedPage(url=url, markdown=markdown, title=title or "No Title", links=links)
+
+
+_SCRAPERS = {
+    WebScraperType.FIRECRAWL: FirecrawlScraper,
+    WebScraperType.HTTP: HttpScraper,
+}
+
+
+def create_scraper(fresh: bool = False) -> Scraper:
+    """Creates a scraper of the type selected by `WEB_SCRAPER`."""
+    return _SCRAPERS[settings.WEB_SCRAPER](fresh=fresh)
@@ -0,0 +1,61 @@
+import asyncio
+import logging
+import os
+import uuid
+
+from fastapi import UploadFile
+
+from src.config import settings
+
+logger = logging.getLogger(__name__)
+
+UPLOAD_READ_SIZE = 1024 * 1024
+
+
+class UploadTooLargeError(ValueError):
+    """Raised when an uploaded file exceeds the configured maximum size."""
+    pass
+
+
+def upload_path(upload_id: uuid.UUID) -> str:
+    """Path of a spooled upload in the upload directory shared with the ingestion worker."""
+    return os.path.join(settings.DOCUMENT_UPLOAD_DIR, str(upload_id))
+
+
+async def save_upload(file: UploadFile, upload_id: uuid.UUID) -> int:
+    """
+    Streams an uploaded file to the upload directory in fixed-size blocks, so
+    the file is never held in memory as a whole. Returns the number of bytes written.
+    """
+    os.makedirs(settings.DOCUMENT_UPLOAD_DIR, exist_ok=True)
+    path = upload_path(upload_id)
+    partial_path = f"{path}.part"
+
+    size = 0
+    try:
+        with open(partial_path, "wb") as out:
+            while block := await file.read(UPLOAD_READ_SIZE):
+                size += len(block)
+                if size > settings.DOCUMENT_UPLOAD_MAX_BYTES:
+                    raise UploadTooLargeError(
+                        f"File exceeds the maximum upload size of {settings.DOCUMENT_UPLOAD_MAX_BYTES} bytes."
+                    )
+                await asyncio.to_thread(out.write, block)
+        os.replace(partial_path, path)
+    except BaseException:
+        if os.path.exists(partial_path):
+            os.remove(partial_path)
+        raise
+
+    logger.info(f"Spooled upload {upload_id} ({size} bytes) to {path}.")
+    return size
+
+
+def discard_upload(upload_id: uuid.UUID):
+    """Removes a spooled upload and any files derived from it."""
+    path = upload_path(upload_id)
+    for candidate in (path, f"{path}.md", f"{path}.chunks.jsonl"):
+        try:
+            os.remove(candidate)
+        except FileNotFoundError:
+            pass
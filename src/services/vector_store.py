@@ -1,22 +1,160 @@
+import asyncio
+import logging
+from abc import ABC, abstractmethod
+from typing import Any, Dict, Optional
+
 from langchain_chroma import Chroma
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
 from langchain_openai import OpenAIEmbeddings
 
 from src.config import settings
+from src.services.embedding_cache import CachedEmbeddings, EmbeddingCacheStore
+from src.shared.enums import EmbeddingsBackendType, VectorStoreBackendType
+
+logger = logging.getLogger(__name__)
 
 _vector_store = None
+_embeddings = None
 
 
-def get_vector_store():
+class VectorStoreBackend(ABC):
     """
-    Returns a singleton instance of the Chroma vector store.
+    Operations the ingestion and retrieval code needs from a vector store.
+
+    Metadata filters use Chroma's `where` syntax: equality on metadata keys,
+    combined with `$and` / `$or`. Distances are squared L2, lower is closer,
+    so the similarity threshold means the same thing on every backend.
     """
-    global _vector_store
-    if _vector_store is not None:
-        return _vector_store
 
+    @abstractmethod
+    def get(
+        self,
+        practice_id: int,
+        where: Optional[Dict[str, Any]] = None,
+        include: Optional[list[str]] = None,
+        limit: Optional[int] = None,
+    ) -> Dict[str, list]:
+        """
+        Returns the practice's chunks matching a filter as `{"ids": [...], "metadatas": [...]}`.
+        Metadatas are only populated when `"metadatas"` is in `include`.
+        """
+
+    @abstractmethod
+    def add_documents(self, documents: list[Document], ids: list[str]):
+        """Embeds and stores chunks, replacing any stored chunks with the same ids."""
+
+    @abstractmethod
+    def delete(self, practice_id: int, ids: list[str]):
+        """Deletes a practice's chunks by id. Ids are only unique within a practice."""
+
+    @abstractmethod
+    def similarity_search_by_vector_with_score(
+        self,
+        embedding: list[float],
+        k: int,
+        filter: Optional[Dict[str, Any]] = None,
+    ) -> list[tuple[Document, float]]:
+        """Returns the `k` closest chunks to a query embedding with their distance."""
+
+    async def asimilarity_search_by_vector_with_score(
+        self,
+        embedding: list[float],
+        k: int,
+        filter: Optional[Dict[str, Any]] = None,
+    ) -> list[tuple[Document, float]]:
+        return await asyncio.to_thread(self.similarity_search_by_vector_with_score, embedding, k, filter)
+
+
+class ChromaVectorStore(VectorStoreBackend):
+    """
+    Vector store backed by a Chroma collection, either on Chroma Cloud or
+    persisted locally by an embedded Chroma client.
+    """
+
+    def __init__(self, chroma: Chroma):
+        self.chroma = chroma
+
+    def get(self, practice_id, where=None, include=None, limit=None):
+        scoped = {"$and": [{"practice_id": practice_id}, where]} if where else {"practice_id": practice_id}
+        return self.chroma.get(where=scoped, include=include or [], limit=limit)
+
+    def add_documents(self, documents, ids):
+        self.chroma.add_documents(documents=documents, ids=ids)
+
+    def delete(self, practice_id, ids):
+        self.chroma.delete(ids=ids, where={"practice_id": practice_id})
+
+    def similarity_search_by_vector_with_score(self, embedding, k, filter=None):
+        return self.chroma.similarity_search_by_vector_with_relevance_scores(
+            embedding=embedding, k=k, filter=filter
+        )
+
+
+def _create_openai_embeddings() -> Embeddings:
     if not settings.OPENAI_API_KEY:
         raise ValueError("OPENAI_API_KEY not found in settings")
 
+    return OpenAIEmbeddings(model=settings.EMBEDDINGS_MODEL)
+
+
+def _create_onnx_embeddings() -> Embeddings:
+    from src.services.onnx_embeddings import OnnxEmbeddings
+
+    if not settings.EMBEDDINGS_ONNX_MODEL_PATH:
+        raise ValueError("EMBEDDINGS_ONNX_MODEL_PATH not found in settings")
+
+    embeddings = OnnxEmbeddings(
+        settings.EMBEDDINGS_ONNX_MODEL_PATH,
+        batch_size=settings.EMBEDDINGS_ONNX_BATCH_SIZE,
+        max_length=settings.EMBEDDINGS_ONNX_MAX_LENGTH,
+        pooling=settings.EMBEDDINGS_ONNX_POOLING,
+        normalize=settings.EMBEDDINGS_ONNX_NORMALIZE,
+        threads=settings.EMBEDDINGS_ONNX_THREADS,
+        workers=settings.EMBEDDINGS_ONNX_WORKERS,
+    )
+    if embeddings.dimensions != settings.EMBEDDINGS_DIMENSIONS:
+        raise ValueError(
+            f"The ONNX embeddings model outputs {embeddings.dimensions} dimensions, "
+            f"but EMBEDDINGS_DIMENSIONS is {settings.EMBEDDINGS_DIMENSIONS}"
+        )
+    return embeddings
+
+
+_EMBEDDINGS_FACTORIES = {
+    EmbeddingsBackendType.OPENAI: _create_openai_embeddings,
+    EmbeddingsBackendType.ONNX: _create_onnx_embeddings,
+}
+
+
+def get_embeddings() -> Embeddings:
+    """
+    Returns a singleton instance of the embeddings model, wrapped with the
+    on-disk embedding cache unless it is disabled.
+    """
+    global _embeddings
+    if _embeddings is not None:
+        return _embeddings
+
+    factory = _EMBEDDINGS_FACTORIES.get(settings.EMBEDDINGS_BACKEND)
+    if not factory:
+        raise ValueError(f"Unsupported embeddings backend: {settings.EMBEDDINGS_BACKEND}")
+
+    logger.info(f"Using {settings.EMBEDDINGS_BACKEND.value} embeddings backend with model {settings.EMBEDDINGS_MODEL}.")
+    embeddings = factory()
+
+    if settings.EMBEDDINGS_CACHE_ENABLED:
+        embeddings = CachedEmbeddings(
+            embeddings,
+            model=settings.EMBEDDINGS_MODEL,
+            store=EmbeddingCacheStore(settings.EMBEDDINGS_CACHE_PATH, settings.EMBEDDINGS_CACHE_MAX_ENTRIES),
+        )
+
+    _embeddings = embeddings
+    return _embeddings
+
+
+def _create_chroma_cloud_store() -> VectorStoreBackend:
     chroma_cloud_api_key = settings.CHROMA_CLOUD_API_KEY
     chroma_cloud_tenant = settings.CHROMA_CLOUD_TENANT
     chroma_cloud_database = settings.CHROMA_CLOUD_DATABASE
@@ -25,13 +163,53 @@ def get_vector_store():
     if not all([chroma_cloud_api_key, chroma_cloud_tenant, chroma_cloud_database]):
         raise ValueError("One or more Chroma Cloud environment variables are not set in settings.")
 
-    embeddings = OpenAIEmbeddings(model="text-embedding-3-small")
+    return ChromaVectorStore(
+        Chroma(
+            collection_name=chroma_cloud_collection,
+            embedding_function=get_embeddings(),
+            chroma_cloud_api_key=chroma_cloud_api_key,
+            tenant=chroma_cloud_tenant,
+            database=chroma_cloud_database,
+        )
+    )
+
 
-    _vector_store = Chroma(
-        collection_name=chroma_cloud_collection,
-        embedding_function=embeddings,
-        chroma_cloud_api_key=chroma_cloud_api_key,
-        tenant=chroma_cloud_tenant,
-        database=chroma_cloud_database,
+def _create_chroma_local_store() -> VectorStoreBackend:
+    return ChromaVectorStore(
+        Chroma(
+            collection_name=settings.CHROMA_LOCAL_COLLECTION,
+            embedding_function=get_embeddings(),
+            persist_directory=settings.CHROMA_LOCAL_PATH,
+        )
     )
+
+
+def _create_pgvector_store() -> VectorStoreBackend:
+    from src.services.pgvector_store import PgVectorStore
+
+    return PgVectorStore(get_embeddings())
+
+
+_VECTOR_STORE_FACTORIES = {
+    VectorStoreBackendType.CHROMA_CLOUD: _create_chroma_cloud_store,
+    VectorStoreBackendType.CHROMA_LOCAL: _create_chroma_local_store,
+    VectorStoreBackendType.PGVECTOR: _create_pgvector_store,
+}
+
+
+def get_vector_store() -> VectorStoreBackend:
+    """
+    Returns a singleton instance of the vector store backend selected by
+    `VECTOR_STORE_BACKEND`.
+    """
+    global _vector_store
+    if _vector_store is not None:
+        return _vector_store
+
+    factory = _VECTOR_STORE_FACTORIES.get(settings.VECTOR_STORE_BACKEND)
+    if not factory:
+        raise ValueError(f"Unsupported vector store backend: {settings.VECTOR_STORE_BACKEND}")
+
+    logger.info(f"Using {settings.VECTOR_STORE_BACKEND.value} vector store backend.")
+    _vector_store = factory()
     return _vector_store
@@ -0,0 +1,142 @@
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+
+from sqlalchemy import func, select
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.config import settings
+from src.database.models import IngestionJob, KnowledgeSource, PracticeSettings
+from src.shared.enums import IngestionJobStatus, IngestionJobType, SourceType
+
+logger = logging.getLogger(__name__)
+
+# Held for the duration of a scheduling pass, so that only one worker process
+# enqueues refresh jobs at a time.
+_SCHEDULER_LOCK_KEY = "web_refresh_scheduler"
+
+
+def _now() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+def effective_refresh_interval(practice_settings: Optional[PracticeSettings]) -> int:
+    """Refresh interval of a practice in hours. 0 means scheduled refreshes are disabled."""
+    if practice_settings and practice_settings.web_refresh_interval_hours is not None:
+        return practice_settings.web_refresh_interval_hours
+    return settings.WEB_REFRESH_DEFAULT_INTERVAL_HOURS
+
+
+def next_refresh_at(practice_settings: Optional[PracticeSettings]) -> Optional[datetime]:
+    interval = effective_refresh_interval(practice_settings)
+    if interval <= 0 or not practice_settings or not practice_settings.last_web_refresh_at:
+        return None
+    return practice_settings.last_web_refresh_at + timedelta(hours=interval)
+
+
+async def get_practice_settings(db: AsyncSession, practice_id: int) -> Optional[PracticeSettings]:
+    return await db.get(PracticeSettings, practice_id)
+
+
+async def update_web_refresh_interval(db: AsyncSession, practice_id: int, interval_hours: Optional[int]) -> PracticeSettings:
+    """Sets the refresh interval of a practice. None falls back to the default interval."""
+    statement = insert(PracticeSettings).values(practice_id=practice_id, web_refresh_interval_hours=interval_hours)
+    await db.execute(
+        statement.on_conflict_do_update(
+            index_elements=["practice_id"],
+            set_={"web_refresh_interval_hours": interval_hours, "updated_at": func.now()},
+        )
+    )
+    await db.commit()
+    practice_settings = await db.get(PracticeSettings, practice_id, populate_existing=True)
+    logger.info(f"Set web page refresh interval of practice_id {practice_id} to {interval_hours} hours.")
+    return practice_settings
+
+
+async def _queue_web_refresh(db: AsyncSession, practice_id: int, now: datetime) -> IngestionJob:
+    """
+    Adds a refresh job for a practice unless one is already queued or running,
+    in which case that job is returned. The caller commits.
+    """
+    result = await db.execute(
+        select(IngestionJob)
+        .where(IngestionJob.job_type == IngestionJobType.WEB_REFRESH.value)
+        .where(IngestionJob.practice_id == practice_id)
+        .where(IngestionJob.status.in_([IngestionJobStatus.QUEUED.value, IngestionJobStatus.RUNNING.value]))
+        .limit(1)
+    )
+    job = result.scalar_one_or_none()
+    if not job:
+        job = IngestionJob(
+            job_type=IngestionJobType.WEB_REFRESH.value,
+            practice_id=practice_id,
+            source_type=SourceType.WEB_PAGE.value,
+            payload={"practiceId": practice_id},
+            status=IngestionJobStatus.QUEUED.value,
+        )
+        db.add(job)
+        await db.flush()
+
+    statement = insert(PracticeSettings).values(
+        practice_id=practice_id, last_web_refresh_at=now, last_web_refresh_job_id=job.id
+    )
+    await db.execute(
+        statement.on_conflict_do_update(
+            index_elements=["practice_id"],
+            set_={"last_web_refresh_at": now, "last_web_refresh_job_id": job.id},
+        )
+    )
+    return job
+
+
+async def enqueue_web_refresh_job(db: AsyncSession, practice_id: int) -> IngestionJob:
+    """Queues an immediate refresh of a practice's web pages."""
+    job = await _queue_web_refresh(db, practice_id, _now())
+    await db.commit()
+    await db.refresh(job)
+    logger.info(f"Queued web page refresh job {job.id} for practice_id: {practice_id}")
+    return job
+
+
+async def schedule_due_web_refreshes(db: AsyncSession) -> int:
+    """
+    Queues a refresh job for every practice with stored web pages whose refresh
+    interval has elapsed. A practice seen for the first time starts its interval
+    now, since its pages were just ingested. Returns the number of jobs queued.
+    """
+    locked = await db.scalar(select(func.pg_try_advisory_xact_lock(func.hashtext(_SCHEDULER_LOCK_KEY))))
+    if not locked:
+        await db.commit()
+        return 0
+
+    practice_ids = (
+        select(KnowledgeSource.practice_id)
+        .where(KnowledgeSource.source_type == SourceType.WEB_PAGE.value)
+        .distinct()
+        .subquery()
+    )
+    result = await db.execute(
+        select(practice_ids.c.practice_id, PracticeSettings)
+        .outerjoin(PracticeSettings, PracticeSettings.practice_id == practice_ids.c.practice_id)
+    )
+
+    now = _now()
+    queued = 0
+    for practice_id, practice_settings in result.all():
+        if effective_refresh_interval(practice_settings) <= 0:
+            continue
+        if not practice_settings or not practice_settings.last_web_refresh_at:
+            await db.execute(
+                insert(PracticeSettings)
+                .values(practice_id=practice_id, last_web_refresh_at=now)
+                .on_conflict_do_update(index_elements=["practice_id"], set_={"last_web_refresh_at": now})
+            )
+            continue
+        if next_refresh_at(practice_settings) <= now:
+            job = await _queue_web_refresh(db, practice_id, now)
+            logger.info(f"Scheduled web page refresh job {job.id} for practice_id: {practice_id}")
+            queued += 1
+
+    await db.commit()
+    return queued
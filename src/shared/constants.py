@@ -1,3 +1,25 @@
 INVALID_UNICODE_CLEANUP_REGEX = r'[\p{Cf}\p{Cn}\p{Co}\p{Cs}\p{So}]'
 VECTOR_EMBEDDINGS_SIMILARITY_THRESHOLD = 1.15
 VECTOR_EMBEDDINGS_QUERY_SYSTEM_PROMPT = "You are an assistant for a naturopathic medicine clinic. For general questions, provide a brief, high-level summary as a reply but avoid long answers. Provide more detail if the user asks specific follow-up questions. Answer the question based only on the following context: {context}\n\nDo not tell the user to contact the clinic in your answer, simply provide the information requested.\n\nQuestion: {question}"
+EMBEDDINGS_BATCH_SIZE = 256
+VECTOR_STORE_FILTER_BATCH_SIZE = 50
+VECTOR_STORE_DELETE_BATCH_SIZE = 1000
+RETRIEVAL_TOP_K = 3
+RETRIEVAL_SCORE_BUCKET_WIDTH = 0.05
+RETRIEVAL_SCORE_BUCKETS = 80
+HYBRID_SEARCH_CANDIDATES = 8
+RRF_K = 60
+LEXICAL_MIN_RELATIVE_SCORE = 0.3
+LEXICAL_STRONG_MATCH_MIN_TERMS = 3
+LEXICAL_STRONG_MATCH_MIN_COVERAGE = 0.75
+LEXICAL_FAST_PATH_MIN_MARGIN = 1.5
+LEXICAL_STOPWORDS = frozenset({
+    "a", "about", "am", "an", "and", "any", "are", "as", "at", "be", "can", "could", "do", "does", "for",
+    "from", "get", "have", "how", "i", "if", "in", "is", "it", "me", "my", "of", "on", "or", "our", "should",
+    "so", "that", "the", "there", "this", "to", "us", "was", "we", "what", "when", "where", "which", "who",
+    "why", "will", "with", "would", "you", "your",
+})
+CRAWL_SKIPPED_EXTENSIONS = (
+    ".pdf", ".jpg", ".jpeg", ".png", ".gif", ".svg", ".webp", ".ico", ".css", ".js", ".zip", ".mp3", ".mp4",
+    ".doc", ".docx", ".xls", ".xlsx", ".ppt", ".pptx",
+)
@@ -11,6 +11,42 @@ class SourceType(Enum):
     QA_PAIR = "QA_PAIR"
     DOCUMENT = "DOCUMENT"
 
+class VectorStoreBackendType(str, Enum):
+    CHROMA_CLOUD = "chroma_cloud"
+    CHROMA_LOCAL = "chroma_local"
+    PGVECTOR = "pgvector"
+
+class EmbeddingsBackendType(str, Enum):
+    OPENAI = "openai"
+    ONNX = "onnx"
+
+class LLMCacheBackendType(str, Enum):
+    MEMORY = "memory"
+    POSTGRES = "postgres"
+
+class WebScraperType(str, Enum):
+    FIRECRAWL = "firecrawl"
+    HTTP = "http"
+
 class DocType(str, Enum):
     DOCX = "DOCX"
     TXT = "TXT"
+
+class IngestionJobType(str, Enum):
+    INGEST = "INGEST"
+    BATCH_INGEST = "BATCH_INGEST"
+    WEB_REFRESH = "WEB_REFRESH"
+    PURGE = "PURGE"
+    CALIBRATE_THRESHOLDS = "CALIBRATE_THRESHOLDS"
+
+class IngestionJobStatus(str, Enum):
+    QUEUED = "QUEUED"
+    RUNNING = "RUNNING"
+    SUCCEEDED = "SUCCEEDED"
+    FAILED = "FAILED"
+    CANCELLED = "CANCELLED"
+
+class IngestionJobLease(str, Enum):
+    RENEWED = "RENEWED"
+    CANCEL_REQUESTED = "CANCEL_REQUESTED"
+    LOST = "LOST"
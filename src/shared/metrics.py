@@ -0,0 +1,42 @@
+import threading
+from collections import defaultdict
+from typing import Callable
+
+
+class MetricsRegistry:
+    """
+    Process-local counters and gauges, exposed through the `/metrics` endpoint.
+    Gauges are callables evaluated when a snapshot is taken.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters: dict[str, float] = defaultdict(float)
+        self._gauges: dict[str, Callable[[], float]] = {}
+
+    def increment(self, name: str, value: float = 1):
+        with self._lock:
+            self._counters[name] += value
+
+    def get(self, name: str) -> float:
+        with self._lock:
+            return self._counters.get(name, 0)
+
+    def register_gauge(self, name: str, callback: Callable[[], float]):
+        with self._lock:
+            self._gauges[name] = callback
+
+    def ratio(self, numerator: str, denominator: str) -> float:
+        total = self.get(denominator)
+        return self.get(numerator) / total if total else 0.0
+
+    def snapshot(self) -> dict[str, float]:
+        with self._lock:
+            values = dict(self._counters)
+            gauges = dict(self._gauges)
+        for name, callback in gauges.items():
+            values[name] = callback()
+        return values
+
+
+metrics = MetricsRegistry()
@@ -1,8 +1,9 @@
+import uuid
 from datetime import datetime, timezone
 from pydantic import BaseModel, Field
 from typing import List, Optional, Dict, Any
 
-from src.shared.enums import InteractionType, SourceType, DocType
+from src.shared.enums import InteractionType, SourceType, DocType, IngestionJobStatus, IngestionJobType
 
 
 class HealthResponse(BaseModel):
@@ -10,6 +11,10 @@ class HealthResponse(BaseModel):
     db_connection: str
 
 
+class MetricsResponse(BaseModel):
+    counters: Dict[str, float]
+
+
 class InteractionMessage(BaseModel):
     role: InteractionType
     message: str
@@ -40,10 +45,21 @@ class DocumentData(BaseModel):
     name: str
     docType: Optional[DocType] = None
     data: Optional[str] = None
+    # Set by the upload endpoint: the document was spooled to disk instead of sent as base64.
+    uploadId: Optional[uuid.UUID] = None
+
+
+class CrawlOptions(BaseModel):
+    maxDepth: int = Field(1, ge=0, le=5)
+    maxPages: int = Field(50, ge=1, le=500)
+    includePatterns: List[str] = []
+    excludePatterns: List[str] = []
 
 
 class SourceData(BaseModel):
     webPageURL: Optional[str] = None
+    # Crawls the site from webPageURL instead of scraping the single page.
+    crawl: Optional[CrawlOptions] = None
     qa_pair: Optional[QAPair] = None
     document: Optional[DocumentData] = None
 
@@ -57,6 +73,97 @@ class CreateEmbeddingsRequest(BaseModel):
 class CreateEmbeddingsResponse(BaseModel):
     status: str
     message: str
+    jobId: Optional[str] = None
+
+
+class CreateEmbeddingsBatchRequest(BaseModel):
+    items: List[CreateEmbeddingsRequest] = Field(..., min_length=1, max_length=1000)
+
+
+class IngestionJobResponse(BaseModel):
+    jobId: str
+    jobType: IngestionJobType
+    practiceId: Optional[int] = None
+    sourceType: Optional[SourceType] = None
+    status: IngestionJobStatus
+    progress: float
+    error: Optional[str] = None
+    result: Optional[Any] = None
+    cancelRequested: bool = False
+    createdAt: datetime
+    startedAt: Optional[datetime] = None
+    finishedAt: Optional[datetime] = None
+
+
+class PurgeSource(BaseModel):
+    sourceType: SourceType
+    sourceData: SourceData
+
+
+class PurgeEmbeddingsRequest(BaseModel):
+    practiceId: int
+    # Purges only the sources of these types, or only these sources. Without
+    # either, everything stored for the practice is purged, conversations included.
+    sourceTypes: Optional[List[SourceType]] = Field(None, min_length=1)
+    sources: Optional[List[PurgeSource]] = Field(None, min_length=1, max_length=10000)
+
+
+class KnowledgeSourceResponse(BaseModel):
+    sourceType: SourceType
+    # doc_id for Q&A pairs and documents, URL for web pages.
+    sourceKey: str
+    name: str
+    chunkCount: int
+    crawlRoot: Optional[str] = None
+    createdAt: datetime
+    updatedAt: datetime
+    lastCheckedAt: Optional[datetime] = None
+
+
+class KnowledgeSourceListResponse(BaseModel):
+    practiceId: int
+    total: int
+    items: List[KnowledgeSourceResponse]
+
+
+class WebRefreshSettingsRequest(BaseModel):
+    # Hours between scheduled refreshes of the practice's web pages. 0 disables
+    # them, None falls back to the default interval.
+    intervalHours: Optional[int] = Field(None, ge=0)
+
+
+class WebRefreshSettingsResponse(BaseModel):
+    practiceId: int
+    intervalHours: Optional[int] = None
+    effectiveIntervalHours: int
+    lastRefreshAt: Optional[datetime] = None
+    lastRefreshJobId: Optional[str] = None
+    nextRefreshAt: Optional[datetime] = None
+
+
+class CalibrateThresholdsRequest(BaseModel):
+    # Practices to calibrate; all practices with recorded scores when omitted.
+    practiceIds: Optional[List[int]] = Field(None, min_length=1)
+
+
+class RetrievalScoreBucket(BaseModel):
+    # Closest-chunk distances below this bound, and at or above the previous one.
+    # The last bucket also counts every larger distance.
+    upperBound: float
+    count: int
+
+
+class RetrievalScoreHistogramResponse(BaseModel):
+    practiceId: int
+    bucketWidth: float
+    samples: int
+    # Recorded counts not yet flushed by the API process are not included.
+    buckets: List[RetrievalScoreBucket]
+    defaultThreshold: float
+    calibratedThreshold: Optional[float] = None
+    targetPassRate: Optional[float] = None
+    calibratedSamples: Optional[int] = None
+    calibratedAt: Optional[datetime] = None
 
 
 class DeleteEmbeddingsRequest(BaseModel):
@@ -1,15 +1,55 @@
 import logging
-from typing import Any, Dict, List
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Sequence
 
 from langchain_core.language_models import BaseChatModel
 from langchain_core.messages import AIMessage, SystemMessage, BaseMessage
 from langchain_core.tools import BaseTool
 
+from src.services.llm_cache import get_llm_cache
 from src.shared.schemas import InteractionMessage
 from src.shared.utils.history import get_langchain_history
+from src.shared.utils.streaming import emit_event, is_streaming
 
 logger = logging.getLogger(__name__)
 
+# Placeholder for the current date and time in system prompts, filled in on
+# every call.
+TODAY_PLACEHOLDER = "{today}"
+
+
+def render_system_prompt(system_prompt: str, with_time: bool = True) -> str:
+    """Fills in the prompt's placeholder with the current date, and time unless `with_time` is False."""
+    today = datetime.now().strftime("%A, %d of %B %Y, it's %I:%M %p" if with_time else "%A, %d of %B %Y")
+    return system_prompt.replace(TODAY_PLACEHOLDER, today)
+
+
+def _build_prompt(
+    model: BaseChatModel,
+    system_prompt: str,
+    context: str | None,
+    messages: List[BaseMessage],
+    tools: Optional[Sequence[BaseTool]] = None,
+    tool_choice: Optional[str] = None,
+) -> tuple[List[BaseMessage], Optional[str]]:
+    """
+    Returns the messages to send to the model and the LLM cache key of the call,
+    None if it is not cached. Cached calls are only told the date, not the time,
+    and the key covers that date, so a cached answer is not replayed on another
+    day.
+    """
+    full_system_prompt = system_prompt
+    if context:
+        full_system_prompt += f"\n\n## Context\n{context}"
+
+    llm_cache = get_llm_cache()
+    if llm_cache:
+        prompt_messages = [SystemMessage(content=render_system_prompt(full_system_prompt, with_time=False))] + messages
+        cache_key = llm_cache.key(model, prompt_messages, tools, tool_choice)
+        if cache_key:
+            return prompt_messages, cache_key
+    return [SystemMessage(content=render_system_prompt(full_system_prompt))] + messages, None
+
 
 async def call_single_tool(
     messages: List[BaseMessage],
@@ -31,13 +71,17 @@ async def call_single_tool(
         tool_choice=tool_instance.name
     )
 
-    full_system_prompt = system_prompt
-    if context:
-        full_system_prompt += f"\n\n## Context\n{context}"
-    prompt_messages = [SystemMessage(content=full_system_prompt)] + messages
+    prompt_messages, cache_key = _build_prompt(
+        model, system_prompt, context, messages, [tool_instance], tool_instance.name
+    )
+    llm_cache = get_llm_cache()
 
     try:
-        ai_msg = await model_with_tools.ainvoke(prompt_messages)
+        ai_msg = await llm_cache.aget(cache_key) if cache_key else None
+        if ai_msg is None:
+            ai_msg = await model_with_tools.ainvoke(prompt_messages)
+            if cache_key and isinstance(ai_msg, AIMessage) and ai_msg.tool_calls:
+                await llm_cache.aset(cache_key, model, ai_msg)
 
         if not isinstance(ai_msg, AIMessage):
             logger.warning(f"Expected an AIMessage, but got {type(ai_msg).__name__}")
@@ -65,6 +109,7 @@ async def generate_response_text(
     model: BaseChatModel,
     system_prompt: str,
     context: str | None = None,
+    stream: bool = False,
 ) -> str:
     """
     Generate a response text without any tool calls.
@@ -74,21 +119,39 @@ async def generate_response_text(
         model: The LangChain chat model
         system_prompt: The system prompt
         context: Optional context to append to system prompt
+        stream: Whether the text is sent to the user as is. During a streamed
+            turn, such text is also emitted token by token as `token` events.
 
     Returns:
         The generated response text
     """
-    full_system_prompt = system_prompt
-    if context:
-        full_system_prompt += f"\n\n## Context\n{context}"
-
-    langchain_messages = [
-        SystemMessage(content=full_system_prompt)
-    ] + get_langchain_history(history_messages)
+    langchain_messages, cache_key = _build_prompt(
+        model, system_prompt, context, get_langchain_history(history_messages)
+    )
+    llm_cache = get_llm_cache()
 
     try:
-        response = await model.ainvoke(langchain_messages)
-        return str(response.content)
+        response = await llm_cache.aget(cache_key) if cache_key else None
+        if response is not None:
+            if stream and response.content:
+                emit_event("token", {"delta": str(response.content)})
+            return str(response.content)
+
+        if stream and is_streaming():
+            response = None
+            async for chunk in model.astream(langchain_messages):
+                # Chunks add up to the full message, including the usage.
+                response = chunk if response is None else response + chunk
+                if chunk.content:
+                    emit_event("token", {"delta": str(chunk.content)})
+        else:
+            response = await model.ainvoke(langchain_messages)
+
+        if cache_key and response is not None:
+            await llm_cache.aset(cache_key, model, AIMessage(
+                content=response.content, usage_metadata=response.usage_metadata
+            ))
+        return str(response.content) if response is not None else ""
     except Exception as e:
         logger.error(f"Error in generate_response_text: {e}")
         return ""
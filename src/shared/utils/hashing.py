@@ -0,0 +1,16 @@
+import xxhash
+
+
+def content_hash(text: str) -> str:
+    """
+    Returns a fast, stable fingerprint of a text, used to detect changed content.
+    """
+    return xxhash.xxh64_hexdigest(text.encode("utf-8"))
+
+
+def cache_key_hash(text: str) -> str:
+    """
+    Returns a 128-bit fingerprint of a text, wide enough to be used as a cache key
+    without practical risk of collisions.
+    """
+    return xxhash.xxh3_128_hexdigest(text.encode("utf-8"))
@@ -0,0 +1,30 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Callable, Optional
+
+EventSink = Callable[[str, dict], None]
+
+# Set for the duration of a streamed chatflow turn. Tasks created inside the
+# `event_sink` block inherit it, so workflows can emit events without the sink
+# being threaded through every call.
+_event_sink: ContextVar[Optional[EventSink]] = ContextVar("chatflow_event_sink", default=None)
+
+
+@contextmanager
+def event_sink(sink: EventSink):
+    token = _event_sink.set(sink)
+    try:
+        yield
+    finally:
+        _event_sink.reset(token)
+
+
+def is_streaming() -> bool:
+    return _event_sink.get() is not None
+
+
+def emit_event(event: str, data: dict):
+    """Sends an event to the client of the current streamed turn. Does nothing outside of one."""
+    sink = _event_sink.get()
+    if sink:
+        sink(event, data)
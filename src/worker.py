@@ -0,0 +1,192 @@
+import asyncio
+import logging
+import os
+import socket
+import uuid
+from typing import Any, Optional
+
+from src.config import settings
+from src.database.db import AsyncSessionFactory, create_tables, engine
+from src.services.document_processing import shutdown_document_pool
+from src.services.embeddings import (
+    store_data_batch,
+    store_data_from_document,
+    store_data_from_qa_pair,
+    store_data_from_site,
+    store_data_from_website,
+    purge_practice_data,
+    refresh_web_pages,
+    InvalidURLError,
+)
+from src.services.ingestion_jobs import (
+    IngestionJobCancelledError,
+    IngestionJobContext,
+    claim_next_ingestion_job,
+    finish_ingestion_job,
+    renew_ingestion_job_lease,
+)
+from src.services.retrieval_calibration import calibrate_similarity_thresholds
+from src.services.web_refresh import schedule_due_web_refreshes
+from src.shared.enums import IngestionJobLease, IngestionJobStatus, IngestionJobType, SourceType
+from src.shared.schemas import (
+    CalibrateThresholdsRequest,
+    CreateEmbeddingsBatchRequest,
+    CreateEmbeddingsRequest,
+    PurgeEmbeddingsRequest,
+)
+
+log_level = settings.LOG_LEVEL.upper()
+logging.basicConfig(
+    level=log_level,
+    format="%(levelname)s:%(name)s: [%(funcName)s] - %(message)s",
+)
+
+if log_level != "DEBUG":
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+    logging.getLogger("httpcore").setLevel(logging.WARNING)
+
+logger = logging.getLogger(__name__)
+
+
+def run_ingestion_request(request: CreateEmbeddingsRequest, job: IngestionJobContext) -> Optional[dict]:
+    """
+    Executes a single embeddings request. Runs on a worker thread since the
+    ingestion functions are blocking.
+    """
+    if request.sourceType == SourceType.WEB_PAGE:
+        if request.sourceData.crawl:
+            return store_data_from_site(request.sourceData.webPageURL, request.sourceData.crawl, request.practiceId, job=job)
+        return store_data_from_website(request.sourceData.webPageURL, request.practiceId, job=job)
+    elif request.sourceType == SourceType.QA_PAIR:
+        return store_data_from_qa_pair(request.sourceData.qa_pair, request.practiceId, job=job)
+    elif request.sourceType == SourceType.DOCUMENT:
+        return store_data_from_document(request.sourceData.document, request.practiceId, job=job)
+    else:
+        raise ValueError(f"Source type '{request.sourceType.value}' not supported.")
+
+
+def run_ingestion_job(job_type: str, payload: dict, job: IngestionJobContext) -> Optional[Any]:
+    """
+    Executes a claimed job on a worker thread and returns the result to store on it.
+    """
+    if job_type == IngestionJobType.BATCH_INGEST.value:
+        batch_request = CreateEmbeddingsBatchRequest.model_validate(payload)
+        return store_data_batch(batch_request.items, job=job)
+    if job_type == IngestionJobType.WEB_REFRESH.value:
+        return refresh_web_pages(payload["practiceId"], job=job)
+    if job_type == IngestionJobType.PURGE.value:
+        purge_request = PurgeEmbeddingsRequest.model_validate(payload)
+        return purge_practice_data(purge_request.practiceId, purge_request.sourceTypes, purge_request.sources, job=job)
+    if job_type == IngestionJobType.CALIBRATE_THRESHOLDS.value:
+        calibrate_request = CalibrateThresholdsRequest.model_validate(payload)
+        return calibrate_similarity_thresholds(calibrate_request.practiceIds, job=job)
+
+    return run_ingestion_request(CreateEmbeddingsRequest.model_validate(payload), job)
+
+
+async def _heartbeat(job: IngestionJobContext, worker_id: str):
+    """
+    Keeps the job lease alive, publishes progress and picks up cancellation
+    requests. Stops the job if another worker took it over.
+    """
+    while True:
+        await asyncio.sleep(settings.INGESTION_JOB_HEARTBEAT_SECONDS)
+        try:
+            async with AsyncSessionFactory() as db:
+                lease = await renew_ingestion_job_lease(db, job.job_id, worker_id, job.progress)
+            if lease == IngestionJobLease.LOST:
+                logger.warning(f"Worker {worker_id} lost the lease of ingestion job {job.job_id}, stopping it.")
+                job.lose_lease()
+                return
+            if lease == IngestionJobLease.CANCEL_REQUESTED and not job.cancelled:
+                logger.info(f"Cancellation requested for ingestion job {job.job_id}.")
+                job.cancel()
+        except Exception as e:
+            logger.error(f"Failed to renew lease for ingestion job {job.job_id}: {e}", exc_info=True)
+
+
+async def process_ingestion_job(job_id: str, job_type: str, payload: dict, worker_id: str):
+    job = IngestionJobContext(job_id)
+    heartbeat = asyncio.create_task(_heartbeat(job, worker_id))
+
+    error = None
+    result = None
+    try:
+        result = await asyncio.to_thread(run_ingestion_job, job_type, payload, job)
+        final_status = IngestionJobStatus.SUCCEEDED
+        logger.info(f"Ingestion job {job_id} succeeded.")
+    except IngestionJobCancelledError:
+        final_status = IngestionJobStatus.CANCELLED
+        if not job.lease_lost:
+            logger.info(f"Ingestion job {job_id} cancelled.")
+    except InvalidURLError as e:
+        final_status = IngestionJobStatus.FAILED
+        error = str(e)
+        logger.warning(f"Ingestion job {job_id} failed: {e}")
+    except Exception as e:
+        final_status = IngestionJobStatus.FAILED
+        error = f"An error occurred while creating embeddings: {e}"
+        logger.error(f"Ingestion job {job_id} failed: {e}", exc_info=True)
+    finally:
+        heartbeat.cancel()
+
+    if job.lease_lost:
+        # The job belongs to the worker that claimed it after us.
+        logger.info(f"Ingestion job {job_id} stopped without recording a status, its lease was lost.")
+        return
+
+    async with AsyncSessionFactory() as db:
+        finished = await finish_ingestion_job(db, job_id, worker_id, final_status, error, result)
+    if not finished:
+        logger.warning(f"Ingestion job {job_id} was taken over by another worker, its {final_status.value} status was not recorded.")
+
+
+async def worker_loop(worker_id: str):
+    logger.info(f"Ingestion worker {worker_id} started.")
+    while True:
+        try:
+            async with AsyncSessionFactory() as db:
+                job = await claim_next_ingestion_job(db, worker_id)
+                claimed = (job.id, job.job_type, job.payload) if job else None
+        except Exception as e:
+            logger.error(f"Failed to claim ingestion job: {e}", exc_info=True)
+            claimed = None
+
+        if not claimed:
+            await asyncio.sleep(settings.INGESTION_WORKER_POLL_INTERVAL_SECONDS)
+            continue
+
+        job_id, job_type, payload = claimed
+        logger.info(f"Worker {worker_id} claimed {job_type} job {job_id}.")
+        await process_ingestion_job(job_id, job_type, payload, worker_id)
+
+
+async def web_refresh_scheduler():
+    """Periodically queues refresh jobs for practices whose web pages are due to be re-checked."""
+    while True:
+        try:
+            async with AsyncSessionFactory() as db:
+                queued = await schedule_due_web_refreshes(db)
+            if queued:
+                logger.info(f"Queued {queued} web page refresh jobs.")
+        except Exception as e:
+            logger.error(f"Failed to schedule web page refreshes: {e}", exc_info=True)
+        await asyncio.sleep(settings.WEB_REFRESH_SCHEDULER_INTERVAL_SECONDS)
+
+
+async def main():
+    await create_tables()
+    host_id = f"{socket.gethostname()}-{os.getpid()}"
+    workers = [
+        worker_loop(f"{host_id}-{uuid.uuid4().hex[:8]}")
+        for _ in range(settings.INGESTION_WORKER_CONCURRENCY)
+    ]
+    try:
+        await asyncio.gather(web_refresh_scheduler(), *workers)
+    finally:
+        shutdown_document_pool()
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())